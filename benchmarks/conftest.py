@@ -0,0 +1,72 @@
+"""Author: Matthew Russell
+
+Fixtures of the Spomato benchmarks. The size of the synthetic data is multiplied by --spomato-scale and is created from
+--spomato-seed, so results can be compared between runs.
+
+"""
+
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from fake_spotify import FakeSpomato, FakeSpotify, make_album, make_playlist_items, make_saved_track_items
+
+
+def pytest_addoption(parser):
+    parser.addoption('--spomato-scale', type=int, default=1, help='Multiplies the size of the benchmark data.')
+    parser.addoption('--spomato-seed', type=int, default=0, help='Seed of the benchmark data.')
+
+
+@pytest.fixture(scope='session')
+def scale(request):
+    return request.config.getoption('--spomato-scale')
+
+
+@pytest.fixture(scope='session')
+def seed(request):
+    return request.config.getoption('--spomato-seed')
+
+
+@pytest.fixture
+def rng(seed):
+    return random.Random(seed)
+
+
+@pytest.fixture
+def playlist_page(rng, scale):
+    return {'items': make_playlist_items(rng, 100 * scale)}
+
+
+@pytest.fixture
+def saved_track_page(rng, scale):
+    return make_saved_track_items(rng, 50 * scale)
+
+
+@pytest.fixture
+def album(rng, scale):
+    return make_album(rng, 'album', 12 * scale)
+
+
+@pytest.fixture
+def spotify(scale, seed):
+    return FakeSpotify(saved_tracks=1000 * scale,
+                       playlists=10,
+                       playlist_size=200 * scale,
+                       artists=5,
+                       albums_per_artist=20 * scale,
+                       album_size=12,
+                       seed=seed)
+
+
+@pytest.fixture
+def sp(spotify):
+    return FakeSpomato(spotify)
+
+
+@pytest.fixture
+def song_df(scale, seed):
+    # durations of songs like those of a typical library, from 1 to 10 minutes
+    n = 10000 * scale
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'song_id': [f'song{i:08d}' for i in range(n)],
+                         'time': np.round(rng.gamma(9.0, 25.0, n).clip(60, 600), 3)})
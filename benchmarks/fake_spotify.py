@@ -0,0 +1,267 @@
+"""Author: Matthew Russell
+
+This contains the synthetic Spotify API data and the fake spotipy session used by the Spomato benchmarks, so the
+benchmarks run offline and give the same data for the same seed.
+
+"""
+
+import random
+import string
+import time
+from collections import Counter
+from spomato.spomato import Spomato
+
+MARKETS = ['US', 'CA', 'GB', 'DE', 'MX', 'JP']
+
+
+def make_track(rng, market_rate=0.9):
+    """Creates a track record like those returned by the Spotify API.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator used to create the track.
+    market_rate : float
+        The fraction of tracks available in the US market.
+
+    Returns
+    -------
+    dict
+        A track dictionary with an id, duration and available markets.
+
+    """
+    track_id = ''.join(rng.choices(string.ascii_letters + string.digits, k=22))
+    markets = [market for market in MARKETS[1:] if rng.random() < 0.5]
+    if rng.random() < market_rate:
+        markets.append('US')
+    return {'id': track_id,
+            'uri': f'spotify:track:{track_id}',
+            'duration_ms': rng.randint(60000, 600000),
+            'available_markets': markets}
+
+
+def make_album(rng, album_id, size=12):
+    """Creates an album record like those returned by the albums endpoint of the Spotify API.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator used to create the album.
+    album_id : str
+        The id of the album.
+    size : int
+        The number of tracks on the album.
+
+    Returns
+    -------
+    dict
+        An album dictionary with its tracks.
+
+    """
+    return {'id': album_id,
+            'available_markets': MARKETS if rng.random() < 0.9 else MARKETS[1:],
+            'tracks': {'items': [make_track(rng) for _ in range(size)]}}
+
+
+def make_playlist_items(rng, size=100):
+    """Creates the items of a page of playlist tracks.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator used to create the tracks.
+    size : int
+        The number of tracks on the page.
+
+    Returns
+    -------
+    list
+        A list of playlist item dictionaries.
+
+    """
+    return [{'track': make_track(rng)} for _ in range(size)]
+
+
+def make_saved_track_items(rng, size=50):
+    """Creates the items of a page of the user's saved tracks.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator used to create the tracks.
+    size : int
+        The number of tracks on the page.
+
+    Returns
+    -------
+    list
+        A list of saved track item dictionaries, newest first.
+
+    """
+    return [{'added_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1577836800 + size - i)),
+             'track': make_track(rng)} for i in range(size)]
+
+
+class FakeSpotify():
+    """A spotipy session that serves synthetic data from memory and counts the requests made of each endpoint.
+
+    Parameters
+    ----------
+    saved_tracks : int
+        The number of tracks the user has saved.
+    playlists : int
+        The number of playlists the user has.
+    playlist_size : int
+        The number of tracks on each playlist.
+    artists : int
+        The number of artists.
+    albums_per_artist : int
+        The number of albums of each artist.
+    album_size : int
+        The number of tracks on each album.
+    seed : int
+        Seed for the random number generator that creates the data.
+
+    Attributes
+    ----------
+    calls : collections.Counter
+        The number of requests made of each endpoint.
+
+    """
+
+    def __init__(self,
+                 saved_tracks=1000,
+                 playlists=10,
+                 playlist_size=200,
+                 artists=5,
+                 albums_per_artist=20,
+                 album_size=12,
+                 seed=0):
+        rng = random.Random(seed)
+        self.calls = Counter()
+        self.saved_tracks = make_saved_track_items(rng, saved_tracks)
+        self.playlists = {f'playlist{i}': {'name': f'Playlist {i}',
+                                           'snapshot_id': 'snapshot0',
+                                           'owner': {'id': 'benchmark-user'},
+                                           'items': make_playlist_items(rng, playlist_size)}
+                          for i in range(playlists)}
+        self.artists = {f'artist{i}': [f'album{i}-{j}' for j in range(albums_per_artist)] for i in range(artists)}
+        self.albums_by_id = {album_id: make_album(rng, album_id, album_size)
+                             for album_ids in self.artists.values() for album_id in album_ids}
+        self.tracks_by_id = {item['track']['id']: item['track'] for item in self.saved_tracks}
+        for playlist in self.playlists.values():
+            self.tracks_by_id.update((item['track']['id'], item['track']) for item in playlist['items'])
+        for album in self.albums_by_id.values():
+            self.tracks_by_id.update((track['id'], track) for track in album['tracks']['items'])
+        self._snapshots = {}
+
+    @staticmethod
+    def _page(items, limit, offset):
+        return {'items': items[offset:offset + limit], 'total': len(items), 'limit': limit, 'offset': offset}
+
+    def _set_items(self, playlist_id, items):
+        playlist = self.playlists[playlist_id]
+        playlist['items'] = items
+        playlist['snapshot_id'] = f'snapshot{int(playlist["snapshot_id"][8:]) + 1}'
+        return {'snapshot_id': playlist['snapshot_id']}
+
+    def _get_items(self, tracks):
+        return [{'track': self.tracks_by_id[track.split(':')[-1]]} for track in tracks]
+
+    def current_user(self):
+        self.calls['current_user'] += 1
+        return {'id': 'benchmark-user'}
+
+    def current_user_saved_tracks(self, limit=20, offset=0, market=None):
+        self.calls['current_user_saved_tracks'] += 1
+        return self._page(self.saved_tracks, limit, offset)
+
+    def current_user_playlists(self, limit=50, offset=0):
+        self.calls['current_user_playlists'] += 1
+        playlists = [{'id': playlist_id,
+                      'name': playlist['name'],
+                      'snapshot_id': playlist['snapshot_id'],
+                      'owner': playlist['owner']} for playlist_id, playlist in self.playlists.items()]
+        return self._page(playlists, limit, offset)
+
+    def user_playlist(self, user, playlist_id=None, fields=None, market=None):
+        self.calls['user_playlist'] += 1
+        playlist = self.playlists[playlist_id]
+        return {'id': playlist_id,
+                'name': playlist['name'],
+                'snapshot_id': playlist['snapshot_id'],
+                'tracks': self._page(playlist['items'], 100, 0)}
+
+    def playlist(self, playlist_id, fields=None, market=None, additional_types=('track',)):
+        self.calls['playlist'] += 1
+        playlist = self.playlists[playlist_id]
+        self._snapshots[playlist_id, playlist['snapshot_id']] = (list(playlist['items']), set())
+        return {'snapshot_id': playlist['snapshot_id'], 'tracks': self._page(playlist['items'], 100, 0)}
+
+    def playlist_tracks(self, playlist_id, fields=None, limit=100, offset=0, market=None,
+                        additional_types=('track',)):
+        self.calls['playlist_tracks'] += 1
+        return self._page(self.playlists[playlist_id]['items'], limit, offset)
+
+    def artist_albums(self, artist_id, album_type=None, include_groups=None, country=None, limit=20, offset=0):
+        self.calls['artist_albums'] += 1
+        return self._page([{'id': album_id} for album_id in self.artists[artist_id]], limit, offset)
+
+    def albums(self, albums, market=None):
+        self.calls['albums'] += 1
+        return {'albums': [self.albums_by_id[album_id] for album_id in albums]}
+
+    def search(self, q, limit=10, offset=0, type='track', market=None):  # pylint: disable=redefined-builtin
+        self.calls['search'] += 1
+        return {'artists': {'items': [{'id': artist_id, 'name': artist_id} for artist_id in self.artists]}}
+
+    def user_playlist_create(self, user, name, public=True, collaborative=False, description=''):
+        self.calls['user_playlist_create'] += 1
+        playlist_id = f'playlist{len(self.playlists)}'
+        self.playlists[playlist_id] = {'name': name, 'snapshot_id': 'snapshot0', 'owner': {'id': user}, 'items': []}
+        return {'id': playlist_id, 'name': name, 'snapshot_id': 'snapshot0', 'owner': {'id': user}}
+
+    def user_playlist_add_tracks(self, user, playlist_id, tracks, position=None):
+        self.calls['user_playlist_add_tracks'] += 1
+        items = list(self.playlists[playlist_id]['items'])
+        position = len(items) if position is None else position
+        items[position:position] = self._get_items(tracks)
+        return self._set_items(playlist_id, items)
+
+    def user_playlist_replace_tracks(self, user, playlist_id, tracks):
+        self.calls['user_playlist_replace_tracks'] += 1
+        return self._set_items(playlist_id, self._get_items(tracks))
+
+    def playlist_remove_specific_occurrences_of_items(self, playlist_id, items, snapshot_id=None):
+        self.calls['playlist_remove_specific_occurrences_of_items'] += 1
+        # positions refer to the playlist as it was at the snapshot
+        snapshot_items, removed = self._snapshots[playlist_id, snapshot_id]
+        removed.update(position for item in items for position in item['positions'])
+        return self._set_items(playlist_id, [item for i, item in enumerate(snapshot_items) if i not in removed])
+
+    def playlist_reorder_items(self, playlist_id, range_start, insert_before, range_length=1, snapshot_id=None):
+        self.calls['playlist_reorder_items'] += 1
+        items = self.playlists[playlist_id]['items']
+        block = items[range_start:range_start + range_length]
+        rest = items[:range_start] + items[range_start + range_length:]
+        if insert_before > range_start:
+            insert_before -= range_length
+        return self._set_items(playlist_id, rest[:insert_before] + block + rest[insert_before:])
+
+
+class FakeSpomato(Spomato):
+    """A Spomato object that sends its requests to a FakeSpotify session instead of the Spotify API.
+
+    Parameters
+    ----------
+    spotify : FakeSpotify
+        The fake spotipy session.
+
+    """
+
+    def __init__(self, spotify, **kwargs):
+        self._spotify = spotify
+        super().__init__(access_token='benchmark-token', **kwargs)
+
+    def _get_spotipy_session(self):
+        return self._spotify
@@ -0,0 +1,242 @@
+"""Author: Matthew Russell
+
+Tests of AsyncSpomato against a local aiohttp stub of the Spotify API that serves the data of a FakeSpotify session.
+
+"""
+
+import asyncio
+import threading
+import pytest
+from aiohttp import ClientResponseError, web
+from aiohttp.test_utils import TestServer
+from fake_spotify import FakeSpomato
+from spomato.async_spomato import AsyncSpomato
+from spomato.metrics import InMemoryMetrics
+from spomato.writer import DatasetWriter
+
+
+def make_app(spotify, throttle=0):
+    """Creates an aiohttp application that serves the endpoints AsyncSpomato uses from a FakeSpotify session. The first
+    throttle requests are answered 429 Too Many Requests."""
+    throttled = []
+
+    def page(request):
+        return int(request.query.get('limit', 20)), int(request.query.get('offset', 0))
+
+    @web.middleware
+    async def rate_limit(request, handler):
+        if len(throttled) < throttle:
+            throttled.append(request.path)
+            return web.Response(status=429, headers={'Retry-After': '0'})
+        return await handler(request)
+
+    async def me(request):
+        return web.json_response(spotify.current_user())
+
+    async def saved_tracks(request):
+        limit, offset = page(request)
+        return web.json_response(spotify.current_user_saved_tracks(limit=limit, offset=offset))
+
+    async def playlists(request):
+        limit, offset = page(request)
+        return web.json_response(spotify.current_user_playlists(limit=limit, offset=offset))
+
+    async def playlist(request):
+        return web.json_response(spotify.playlist(request.match_info['playlist_id']))
+
+    async def playlist_tracks(request):
+        limit, offset = page(request)
+        return web.json_response(spotify.playlist_tracks(request.match_info['playlist_id'], limit=limit, offset=offset))
+
+    async def add_tracks(request):
+        payload = await request.json()
+        return web.json_response(spotify.user_playlist_add_tracks(None, request.match_info['playlist_id'],
+                                                                  payload['uris']))
+
+    async def change_tracks(request):
+        payload = await request.json()
+        playlist_id = request.match_info['playlist_id']
+        if 'uris' in payload:
+            return web.json_response(spotify.user_playlist_replace_tracks(None, playlist_id, payload['uris']))
+        return web.json_response(spotify.playlist_reorder_items(playlist_id, payload['range_start'],
+                                                                payload['insert_before']))
+
+    async def remove_tracks(request):
+        payload = await request.json()
+        return web.json_response(spotify.playlist_remove_specific_occurrences_of_items(
+            request.match_info['playlist_id'], payload['tracks'], payload['snapshot_id']))
+
+    async def create_playlist(request):
+        payload = await request.json()
+        return web.json_response(spotify.user_playlist_create(request.match_info['user_id'], payload['name']))
+
+    async def artist_albums(request):
+        limit, offset = page(request)
+        return web.json_response(spotify.artist_albums(request.match_info['artist_id'], limit=limit, offset=offset))
+
+    async def albums(request):
+        return web.json_response(spotify.albums(request.query['ids'].split(',')))
+
+    app = web.Application(middlewares=[rate_limit])
+    app.add_routes([web.get('/me', me),
+                    web.get('/me/tracks', saved_tracks),
+                    web.get('/me/playlists', playlists),
+                    web.get('/playlists/{playlist_id}', playlist),
+                    web.get('/playlists/{playlist_id}/tracks', playlist_tracks),
+                    web.post('/playlists/{playlist_id}/tracks', add_tracks),
+                    web.put('/playlists/{playlist_id}/tracks', change_tracks),
+                    web.delete('/playlists/{playlist_id}/tracks', remove_tracks),
+                    web.post('/users/{user_id}/playlists', create_playlist),
+                    web.get('/artists/{artist_id}/albums', artist_albums),
+                    web.get('/albums', albums)])
+    return app, throttled
+
+
+def run(spotify, func, throttle=0, **kwargs):
+    """Runs a coroutine function with an AsyncSpomato object connected to a stub server of the fake session."""
+    async def main():
+        app, throttled = make_app(spotify, throttle)
+        async with TestServer(app) as server:
+            async with AsyncSpomato('test-token', api_url=str(server.make_url('/')), **kwargs) as sp:
+                return await func(sp), throttled
+    return asyncio.run(main())
+
+
+SOURCE = {'savedtracks': None, 'playlist': ['playlist0', 'playlist1'], 'artist': ['artist0']}
+
+
+def test_get_api_data_matches_spomato(spotify):
+    expected = FakeSpomato(spotify)
+    expected.get_api_data(source=SOURCE)
+
+    async def get_data(sp):
+        await sp.get_api_data(source=SOURCE)
+        return sp.data['default']
+
+    data, _ = run(spotify, get_data)
+    assert sorted(data.song_ids) == sorted(expected.data['default'].song_ids)
+
+
+def test_retry_after(spotify):
+    metrics = InMemoryMetrics()
+
+    async def get_data(sp):
+        await sp.get_api_data(source={'savedtracks': None})
+        return sp.data['default']
+
+    data, throttled = run(spotify, get_data, throttle=2, metrics=metrics)
+    assert len(throttled) == 2
+    assert len(data) > 0
+    assert sum(value for (name, _), value in metrics.counters.items() if name == 'api.retry') == 2
+
+
+def test_retries_exhausted(spotify):
+    async def connect(sp):
+        return sp.current_user_id
+
+    with pytest.raises(ClientResponseError, match='429'):
+        run(spotify, connect, throttle=10, max_retries=1)
+
+
+def test_incremental(spotify):
+    async def refresh(sp):
+        await sp.get_api_data(source={'savedtracks': None})
+        rows = len(sp.data['default'])
+        spotify.saved_tracks.insert(0, {'added_at': '2030-01-01T00:00:00Z', 'track': spotify.saved_tracks[-1]['track']})
+        spotify.calls.clear()
+        await sp.get_api_data(source={'savedtracks': None}, reset=True, incremental=True)
+        return rows, len(sp.data['default']), sp.high_water_marks['default']
+
+    (rows, new_rows, high_water_mark), _ = run(spotify, refresh)
+    assert new_rows == rows
+    assert high_water_mark['added_at'] == '2030-01-01T00:00:00Z'
+    assert spotify.calls['current_user_saved_tracks'] == 1
+
+
+def test_iter_and_stream_api_data(spotify):
+    async def stream(sp):
+        batches = [batch async for batch in sp.iter_api_data(source=SOURCE)]
+        await sp.stream_api_data(data_key='streamed', source=SOURCE)
+        await sp.get_api_data(source=SOURCE)
+        return batches, sp.data
+
+    (batches, data), _ = run(spotify, stream)
+    song_ids = [song_id for batch in batches for song_id in batch.song_ids]
+    assert sorted(song_ids) == sorted(data['default'].song_ids)
+    assert sorted(data['streamed'].song_ids) == sorted(data['default'].song_ids)
+
+
+def test_files_are_written_in_a_thread(spotify, tmp_path, monkeypatch):
+    threads = []
+    cache_data = AsyncSpomato._cache_data  # pylint: disable=protected-access
+    write = DatasetWriter.write
+
+    def record_cache_data(*args, **kwargs):
+        threads.append(threading.current_thread())
+        cache_data(*args, **kwargs)
+
+    def record_write(*args, **kwargs):
+        threads.append(threading.current_thread())
+        write(*args, **kwargs)
+
+    # the files are written outside the thread of the event loop, so they don't block its other requests
+    monkeypatch.setattr(AsyncSpomato, '_cache_data', record_cache_data)
+    monkeypatch.setattr(DatasetWriter, 'write', record_write)
+
+    async def save(sp):
+        await sp.get_api_data(file_path=str(tmp_path / 'saved.csv'), source=SOURCE)
+        await sp.stream_api_data(data_key='streamed', file_path=str(tmp_path / 'streamed.csv'), source=SOURCE)
+        return sp.data
+
+    data, _ = run(spotify, save)
+    assert len(threads) > 1
+    assert threading.main_thread() not in threads
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['saved.csv', 'streamed.csv']
+    assert len(data['streamed']) == len(data['default'])
+
+
+def test_make_playlist(spotify):
+    song_ids = [item['track']['id'] for item in spotify.saved_tracks[:150]]
+
+    async def make(sp):
+        await sp.make_playlist('Async', song_ids)
+        await sp.make_playlist('Async', song_ids[10:] + song_ids[:10], overwrite=True)
+        with pytest.raises(ValueError):
+            await sp.make_playlist('Async', song_ids)
+        return (await sp._get_playlist_index()).get_id('Async')  # pylint: disable=protected-access
+
+    playlist_id, _ = run(spotify, make)
+    assert [item['track']['id'] for item in spotify.playlists[playlist_id]['items']] == song_ids[10:] + song_ids[:10]
+
+
+def test_update_token(spotify):
+    async def update(sp):
+        sp.update_token('new-token')
+        assert sp.current_user_id is None
+        await sp.make_playlist('Token', [spotify.saved_tracks[0]['track']['id']])
+        return sp.current_user_id
+
+    user_id, _ = run(spotify, update)
+    assert user_id == 'benchmark-user'
+
+
+def test_stream_api_data_failure(spotify, tmp_path):
+    file_path = tmp_path / 'streamed.npz'
+    file_path.write_bytes(b'old')
+    source = {'savedtracks': None, 'playlist': ['missing']}
+
+    # the missing playlist fails the download, which leaves the dataset being regenerated and its file as they were
+    async def stream(sp):
+        await sp.get_api_data(source={'playlist': ['playlist0']})
+        song_ids = list(sp.data['default'].song_ids)
+        with pytest.raises(ClientResponseError):
+            await sp.stream_api_data(file_path=str(file_path), source=source, reset=True)
+        with pytest.raises(ClientResponseError):
+            await sp.stream_api_data(data_key='new', source=source)
+        return song_ids, sp.data
+
+    (song_ids, data), _ = run(spotify, stream, max_retries=0)
+    assert list(data['default'].song_ids) == song_ids
+    assert 'new' not in data
+    assert file_path.read_bytes() == b'old'
+    assert [path.name for path in tmp_path.iterdir()] == ['streamed.npz']
@@ -0,0 +1,84 @@
+"""Author: Matthew Russell
+
+Tests of building the datasets of a manifest of jobs across a pool of processes, with worker processes that send their
+requests to a FakeSpotify session instead of the Spotify API.
+
+"""
+
+import json
+import pytest
+from fake_spotify import FakeSpomato, FakeSpotify
+from spomato import bulk
+
+
+class FakePool():
+    """A pool of FakeSpomato objects. A job with the access token 'expired' fails when its object is created."""
+
+    def __init__(self, spotify):
+        self.spotify = spotify
+
+    def get(self, access_token, user_key=None):  # pylint: disable=unused-argument
+        if access_token == 'expired':
+            raise PermissionError('The access token expired.')
+        return FakeSpomato(self.spotify)
+
+    def remove(self, key):
+        pass
+
+
+def init_fake_worker(max_workers, rate):  # pylint: disable=unused-argument
+    spotify = FakeSpotify(saved_tracks=200, playlists=2, artists=2, seed=0)
+    bulk._worker_pool = FakePool(spotify)  # pylint: disable=protected-access
+
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    # the worker processes are forked, so they are initialized with the fake pool
+    monkeypatch.setattr(bulk, '_init_worker', init_fake_worker)
+
+
+def make_manifest(tmp_path):
+    return [{'id': 'saved', 'access_token': 'token', 'file_path': str(tmp_path / 'saved.npz')},
+            {'id': 'expired', 'access_token': 'expired', 'file_path': str(tmp_path / 'expired.npz')},
+            {'id': 'artist', 'access_token': 'token', 'file_path': str(tmp_path / 'artist.parquet'),
+             'source': {'artist': ['artist0']}},
+            {'id': 'invalid', 'access_token': 'token', 'file_path': str(tmp_path / 'invalid.csv'),
+             'source': {'album': ['album0']}}]
+
+
+def test_build_datasets(fake_workers, tmp_path):  # pylint: disable=redefined-outer-name,unused-argument
+    progress = []
+    results = bulk.build_datasets(make_manifest(tmp_path), processes=2,
+                                  progress=lambda done, total, result: progress.append((done, total)))
+
+    # the failed jobs don't stop the others, and leave no file behind
+    assert [result['id'] for result in results] == ['saved', 'expired', 'artist', 'invalid']
+    assert [result['error'] is None for result in results] == [True, False, True, False]
+    assert results[1]['error'] == 'PermissionError: The access token expired.'
+    assert results[3]['error'].startswith('ValueError')
+    assert all(result['songs'] > 0 for result in results if result['error'] is None)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['artist.parquet', 'saved.npz']
+    assert sorted(progress) == [(done, 4) for done in range(1, 5)]
+
+
+def test_build_datasets_arguments():
+    with pytest.raises(TypeError):
+        bulk.build_datasets({'access_token': 'token'})
+    with pytest.raises(ValueError):
+        bulk.build_datasets([{'access_token': 'token'}])
+    with pytest.raises(ValueError):
+        bulk.build_datasets([{'access_token': 'token', 'file_path': 'data.csv', 'reset': True}])
+
+
+@pytest.mark.parametrize('failing', [False, True])
+def test_main(fake_workers, tmp_path, capsys, failing):  # pylint: disable=redefined-outer-name,unused-argument
+    manifest = make_manifest(tmp_path)
+    if not failing:
+        manifest = [job for job in manifest if job['id'] in ['saved', 'artist']]
+    manifest_path = tmp_path / 'manifest.jsonl'
+    manifest_path.write_text(''.join(json.dumps(job) + '\n' for job in manifest), encoding='utf-8')
+
+    status = bulk.main([str(manifest_path), '--processes', '2', '--quiet'])
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert status == (1 if failing else 0)
+    assert [result['id'] for result in results] == [job['id'] for job in manifest]
@@ -0,0 +1,175 @@
+"""Author: Matthew Russell
+
+Tests of the response cache and of the requests session that reads and writes responses through it.
+
+"""
+
+import json
+import random
+import time
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from spomato.cache import ResponseCache
+from spomato.metadata import revalidate_responses
+
+API_URL = 'https://api.spotify.com/v1/'
+
+
+class FakeAdapter(BaseAdapter):
+    """A requests adapter that answers every request with the current body of its url, with an ETag of the body's
+    version, and answers 304 Not Modified if the request's If-None-Match matches it."""
+
+    def __init__(self):
+        super().__init__()
+        self.bodies = {}
+        self.versions = {}
+        self.requests = []
+
+    def set_body(self, url, body):
+        self.bodies[url] = body
+        self.versions[url] = self.versions.get(url, 0) + 1
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        url = request.url.split('?')[0]
+        self.requests.append((request.method, url, request.headers.get('If-None-Match')))
+        etag = f'"{self.versions.get(url, 0)}"'
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.headers = CaseInsensitiveDict({'ETag': etag})
+        if request.method != 'GET':
+            response.status_code = 201
+            response._content = b'{}'  # pylint: disable=protected-access
+        elif request.headers.get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''  # pylint: disable=protected-access
+        else:
+            response.status_code = 200
+            response._content = json.dumps(self.bodies.get(url, {})).encode()  # pylint: disable=protected-access
+        return response
+
+    def close(self):
+        pass
+
+
+def make_session(cache):
+    session = cache.session()
+    adapter = FakeAdapter()
+    session.mount('https://', adapter)
+    return session, adapter
+
+
+def test_set_and_get():
+    cache = ResponseCache()
+    cache.set('key', 'albums', b'body', etag='"1"')
+    assert cache.get('key') == (b'body', '"1"', True)
+    assert cache.get('missing') is None
+    cache.set('stale', 'unknown', b'body')
+    assert cache.get('stale')[2] is False
+
+
+def test_size_and_eviction():
+    cache = ResponseCache(max_bytes=100)
+    assert cache.nbytes == 0
+    cache.set('first', 'albums', b'a')
+    size = cache.nbytes
+    assert size > 0
+    cache.set('first', 'albums', b'a')
+    assert cache.nbytes == size
+    cache.set('second', 'albums', b'b')
+    assert cache.nbytes == 2 * size
+
+    # a large response evicts the least recently used responses until the cache fits
+    cache.get('first')
+    cache.set('third', 'albums', random.Random(0).randbytes(80))
+    assert cache.get('second') is None
+    assert cache.get('first') is not None
+    assert cache.nbytes <= cache.max_bytes
+
+    cache.invalidate(['albums'])
+    assert cache.nbytes == 0
+
+
+def test_size_of_existing_database(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(path=path)
+    cache.set('key', 'albums', b'body')
+    assert ResponseCache(path=path).nbytes == cache.nbytes
+
+
+def test_fresh_responses_are_not_requested():
+    session, adapter = make_session(ResponseCache())
+    adapter.set_body(API_URL + 'albums', {'albums': [1]})
+    assert session.get(API_URL + 'albums', params={'ids': 'a'}).json() == {'albums': [1]}
+    assert session.get(API_URL + 'albums', params={'ids': 'a'}).json() == {'albums': [1]}
+    assert session.get(API_URL + 'albums', params={'ids': 'b'}).json() == {'albums': [1]}
+    assert len(adapter.requests) == 2
+
+
+def test_stale_responses_are_revalidated():
+    session, adapter = make_session(ResponseCache(ttls={'albums': 0.01}))
+    adapter.set_body(API_URL + 'albums', {'albums': [1]})
+    session.get(API_URL + 'albums')
+    time.sleep(0.02)
+    assert session.get(API_URL + 'albums').json() == {'albums': [1]}
+    assert adapter.requests[-1] == ('GET', API_URL + 'albums', '"1"')
+
+    adapter.set_body(API_URL + 'albums', {'albums': [2]})
+    time.sleep(0.02)
+    assert session.get(API_URL + 'albums').json() == {'albums': [2]}
+
+
+def test_revalidate_responses():
+    session, adapter = make_session(ResponseCache())
+    url = API_URL + 'playlists/playlist0'
+    adapter.set_body(url, {'snapshot_id': 'first'})
+    session.get(url)
+    adapter.set_body(url, {'snapshot_id': 'second'})
+
+    # the cached playlist is still fresh, so it is only seen to have changed when it is revalidated
+    assert session.get(url).json() == {'snapshot_id': 'first'}
+    with revalidate_responses():
+        assert session.get(url).json() == {'snapshot_id': 'second'}
+        assert session.get(url).json() == {'snapshot_id': 'second'}
+    assert [etag for _, _, etag in adapter.requests] == [None, '"1"', '"2"']
+
+
+def test_writes_invalidate():
+    session, adapter = make_session(ResponseCache())
+    adapter.set_body(API_URL + 'me/playlists', {'items': [1]})
+    adapter.set_body(API_URL + 'playlists/playlist0', {'snapshot_id': 'first'})
+    session.get(API_URL + 'me/playlists')
+    session.get(API_URL + 'playlists/playlist0')
+
+    # changing a playlist drops the cached playlists and the cached listing of the user's playlists
+    session.post(API_URL + 'playlists/playlist0/tracks', json={'uris': []})
+    session.get(API_URL + 'me/playlists')
+    session.get(API_URL + 'playlists/playlist0')
+    assert [method for method, _, _ in adapter.requests] == ['GET', 'GET', 'POST', 'GET', 'GET']
+    assert adapter.requests[-1][2] is None
+
+
+def test_writes_invalidate_only_their_user():
+    cache = ResponseCache()
+    session, adapter = make_session(cache)
+    for url in ['me/playlists', 'playlists/playlist0', 'playlists/playlist1']:
+        adapter.set_body(API_URL + url, {'url': url})
+    tokens = [{'Authorization': 'Bearer first'}, {'Authorization': 'Bearer second'}]
+    for headers in tokens:
+        for url in ['me/playlists', 'playlists/playlist0', 'playlists/playlist1']:
+            session.get(API_URL + url, headers=headers)
+
+    # the first user changing playlist0 drops that playlist for both users, but only the first user's listing
+    session.post(API_URL + 'playlists/playlist0/tracks', json={'uris': []}, headers=tokens[0])
+    requested = len(adapter.requests)
+    session.get(API_URL + 'me/playlists', headers=tokens[1])
+    session.get(API_URL + 'playlists/playlist1', headers=tokens[0])
+    session.get(API_URL + 'playlists/playlist1', headers=tokens[1])
+    assert len(adapter.requests) == requested
+    for headers in tokens:
+        session.get(API_URL + 'playlists/playlist0', headers=headers)
+    session.get(API_URL + 'me/playlists', headers=tokens[0])
+    assert [url for _, url, _ in adapter.requests[requested:]] == [API_URL + 'playlists/playlist0',
+                                                                  API_URL + 'playlists/playlist0',
+                                                                  API_URL + 'me/playlists']
@@ -0,0 +1,42 @@
+"""Author: Matthew Russell
+
+Benchmarks of combining stored datasets into new datasets.
+
+"""
+
+import numpy as np
+import pytest
+from spomato.dataset import Dataset
+
+
+@pytest.fixture
+def combiner(sp, song_df, seed):
+    # two overlapping datasets, like the saved tracks of a user and the songs of an artist they follow
+    rng = np.random.default_rng(seed)
+    dataset = Dataset.from_frame(song_df)
+    sp.data['saved'] = dataset.take(np.sort(rng.choice(len(dataset), len(dataset) // 2, replace=False)))
+    sp.data['artist'] = dataset.take(np.sort(rng.choice(len(dataset), len(dataset) // 4, replace=False)))
+    return sp
+
+
+def test_union_data(benchmark, combiner):
+    benchmark(combiner.union_data, 'combined', ['saved', 'artist'], reset=True)
+    combined = set(combiner.data['saved'].song_ids) | set(combiner.data['artist'].song_ids)
+    assert sorted(combiner.data['combined'].song_ids) == sorted(combined)
+
+
+def test_intersect_data(benchmark, combiner):
+    benchmark(combiner.intersect_data, 'combined', ['saved', 'artist'], reset=True)
+    combined = set(combiner.data['saved'].song_ids) & set(combiner.data['artist'].song_ids)
+    assert sorted(combiner.data['combined'].song_ids) == sorted(combined)
+
+
+def test_subtract_data(benchmark, combiner):
+    benchmark(combiner.subtract_data, 'combined', 'saved', ['artist'], reset=True)
+    combined = set(combiner.data['saved'].song_ids) - set(combiner.data['artist'].song_ids)
+    assert sorted(combiner.data['combined'].song_ids) == sorted(combined)
+
+
+def test_filter_data(benchmark, combiner):
+    benchmark(combiner.filter_data, 'combined', 'saved', min_time=2, max_time=5, reset=True)
+    assert ((combiner.data['combined'].time >= 120) & (combiner.data['combined'].time <= 300)).all()
@@ -0,0 +1,19 @@
+"""Author: Matthew Russell
+
+Tests that importing Spomato doesn't import the libraries it only needs once it accesses the Spotify API or files.
+
+"""
+
+import subprocess
+import sys
+import pytest
+
+LAZY_MODULES = ['requests', 'urllib3', 'sqlite3', 'spotipy', 'pandas', 'pyarrow']
+
+
+@pytest.mark.parametrize('module', ['spomato', 'spomato.spomato', 'spomato.history', 'spomato.scheduler'])
+def test_import_is_lazy(module):
+    # each import runs in a new interpreter, since the test session has already imported these libraries
+    code = f'import sys, {module}; print(",".join(name for name in {LAZY_MODULES!r} if name in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
@@ -0,0 +1,162 @@
+"""Author: Matthew Russell
+
+Benchmarks of building datasets from the fake Spotify API, and the number of requests each build makes.
+
+"""
+
+import math
+import threading
+import time
+import pytest
+from fake_spotify import FakeSpomato
+
+SOURCES = {'savedtracks': {'savedtracks': None},
+           'playlist': {'playlist': ['playlist0', 'playlist1', 'playlist2']},
+           'artist': {'artist': ['artist0', 'artist1']}}
+
+
+def get_expected_calls(spotify, source):
+    """Gets the number of requests of each endpoint a build from a source should make."""
+    if 'savedtracks' in source:
+        return {'current_user_saved_tracks': math.ceil(len(spotify.saved_tracks) / 50)}
+    if 'playlist' in source:
+        pages = sum(math.ceil(len(spotify.playlists[pl_id]['items']) / 100) for pl_id in source['playlist'])
+        return {'current_user': 1,
+                'current_user_playlists': math.ceil(len(spotify.playlists) / 50),
+                'user_playlist': len(source['playlist']),
+                'playlist_tracks': pages - len(source['playlist'])}
+    albums = [len(spotify.artists[artist_id]) for artist_id in source['artist']]
+    return {'artist_albums': sum(math.ceil(n / 20) for n in albums),
+            'albums': sum(math.ceil(n / 20) for n in albums)}
+
+
+@pytest.mark.parametrize('source_type', list(SOURCES))
+def test_get_new_data_calls(spotify, source_type):
+    sp = FakeSpomato(spotify)
+    data = sp._get_new_data(SOURCES[source_type], 'US')  # pylint: disable=protected-access
+    assert len(data) > 0
+    assert dict(spotify.calls) == get_expected_calls(spotify, SOURCES[source_type])
+
+
+@pytest.mark.parametrize('source_type', list(SOURCES))
+def test_get_new_data(benchmark, sp, spotify, source_type):
+    data = benchmark(sp._get_new_data, SOURCES[source_type], 'US')  # pylint: disable=protected-access
+    benchmark.extra_info['songs'] = len(data)
+    benchmark.extra_info['calls'] = dict(spotify.calls)
+    assert len(data) > 0
+
+
+def test_get_new_data_all_sources(benchmark, sp):
+    source = {key: value for source in SOURCES.values() for key, value in source.items()}
+    data = benchmark(sp._get_new_data, source, 'US')  # pylint: disable=protected-access
+    assert len(data) == len(data.drop_duplicates())
+
+
+class SlowSpotify():
+    """Wraps a FakeSpotify session so each request takes a little time, and counts the most requests in flight."""
+
+    def __init__(self, spotify):
+        self.spotify = spotify
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.spotify, name)
+
+        def call(*args, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                time.sleep(0.002)
+                return method(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        return call
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_get_new_data_max_workers(spotify, max_workers):
+    source = {key: value for source in SOURCES.values() for key, value in source.items()}
+    expected = FakeSpomato(spotify)._get_new_data(source, 'US')  # pylint: disable=protected-access
+    slow = SlowSpotify(spotify)
+    sp = FakeSpomato(slow, max_workers=max_workers)
+    data = sp._get_new_data(source, 'US')  # pylint: disable=protected-access
+    assert list(data.song_ids) == list(expected.song_ids)
+    assert 1 <= slow.max_in_flight <= max_workers
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.feather', '.npz', '.csv'])
+def test_incremental_after_load(spotify, tmp_path, extension):
+    file_path = str(tmp_path / ('saved' + extension))
+    FakeSpomato(spotify).get_api_data(file_path=file_path, source={'savedtracks': None})
+    spotify.saved_tracks.insert(0, {'added_at': '2030-01-01T00:00:00Z', 'track': spotify.saved_tracks[-1]['track']})
+
+    # the high water mark is loaded with the file, except from csv files, which can't keep it
+    sp = FakeSpomato(spotify)
+    sp.get_file_data(file_path=file_path)
+    spotify.calls.clear()
+    sp.get_api_data(source={'savedtracks': None}, reset=True, incremental=True)
+    assert sp.high_water_marks['default']['added_at'] == '2030-01-01T00:00:00Z'
+    if extension == '.csv':
+        assert spotify.calls['current_user_saved_tracks'] == math.ceil(len(spotify.saved_tracks) / 50)
+    else:
+        assert spotify.calls['current_user_saved_tracks'] == 1
+
+
+class FailingSpotify():
+    """Wraps a FakeSpotify session so that requests fail once a number of them have been made."""
+
+    def __init__(self, spotify, calls):
+        self.spotify = spotify
+        self.calls = calls
+
+    def __getattr__(self, name):
+        method = getattr(self.spotify, name)
+
+        def call(*args, **kwargs):
+            self.calls -= 1
+            if self.calls < 0:
+                raise ConnectionError('The connection was lost.')
+            return method(*args, **kwargs)
+        return call
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.feather', '.npz'])
+def test_stream_api_data(spotify, tmp_path, extension):
+    source = {key: value for source in SOURCES.values() for key, value in source.items()}
+    file_path = str(tmp_path / ('streamed' + extension))
+    sp = FakeSpomato(spotify)
+    sp.stream_api_data(data_key='streamed', file_path=file_path, source=source)
+    sp.get_api_data(source=source)
+    sp.get_file_data(data_key='loaded', file_path=file_path)
+    assert sorted(sp.data['streamed'].song_ids) == sorted(sp.data['default'].song_ids)
+    assert list(sp.data['loaded'].song_ids) == list(sp.data['streamed'].song_ids)
+    assert [path.name for path in tmp_path.iterdir()] == ['streamed' + extension]
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.npz'])
+def test_stream_api_data_failure(spotify, tmp_path, extension):
+    file_path = str(tmp_path / ('streamed' + extension))
+    sp = FakeSpomato(spotify)
+    sp.stream_api_data(file_path=file_path, source=SOURCES['savedtracks'])
+    song_ids = list(sp.data['default'].song_ids)
+    with open(file_path, 'rb') as file:
+        contents = file.read()
+
+    # a failed download leaves the dataset being regenerated and its file as they were, and drops a new dataset
+    failing_spotify = FailingSpotify(spotify, calls=5)
+    failing = FakeSpomato(failing_spotify)
+    failing.data['default'] = sp.data['default']
+    with pytest.raises(ConnectionError):
+        failing.stream_api_data(file_path=file_path, source=SOURCES['savedtracks'], reset=True)
+    failing_spotify.calls = 5
+    with pytest.raises(ConnectionError):
+        failing.stream_api_data(data_key='new', source=SOURCES['savedtracks'])
+    assert list(failing.data['default'].song_ids) == song_ids
+    assert 'new' not in failing.data
+    with open(file_path, 'rb') as file:
+        assert file.read() == contents
+    assert [path.name for path in tmp_path.iterdir()] == ['streamed' + extension]
@@ -0,0 +1,91 @@
+"""Author: Matthew Russell
+
+Benchmarks of the number of requests make_playlist makes to create and overwrite playlists.
+
+"""
+
+import random
+import pandas as pd
+import pytest
+from fake_spotify import FakeSpomato
+
+WRITE_CALLS = ['user_playlist_create',
+               'user_playlist_add_tracks',
+               'user_playlist_replace_tracks',
+               'playlist_remove_specific_occurrences_of_items',
+               'playlist_reorder_items']
+
+
+def get_song_ids(spotify, playlist_id):
+    return [item['track']['id'] for item in spotify.playlists[playlist_id]['items']]
+
+
+def get_write_calls(spotify):
+    return sum(spotify.calls[call] for call in WRITE_CALLS)
+
+
+@pytest.fixture
+def song_ids(spotify):
+    return [item['track']['id'] for item in spotify.saved_tracks[:250]]
+
+
+def edit(song_ids, change, seed):
+    """Changes a list of song ids the way a regenerated playlist might change."""
+    rng = random.Random(seed)
+    if change == 'same':
+        return list(song_ids)
+    if change == 'swap':
+        i = rng.randrange(len(song_ids) - 1)
+        return song_ids[:i] + [song_ids[i + 1], song_ids[i]] + song_ids[i + 2:]
+    if change == 'replace_five':
+        return song_ids[5:] + song_ids[-5:][::-1]
+    return rng.sample(song_ids, len(song_ids))
+
+
+# the most write requests each change should take for a 250 song playlist
+EXPECTED_WRITE_CALLS = {'same': 0, 'swap': 1, 'replace_five': 2, 'shuffle': 3}
+
+
+def test_make_playlist_create(benchmark, spotify, song_ids):
+    sp = FakeSpomato(spotify)
+
+    def create():
+        sp.make_playlist('Benchmark', pd.DataFrame({'song_id': song_ids}), overwrite=True)
+
+    spotify.calls.clear()
+    create()
+    assert get_write_calls(spotify) == 1 + 3
+    playlist_id = sp._get_playlist_index().get_id('Benchmark')  # pylint: disable=protected-access
+    assert get_song_ids(spotify, playlist_id) == song_ids
+    benchmark(create)
+
+
+@pytest.mark.parametrize('change', list(EXPECTED_WRITE_CALLS))
+def test_make_playlist_overwrite(benchmark, spotify, song_ids, seed, change):
+    sp = FakeSpomato(spotify)
+    sp.make_playlist('Benchmark', pd.DataFrame({'song_id': song_ids}))
+    playlist_id = sp._get_playlist_index().get_id('Benchmark')  # pylint: disable=protected-access
+    new_song_ids = edit(song_ids, change, seed)
+
+    spotify.calls.clear()
+    sp.make_playlist('Benchmark', pd.DataFrame({'song_id': new_song_ids}), overwrite=True)
+    assert get_song_ids(spotify, playlist_id) == new_song_ids
+    assert get_write_calls(spotify) <= EXPECTED_WRITE_CALLS[change]
+    benchmark.extra_info['calls'] = dict(spotify.calls)
+
+    def overwrite():
+        sp.make_playlist('Benchmark', pd.DataFrame({'song_id': song_ids}), overwrite=True)
+        sp.make_playlist('Benchmark', pd.DataFrame({'song_id': new_song_ids}), overwrite=True)
+
+    benchmark(overwrite)
+
+
+def test_make_playlist_overwrite_small(spotify, song_ids):
+    sp = FakeSpomato(spotify)
+    sp.make_playlist('Benchmark', pd.DataFrame({'song_id': song_ids[:50]}))
+    playlist_id = sp._get_playlist_index().get_id('Benchmark')  # pylint: disable=protected-access
+
+    spotify.calls.clear()
+    sp.make_playlist('Benchmark', pd.DataFrame({'song_id': song_ids[50:100]}), overwrite=True)
+    assert get_song_ids(spotify, playlist_id) == song_ids[50:100]
+    assert dict(spotify.calls) == {'user_playlist_replace_tracks': 1}
@@ -0,0 +1,77 @@
+"""Author: Matthew Russell
+
+Tests of the metrics Spomato records about its requests to a FakeSpotify session, its datasets and its track picks.
+
+"""
+
+import pytest
+from fake_spotify import FakeSpomato
+from spomato.metrics import InMemoryMetrics
+
+SOURCE = {'savedtracks': None, 'playlist': ['playlist0'], 'artist': ['artist0']}
+
+
+def get_tagged(summaries, name):
+    """Gets the recorded values of a metric keyed by their tags."""
+    return {dict(tags).get('endpoint', dict(tags).get('source', dict(tags).get('method'))): value
+            for (metric, tags), value in summaries.items() if metric == name}
+
+
+def test_in_memory_metrics():
+    metrics = InMemoryMetrics()
+    metrics.increment('count')
+    metrics.increment('count', 2)
+    metrics.increment('count', tags={'endpoint': 'albums'})
+    metrics.observe('size', 3, {'b': 2, 'a': 1})
+    metrics.observe('size', 1, {'a': 1, 'b': 2})
+    with metrics.timer('seconds'):
+        pass
+
+    # tags are keyed in sorted order, so the order they are given in doesn't matter
+    assert metrics.counters == {('count', ()): 3, ('count', (('endpoint', 'albums'),)): 1}
+    assert metrics.distributions[('size', (('a', 1), ('b', 2)))] == {'count': 2, 'sum': 4, 'min': 1, 'max': 3}
+    assert metrics.distributions[('seconds', ())]['count'] == 1
+    metrics.reset()
+    assert not metrics.counters and not metrics.distributions
+
+
+def test_get_api_data_metrics(spotify):
+    metrics = InMemoryMetrics()
+    sp = FakeSpomato(spotify, metrics=metrics)
+    sp.get_api_data(source=SOURCE)
+
+    # each call to the session is timed by the name of the spotipy method
+    requests = get_tagged(metrics.distributions, 'api.request')
+    assert {endpoint: summary['count'] for endpoint, summary in requests.items()} == dict(spotify.calls)
+    assert metrics.distributions[('dataset.build', ())]['count'] == 1
+    rows = get_tagged(metrics.distributions, 'dataset.rows')
+    assert rows['savedtracks,playlist,artist']['sum'] == len(sp.data['default'])
+    fetched = get_tagged(metrics.distributions, 'dataset.rows_fetched')
+    assert fetched['savedtracks,playlist,artist']['sum'] >= len(sp.data['default'])
+    assert metrics.counters[('api.pages', ())] > 0
+
+
+def test_api_error_metrics(spotify):
+    metrics = InMemoryMetrics()
+    sp = FakeSpomato(spotify, metrics=metrics)
+    with pytest.raises(KeyError):
+        sp.spotipy_session.playlist('missing')
+    assert metrics.counters == {('api.error', (('endpoint', 'playlist'),)): 1}
+    assert get_tagged(metrics.distributions, 'api.request')['playlist']['count'] == 1
+
+
+@pytest.mark.parametrize('method', ['random', 'fill'])
+def test_pick_metrics(spotify, seed, method):
+    metrics = InMemoryMetrics()
+    sp = FakeSpomato(spotify, metrics=metrics)
+    sp.get_api_data(source={'savedtracks': None})
+    sp.pick_tracks('default', time=25, extra=5, method=method, seed=seed)
+    sp.pick_tracks('default', time=25, extra=5, method=method, seed=seed)
+    sp.make_playlist('Metrics', [spotify.saved_tracks[0]['track']['id']])
+
+    assert get_tagged(metrics.distributions, 'pick.tracks')[method]['count'] == 1
+    assert metrics.counters[('pick.cached', ())] == 1
+    stats = ['draws', 'compactions'] if method == 'random' else ['random_picks', 'solver_cells']
+    for name in stats:
+        assert method in get_tagged(metrics.distributions, f'pick.{name}')
+    assert metrics.distributions[('playlist.write', ())]['count'] == 1
@@ -0,0 +1,33 @@
+"""Author: Matthew Russell
+
+Benchmarks of parsing Spotify API responses into datasets.
+
+"""
+
+from spomato.spomato import Spomato
+
+
+def test_parse_tracks(benchmark, playlist_page):
+    tracks = [item['track'] for item in playlist_page['items']]
+    data = benchmark(Spomato._parse_tracks, tracks, 'US')
+    assert len(data) == sum('US' in track['available_markets'] for track in tracks)
+
+
+def test_parse_public_playlist(benchmark, playlist_page):
+    data = benchmark(Spomato._parse_public_playlist, playlist_page, 'US')
+    assert 0 < len(data) <= len(playlist_page['items'])
+
+
+def test_parse_user_playlist(benchmark, playlist_page):
+    data = benchmark(Spomato._parse_user_playlist, {'tracks': playlist_page}, 'US')
+    assert 0 < len(data) <= len(playlist_page['items'])
+
+
+def test_parse_saved_tracks(benchmark, saved_track_page):
+    data = benchmark(Spomato._parse_saved_tracks, saved_track_page, 'US')
+    assert 0 < len(data) <= len(saved_track_page)
+
+
+def test_parse_album(benchmark, album):
+    data = benchmark(Spomato._parse_album, album, 'US')
+    assert 0 < len(data) <= len(album['tracks']['items'])
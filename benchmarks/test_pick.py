@@ -0,0 +1,86 @@
+"""Author: Matthew Russell
+
+Benchmarks of picking the tracks of playlists from a dataset.
+
+"""
+
+from collections import Counter
+import numpy as np
+import pytest
+from spomato.dataset import Dataset, hash_song_ids
+from spomato.history import PlayHistory
+
+
+@pytest.fixture
+def picker(sp, song_df):
+    sp.data['benchmark'] = Dataset.from_frame(song_df)
+    return sp
+
+
+@pytest.mark.parametrize('method', ['random', 'fill'])
+def test_pick_tracks(benchmark, picker, seed, method):
+    rng = np.random.default_rng(seed)
+    picked_df = benchmark(picker.pick_tracks, 'benchmark', time=25, extra=5, method=method, rng=rng)
+    assert 25 * 60 <= picked_df['time'].sum() <= 30 * 60
+
+
+def test_pick_tracks_long(benchmark, picker, seed):
+    rng = np.random.default_rng(seed)
+    picked_df = benchmark(picker.pick_tracks, 'benchmark', time=600, extra=5, time_limit=10, rng=rng)
+    assert 600 * 60 <= picked_df['time'].sum() <= 605 * 60
+
+
+def test_pick_tracks_cached(benchmark, picker, seed):
+    picked_df = picker.pick_tracks('benchmark', time=25, extra=5, seed=seed)
+    assert benchmark(picker.pick_tracks, 'benchmark', time=25, extra=5, seed=seed).equals(picked_df)
+
+
+def test_pick_tracks_batch(benchmark, picker, seed):
+    batch_df = benchmark(picker.pick_tracks_batch, 'benchmark', n=100, time=25, extra=5, seed=seed)
+    assert batch_df['playlist'].nunique() == 100
+
+
+def test_pick_tracks_history(benchmark, picker, seed):
+    picker.history = PlayHistory()
+    rng = np.random.default_rng(seed)
+    first_df = picker.pick_tracks('benchmark', time=25, extra=5, rng=rng)
+    second_df = picker.pick_tracks('benchmark', time=25, extra=5, rng=rng)
+    assert not set(first_df['song_id']) & set(second_df['song_id'])
+    benchmark(picker.pick_tracks, 'benchmark', time=25, extra=5, rng=rng, as_frame=False)
+
+
+def test_pick_tracks_history_not_cached(picker, seed):
+    picker.history = PlayHistory()
+    first_df = picker.pick_tracks('benchmark', time=25, extra=5, seed=seed)
+    second_df = picker.pick_tracks('benchmark', time=25, extra=5, seed=seed)
+
+    # each pick changes the history, so the seeded picks aren't cached, but are still picked apart
+    assert len(picker.pick_cache) == 0
+    assert not set(first_df['song_id']) & set(second_df['song_id'])
+    picker.pick_tracks('benchmark', time=25, extra=5, seed=seed, avoid_recent=False)
+    assert len(picker.pick_cache) == 1
+
+
+@pytest.mark.parametrize('budget', [0, 1000, 10000, 100000])
+def test_pick_tracks_fill_budget(picker, seed, budget):
+    stats = Counter()
+    durations = np.sort(picker.data['benchmark'].duration_ms / 1000)
+    rng = np.random.default_rng(seed)
+    picked = picker._fill_positions(durations, 25 * 60, 5 * 60, rng, budget=budget,  # pylint: disable=protected-access
+                                    stats=stats)
+    assert len(set(picked)) == len(picked)
+    assert 25 * 60 < durations[picked].sum() <= 30 * 60
+    assert stats['solver_cells'] <= budget
+    if budget >= 10000:
+        assert durations[picked].sum() <= 25 * 60 + 10
+
+
+def test_pick_tracks_history_hashes(picker, seed):
+    picker.history = PlayHistory()
+    dataset = picker.data['benchmark']
+    picked_df = picker.pick_tracks('benchmark', time=25, extra=5, seed=seed)
+
+    # the hashes of the dataset are computed once and are the ones the history remembers
+    assert dataset.hashes is dataset.hashes
+    assert list(dataset.hashes) == list(hash_song_ids(dataset.song_ids))
+    assert set(dataset.song_ids[picker.history.contains(dataset.hashes)]) == set(picked_df['song_id'])
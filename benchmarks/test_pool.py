@@ -0,0 +1,89 @@
+"""Author: Matthew Russell
+
+Tests of serving the Spomato objects of many users from a SpomatoPool.
+
+"""
+
+from fake_spotify import FakeSpotify
+from spomato.history import PlayHistory
+from spomato.pool import SpomatoPool
+
+
+def test_shared_session_and_cache():
+    pool = SpomatoPool(max_workers=2)
+    first = pool.get('token-a')
+    second = pool.get('token-b')
+    assert first is not second
+    assert first.requests_session is second.requests_session is pool.requests_session
+    assert first.metadata_cache is second.metadata_cache is pool.metadata_cache
+    assert first.max_workers == second.max_workers == 2
+
+
+def test_least_recently_used_are_evicted():
+    pool = SpomatoPool(max_clients=2)
+    first = pool.get('token-a')
+    pool.get('token-b')
+    assert pool.get('token-a') is first
+
+    # token-b is now the least recently used, so it is dropped for token-c
+    pool.get('token-c')
+    assert len(pool) == 2
+    assert pool.get('token-a') is first
+    pool.get('token-b')
+    assert len(pool) == 2
+    pool.remove('token-a')
+    assert len(pool) == 1
+    assert pool.get('token-a') is not first
+
+
+def test_dropped_clients_are_closed(spotify):
+    pool = SpomatoPool(max_workers=4, max_clients=2)
+    source = {'playlist': ['playlist0', 'playlist1']}
+    clients = []
+    executors = []
+    for token in ['token-a', 'token-b', 'token-c']:
+        sp = pool.get(token)
+        sp.spotipy_session = spotify
+        sp.get_api_data(source=source)
+        clients.append(sp)
+        executors.append(sp._executor)  # pylint: disable=protected-access
+
+    # the evicted, removed and closed clients shut down their thread pools, and a closed client still works
+    assert executors[0]._shutdown and not executors[1]._shutdown  # pylint: disable=protected-access
+    pool.remove('token-b')
+    assert executors[1]._shutdown and not executors[2]._shutdown  # pylint: disable=protected-access
+    pool.close()
+    assert len(pool) == 0
+    assert all(sp._executor is None for sp in clients) and executors[2]._shutdown  # pylint: disable=protected-access
+    clients[2].get_api_data(source=source, reset=True)
+    assert len(clients[2].data['default']) > 0
+    clients[2].close()
+
+
+def test_token_refresh(spotify):
+    pool = SpomatoPool()
+    sp = pool.get('old-token', user_key='user')
+    sp.spotipy_session = spotify
+    sp.get_api_data(source={'savedtracks': None})
+    assert sp.current_user_id == 'benchmark-user'
+
+    # the user's object and its datasets are kept, and its session is recreated with the new token
+    refreshed = pool.get('new-token', user_key='user')
+    assert refreshed is sp
+    assert refreshed.access_token == 'new-token'
+    assert len(refreshed.data['default']) > 0
+    assert refreshed._spotipy_session is None  # pylint: disable=protected-access
+    assert refreshed._current_user_id is None  # pylint: disable=protected-access
+    new_spotify = FakeSpotify(saved_tracks=10, playlists=1, artists=1)
+    refreshed.spotipy_session = new_spotify
+    assert refreshed.current_user_id == 'benchmark-user'
+    assert new_spotify.calls['current_user'] == 1
+
+
+def test_history():
+    pool = SpomatoPool()
+    history = PlayHistory()
+    sp = pool.get('token', user_key='user')
+    assert sp.history is None
+    assert pool.get('token', user_key='user', history=history).history is history
+    assert pool.get('token', user_key='user').history is history
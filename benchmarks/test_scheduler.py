@@ -0,0 +1,112 @@
+"""Author: Matthew Russell
+
+Tests of the request scheduler, its priority lanes and its handling of 429 responses, and of the http adapter that
+sends the requests of a spotipy session through it.
+
+"""
+
+import io
+import json
+import threading
+import time
+from email.utils import formatdate
+import pytest
+import requests
+import spotipy
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from spomato.scheduler import RequestScheduler, get_retry_after, request_priority
+
+
+def wait_for(condition, timeout=5):
+    """Waits until a condition is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_get_retry_after():
+    assert get_retry_after({}) is None
+    assert get_retry_after({'Retry-After': '2'}) == 2
+    assert get_retry_after({'Retry-After': '-1'}) == 0
+    assert get_retry_after({'Retry-After': 'soon'}) is None
+    assert 8 < get_retry_after({'Retry-After': formatdate(time.time() + 10, usegmt=True)}) <= 10
+
+
+def test_rate():
+    scheduler = RequestScheduler(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(15):
+        scheduler.acquire()
+    # the burst is sent at once, and the rest at the rate
+    assert time.monotonic() - start >= 10 / 50 * 0.9
+    assert scheduler.stats()['requests'] == 15
+
+
+def test_priority_lanes():
+    scheduler = RequestScheduler(rate=20, burst=1)
+    scheduler.acquire()
+    sent = []
+
+    def send(priority):
+        with request_priority(priority):
+            scheduler.acquire()
+        sent.append(priority)
+
+    # the bulk request waits first, but the interactive request is sent ahead of it
+    bulk = threading.Thread(target=send, args=('bulk',))
+    bulk.start()
+    wait_for(lambda: scheduler.stats()['queued']['bulk'] == 1)
+    interactive = threading.Thread(target=send, args=('interactive',))
+    interactive.start()
+    bulk.join()
+    interactive.join()
+    assert sent == ['interactive', 'bulk']
+    assert scheduler.stats()['max_queued'] == 2
+
+    with pytest.raises(ValueError):
+        with request_priority('urgent'):
+            pass
+
+
+def test_wait_to_retry():
+    scheduler = RequestScheduler(rate=1000, max_retries=2, backoff_factor=0.01)
+    assert not scheduler.wait_to_retry(404, {}, 0)
+    assert scheduler.wait_to_retry(503, {}, 0)
+    assert not scheduler.wait_to_retry(503, {}, 2)
+
+    # a 429 pauses every request for its Retry-After header
+    assert scheduler.wait_to_retry(429, {'Retry-After': '0.2'}, 0)
+    start = time.monotonic()
+    scheduler.acquire()
+    assert time.monotonic() - start >= 0.15
+    stats = scheduler.stats()
+    assert stats['throttled'] == 1
+    assert stats['retries'] == 2
+
+
+def test_adapter(spotify, monkeypatch):
+    scheduler = RequestScheduler(rate=1000, max_retries=3)
+    statuses = [429, 503, 200]
+    sent = []
+
+    def send(adapter, request, *args, **kwargs):  # pylint: disable=unused-argument
+        sent.append(request.url)
+        response = requests.Response()
+        response.status_code = statuses.pop(0)
+        response.headers = CaseInsensitiveDict({'Retry-After': '0', 'Content-Type': 'application/json'})
+        response.url = request.url
+        response.request = request
+        response.raw = io.BytesIO(json.dumps(spotify.current_user()).encode())
+        return response
+
+    # the adapter retries the 429 and 503 responses itself, so spotipy only sees the final response
+    monkeypatch.setattr(HTTPAdapter, 'send', send)
+    session = requests.Session()
+    session.mount('https://', scheduler.adapter())
+    client = spotipy.Spotify(auth='token', requests_session=session, retries=0)
+    assert client.current_user()['id'] == 'benchmark-user'
+    assert len(sent) == 3
+    assert scheduler.stats()['throttled'] == 1
+    assert scheduler.stats()['retries'] == 2
@@ -38,9 +38,18 @@ setup(name='spomato',
       py_modules=['spomato'],
       packages=['spomato'],
       install_requires=[
+          'numpy',
           'pandas',
           'spotipy'
           ],
+      extras_require={
+          'async': ['aiohttp'],
+          'arrow': ['pyarrow'],
+          'benchmark': ['pytest', 'pytest-benchmark']
+          },
+      entry_points={
+          'console_scripts': ['spomato-build=spomato.bulk:main']
+          },
       include_package_data=True,
 
       zip_safe=False)
@@ -0,0 +1,45 @@
+"""Author: Matthew Russell
+
+This contains the http adapter that sends the requests of a requests session through a RequestScheduler. It is kept
+apart from spomato.scheduler so the scheduler can be imported without requests.
+
+"""
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ScheduledAdapter(HTTPAdapter):
+    """An http adapter that waits for a RequestScheduler before sending each request, and retries requests that fail
+    with a retryable status. Failed connections are retried the same way a default spotipy session does.
+
+    Parameters
+    ----------
+    scheduler : RequestScheduler
+        The scheduler to send requests through.
+    pool_maxsize : int
+        The number of connections to keep alive for reuse.
+
+    Attributes
+    ----------
+    scheduler : RequestScheduler
+        The scheduler to send requests through.
+
+    """
+
+    def __init__(self, scheduler, pool_maxsize=10):
+        super().__init__(pool_maxsize=pool_maxsize,
+                         max_retries=Retry(total=3, connect=None, read=False, backoff_factor=0.3,
+                                           respect_retry_after_header=False))
+        self.scheduler = scheduler
+
+
+    def send(self, request, *args, **kwargs):  # pylint: disable=arguments-differ
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            response = super().send(request, *args, **kwargs)
+            if not self.scheduler.wait_to_retry(response.status_code, response.headers, attempt):
+                return response
+            response.close()
+            attempt += 1
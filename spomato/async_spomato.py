@@ -0,0 +1,767 @@
+"""Author: Matthew Russell
+
+This contains the AsyncSpomato class, an asyncio version of Spomato for use inside async applications such as aiohttp
+services. It requires the aiohttp package.
+
+"""
+
+# the coroutines mirror the blocking methods of Spomato, so their argument handling is alike
+# pylint: disable=duplicate-code
+
+import asyncio
+import json
+import random
+from time import perf_counter
+import aiohttp
+from spomato.async_playlists import AsyncPlaylistMixin
+from spomato.base import ALBUM_BATCH_SIZE, SpomatoBase
+from spomato.metadata import get_endpoint_type
+from spomato.dataset import Dataset
+from spomato.metrics import timed
+from spomato.scheduler import RETRY_STATUSES, get_retry_after
+
+API_URL = 'https://api.spotify.com/v1/'
+
+
+class AsyncSpomato(AsyncPlaylistMixin, SpomatoBase):  # pylint: disable=too-many-instance-attributes
+    """Asyncio version of Spomato that accesses the spotify API through aiohttp without blocking the event loop.
+
+    It has the same public methods as Spomato, but the methods that access the Spotify API are coroutines, and
+    iter_api_data is an async generator. Datasets are stored in the same data dictionary and pick_tracks is the same as
+    in Spomato. The session must be opened with connect, or by using the object as an async context manager, before
+    accessing the API.
+
+    Parameters
+    ----------
+    access_token : str
+        A valid Spotify Access token.
+    max_concurrency : int
+        The maximum number of requests to the Spotify API in flight at once.
+    api_url : str
+        The base url of the Spotify API. Can be pointed at a local server for testing.
+    max_retries : int
+        The number of times to retry a request that failed with a retryable status.
+    backoff_factor : float
+        The base number of seconds to back off before retrying a request.
+    metadata_cache : spomato.metadata.MetadataCache
+        A cache of the songs of artists and albums, used to share fetched songs between objects.
+    metrics : spomato.metrics.Metrics
+        Records the latency and size of requests to the Spotify API, dataset sizes and track picks.
+    pick_cache : spomato.metadata.MetadataCache
+        A cache of the tracks picked with a seed, used to return the same playlist again without picking it.
+    history : spomato.history.PlayHistory
+        A history of the user's recently picked songs, used to leave them out of the next playlists.
+
+    Attributes
+    ----------
+    data : dictionary
+        Dictionary storing available data structures to create playlists.
+    high_water_marks : dictionary
+        Dictionary storing when the newest saved track was added and the market, for each dataset built only from
+        saved tracks. Used to refresh those datasets incrementally.
+    http_session : aiohttp.ClientSession
+        The aiohttp session used to access the spotify API.
+    access_token : str
+        A valid Spotify Access token. This requires the scopes playlist-read-private, playlist-modify-private,
+        and user-library-read
+    current_user_id : str
+        The string id of the user of the access token, or None until it is fetched from the API.
+    max_concurrency : int
+        The maximum number of requests to the Spotify API in flight at once.
+    api_url : str
+        The base url of the Spotify API.
+    max_retries : int
+        The number of times to retry a request that failed with a retryable status.
+    backoff_factor : float
+        The base number of seconds to back off before retrying a request.
+    metadata_cache : spomato.metadata.MetadataCache
+        A cache of the songs of artists and albums, or None if they are not cached.
+    metrics : spomato.metrics.Metrics
+        The metrics recorded by this object.
+    pick_cache : spomato.metadata.MetadataCache
+        The cache of the tracks picked with a seed, keyed by the dataset version, pick arguments and seed.
+    history : spomato.history.PlayHistory
+        The history of the user's recently picked songs, or None if picks don't avoid recent songs.
+
+    """
+
+    def __init__(self,
+                 access_token=None,
+                 *,
+                 max_concurrency=10,
+                 api_url=API_URL,
+                 max_retries=5,
+                 backoff_factor=0.5,
+                 metadata_cache=None,
+                 metrics=None,
+                 pick_cache=None,
+                 history=None):
+        """Initialization function that sets the access token. No requests are made until connect is awaited.
+
+        Parameters
+        ----------
+        access_token : str
+            A valid Spotify Access token. This requires the scopes playlist-read-private, playlist-modify-private,
+            and user-library-read.
+        max_concurrency : int
+            The maximum number of requests to the Spotify API in flight at once. Default is 10.
+        api_url : str
+            The base url of the Spotify API. Default is the Spotify Web API.
+        max_retries : int
+            The number of times to retry a request that failed with a retryable status. When the API responds 429 Too
+            Many Requests every request waits for its Retry-After header first. Default is 5.
+        backoff_factor : float
+            The base number of seconds to back off before retrying a request, doubled on each retry. Default is 0.5.
+        metadata_cache : spomato.metadata.MetadataCache
+            A cache of the songs of artists and albums. Default is None, which doesn't cache songs.
+        metrics : spomato.metrics.Metrics
+            Records metrics of requests to the Spotify API, datasets and track picks. Default is None, which records
+            nothing.
+        pick_cache : spomato.metadata.MetadataCache
+            A cache of the tracks picked with a seed. Default is None, which creates a cache of the last
+            PICK_CACHE_SIZE picks.
+        history : spomato.history.PlayHistory
+            A history of the user's recently picked songs. Songs picked by pick_tracks are added to it, and left out
+            of later picks while they are in it. Default is None, which doesn't keep a history.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(max_concurrency, int):
+            raise TypeError('Argument max_concurrency must be of type int')
+        if max_concurrency < 1:
+            raise ValueError('Argument max_concurrency must be at least 1.')
+        if not isinstance(api_url, str):
+            raise TypeError('Argument api_url must be of type string')
+        if not isinstance(max_retries, int):
+            raise TypeError('Argument max_retries must be of type int')
+
+        super().__init__(access_token,
+                         metadata_cache=metadata_cache,
+                         metrics=metrics,
+                         pick_cache=pick_cache,
+                         history=history)
+        self.max_concurrency = max_concurrency
+        self.api_url = api_url if api_url.endswith('/') else api_url + '/'
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.http_session = None
+        self._semaphore = None
+        self._paused_until = 0.0
+
+
+    @property
+    def current_user_id(self):
+        """str: The string id of the user of the access token, or None until it is fetched from the API."""
+        return self._current_user_id
+
+
+    async def connect(self):
+        """Opens the aiohttp session and gets the id of the current user.
+
+        Returns
+        -------
+        None
+
+        """
+        if self.http_session is None:
+            self.http_session = aiohttp.ClientSession()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self._get_current_user_id()
+
+
+    async def close(self):
+        """Closes the aiohttp session.
+
+        Returns
+        -------
+        None
+
+        """
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+
+    def update_token(self, access_token):
+        """Updates the token with the provided access_token. Generally used if your access token has expired. The id of
+        its user is fetched again the next time it is needed.
+
+        Parameters
+        ----------
+        access_token : str
+            A valid Spotify Access token. This requires the scopes playlist-read-private, playlist-modify-private,
+            and user-library-read.
+
+        Returns
+        -------
+        None
+
+        """
+        self.access_token = access_token
+        self._current_user_id = None
+        self._playlist_index = None
+
+
+    async def _get_current_user_id(self):
+        """Internal function to get the id of the user of the access token, fetching it from the API the first time.
+
+        Returns
+        -------
+        str
+            The string id of the current user.
+
+        """
+        if self._current_user_id is None:
+            user = await self._request('GET', 'me')
+            self._current_user_id = user['id']
+        return self._current_user_id
+
+
+    async def _request(self, method, path, params=None, payload=None):
+        """Internal function to make a request to the spotify API, limited to max_concurrency requests at once.
+
+        Requests that fail with a retryable status are retried with jittered exponential backoff. A 429 Too Many
+        Requests response pauses every request of this object until its Retry-After header has passed, since the rate
+        limit applies to the whole application.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        path : str
+            The path of the endpoint relative to the api url.
+        params : dict
+            Query parameters of the request.
+        payload : dict
+            JSON body of the request.
+
+        Returns
+        -------
+        dict
+            The JSON response, or None if the response has no content.
+
+        """
+        if self.http_session is None:
+            raise ValueError('Session is not connected, await connect first.')
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                if loop.time() < self._paused_until:
+                    await asyncio.sleep(self._paused_until - loop.time())
+                response, body = await self._send(method, path, params, payload)
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    break
+                backoff = random.uniform(0, self.backoff_factor * 2 ** attempt)
+                if response.status == 429:
+                    retry_after = get_retry_after(response.headers)
+                    self._paused_until = max(self._paused_until,
+                                             loop.time() + (backoff if retry_after is None else retry_after))
+                else:
+                    await asyncio.sleep(backoff)
+                self.metrics.increment('api.retry', tags={'endpoint': get_endpoint_type(path)})
+                attempt += 1
+        if response.status >= 400:
+            self.metrics.increment('api.error', tags={'endpoint': get_endpoint_type(path)})
+            response.raise_for_status()
+        if len(body) == 0:
+            return None
+        return json.loads(body)
+
+
+    async def _send(self, method, path, params, payload):
+        """Internal function to send a single request to the spotify API.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        path : str
+            The path of the endpoint relative to the api url.
+        params : dict
+            Query parameters of the request.
+        payload : dict
+            JSON body of the request.
+
+        Returns
+        -------
+        tuple
+            The aiohttp response, which has been released, and its body.
+
+        """
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        tags = {'endpoint': get_endpoint_type(path)}
+        start = perf_counter()
+        try:
+            async with self.http_session.request(method,
+                                                 self.api_url + path,
+                                                 params=params,
+                                                 json=payload,
+                                                 headers=headers) as response:
+                body = await response.read()
+        except aiohttp.ClientError:
+            self.metrics.increment('api.error', tags=tags)
+            raise
+        finally:
+            self.metrics.timing('api.request', perf_counter() - start, tags)
+        self.metrics.observe('api.bytes', len(body), tags)
+        return response, body
+
+
+    async def _get_pages(self, path, limit, params=None):
+        """Internal function to get every page of a paged endpoint. The total from the first page is used to request
+        the remaining pages concurrently.
+
+        Parameters
+        ----------
+        path : str
+            The path of the endpoint relative to the api url.
+        limit : int
+            The number of items per page.
+        params : dict
+            Additional query parameters of the request.
+
+        Returns
+        -------
+        list
+            The paging objects of every page, in order.
+
+        """
+        params = dict(params or {}, limit=limit)
+        first_page = await self._request('GET', path, params=dict(params, offset=0))
+        offsets = range(len(first_page['items']), first_page['total'], limit)
+        pages = await asyncio.gather(*[self._request('GET', path, params=dict(params, offset=offset))
+                                       for offset in offsets])
+        self.metrics.increment('api.pages', len(pages) + 1)
+        return [first_page] + list(pages)
+
+
+    async def _iter_pages(self, path, limit):
+        """Internal function to iterate over the pages of a paged endpoint, requesting each page only when the previous
+        page has been used.
+
+        Parameters
+        ----------
+        path : str
+            The path of the endpoint relative to the api url.
+        limit : int
+            The number of items per page.
+
+        Yields
+        ------
+        dict
+            The paging object of each page, in order.
+
+        """
+        offset = 0
+        while True:
+            page = await self._request('GET', path, params={'limit': limit, 'offset': offset})
+            self.metrics.increment('api.pages')
+            yield page
+            offset += len(page['items'])
+            if len(page['items']) == 0 or offset >= page['total']:
+                break
+
+
+    @timed('dataset.build')
+    async def get_api_data(self,
+                           data_key='default',
+                           file_path=None,
+                           source=None,
+                           reset=False,
+                           market='US',
+                           *,
+                           incremental=False,
+                           file_format=None,
+                           compression=None):
+        """Generates a song dataset to load into AsyncSpomato to be used for generating new playlists.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        file_path : str
+            If not None, the dataset generated will also be saved to the specified file path..
+        source : dict
+            Contains all sources you want to use in generating the dataset. The dictionary is keyed by one of 3 source
+            types: savedtracks, playlist, or artist. For savedtracks the value can be None, as no further data is
+            required. For playlist or artist, the value should contain a list of all spotify ids of the appropriate
+            type. If not specified, it defaults to your saved tracks.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+        incremental : bool
+            If True and the dataset was built only from saved tracks, only the tracks saved since the dataset was last
+            built are fetched and added to it. See Spomato.get_api_data. Default is False.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz' to save the dataset as. If None, the format is chosen by the
+            file extension of file_path.
+        compression : str
+            The compression to save the dataset with, such as 'zstd' or 'gzip'. If None, the default compression of the
+            file format is used.
+
+        Returns
+        -------
+        None
+
+        """
+        source = self._check_api_args(source, market, incremental)
+        self._check_file_args(file_path, file_format, compression)
+        self._check_new_data_key(data_key, reset)
+
+        # generate the dataset and save it into the AsyncSpomato object
+        if list(source) == ['savedtracks']:
+            added_after = self._get_added_after(data_key, market, incremental)
+            data, added_at = await self._get_saved_tracks_since(market, added_after=added_after)
+            self._set_saved_tracks_data(data_key, data, added_after, {'added_at': added_at, 'market': market})
+        else:
+            self._set_api_data(data_key, await self._get_new_data(source=source, market=market))
+
+        # Cache the data if the file_path is specified, in a thread so the event loop isn't blocked while it's written
+        if file_path:
+            await asyncio.to_thread(self._cache_data,
+                                    data_key=data_key,
+                                    file_path=file_path,
+                                    file_format=file_format,
+                                    compression=compression)
+
+
+    async def iter_api_data(self,
+                            source=None,
+                            market='US'):
+        """Generates the songs of a dataset in batches as they are downloaded from the Spotify API. This is an async
+        generator, see Spomato.iter_api_data.
+
+        Parameters
+        ----------
+        source : dict
+            Contains all sources you want to use in generating the dataset. See get_api_data. If not specified, it
+            defaults to your saved tracks.
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Yields
+        ------
+        Dataset
+            A batch of songs that haven't been yielded before. Batches may be empty.
+
+        """
+        source = self._check_api_args(source, market)
+
+        async def iter_batches():
+            for sourcetype in source:
+                if sourcetype == 'savedtracks':
+                    async for page in self._iter_pages('me/tracks', limit=50):
+                        yield self._parse_saved_tracks(page['items'], market)
+                elif sourcetype == 'playlist':
+                    for pl_id in source['playlist']:
+                        async for page in self._iter_pages(f'playlists/{pl_id}/tracks', limit=100):
+                            yield self._parse_public_playlist(page, market)
+                else:
+                    for artist_id in source['artist']:
+                        yield await self._get_artist_data(artist_id, market)
+
+        # remove the songs of each batch that are repeated in the batch or were in an earlier batch
+        seen = set()
+        async for batch in iter_batches():
+            yield self._drop_seen(batch, seen)
+
+
+    async def stream_api_data(self,
+                              data_key='default',
+                              file_path=None,
+                              source=None,
+                              reset=False,
+                              market='US',
+                              *,
+                              file_format=None,
+                              compression=None):
+        """Generates a song dataset like get_api_data, but parses each batch of songs, and adds it to the file if
+        file_path is given, as soon as it is downloaded. See Spomato.stream_api_data.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        file_path : str
+            If not None, the dataset generated will also be saved to the specified file path.
+        source : dict
+            Contains all sources you want to use in generating the dataset. See get_api_data. If not specified, it
+            defaults to your saved tracks.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz' to save the dataset as. If None, the format is chosen by the
+            file extension of file_path.
+        compression : str
+            The compression to save the dataset with. If None, the default compression of the file format is used.
+
+        Returns
+        -------
+        None
+
+        """
+        self._check_file_args(file_path, file_format, compression)
+        self._check_new_data_key(data_key, reset)
+
+        # the batches are concatenated once the download is complete, rather than copying the dataset for each batch,
+        # so a dataset that is being regenerated is kept until then. The file is written in a thread, so the event loop
+        # isn't blocked while it's written
+        batches = []
+        writer = self._open_writer(file_path, file_format, compression) if file_path else None
+        try:
+            async for batch in self.iter_api_data(source=source, market=market):
+                if len(batch) == 0:
+                    continue
+                batches.append(batch)
+                if writer is not None:
+                    await asyncio.to_thread(writer.write, batch)
+            if writer is not None:
+                await asyncio.to_thread(writer.close)
+        except BaseException:
+            # the temporary file is deleted right away rather than in a thread, as the task may have been cancelled
+            if writer is not None:
+                writer.abort()
+            raise
+        self.data[data_key] = Dataset.concat(batches)
+        self.high_water_marks.pop(data_key, None)
+
+
+    async def _get_new_data(self,
+                            source=None,
+                            market='US'):
+        """Creates a new dataset from the specified source list and returns a Dataset of song ids and times.
+        All of the sources are fetched concurrently.
+
+        Parameters
+        ----------
+        source : dict
+            Contains all sources you want to use in generating the dataset. See get_api_data.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids generated from the sources.
+
+        """
+        source = self._check_source(source)
+
+        sources = []
+        for sourcetype in source:
+            if sourcetype == 'savedtracks':
+                sources.append(self._get_saved_tracks(market))
+            elif sourcetype == 'playlist':
+                sources.append(self._get_playlist_dataframe(source_list=source['playlist'],
+                                                            market=market))
+            elif sourcetype == 'artist':
+                sources.append(self._get_artist_dataframe(source_list=source['artist'],
+                                                          market=market))
+        data_list = await asyncio.gather(*sources)
+
+        # concatinate the datasets of all the source types and remove any duplicates
+        data = Dataset.concat(data_list)
+        tags = {'source': ','.join(source.keys())}
+        self.metrics.observe('dataset.rows_fetched', len(data), tags)
+        data = data.drop_duplicates()
+        self.metrics.observe('dataset.rows', len(data), tags)
+
+        return data
+
+
+    async def _get_saved_tracks(self, market):
+        """Access the spotify API to get the saved tracks for a user and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids generated from the sources.
+
+        """
+        track_df, _ = await self._get_saved_tracks_since(market)
+        return track_df
+
+
+    async def _get_saved_tracks_since(self, market, added_after=None):
+        """Access the spotify API to get the saved tracks for a user that were added since a point in time, and returns
+        a Dataset of song ids and times along with when the newest saved track was added. See
+        Spomato._get_saved_tracks_since.
+
+        Parameters
+        ----------
+        market : str
+            A string representation of the Spotify market to filter on.
+        added_after : str
+            The added_at timestamp of the newest track already known. Tracks added at or after this time are returned.
+            Default is None, which returns every saved track.
+
+        Returns
+        -------
+        tuple
+            A dataset of song ids and times, and the added_at timestamp of the newest saved track.
+
+        """
+        if added_after is None:
+            # get every page of a user's saved tracks concurrently
+            pages = await self._get_pages('me/tracks', limit=50)
+            items = [item for page in pages for item in page['items']]
+        else:
+            # iterate over a user's saved tracks until a track older than the high water mark is reached
+            items = []
+            async for page in self._iter_pages('me/tracks', limit=50):
+                new_items, done = self._get_items_since(page, added_after)
+                items += new_items
+                if done:
+                    break
+
+        return self._parse_saved_items(items, market, added_after)
+
+
+    async def _get_playlist_dataframe(self,
+                                      source_list,
+                                      market):
+        """Access the spotify API to get the songs of each playlist and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        source_list : list
+            A list of playlist ids to source songs from
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of songs with song id and time.
+
+        """
+        async def get_playlist(pl_id):
+            pages = await self._get_pages(f'playlists/{pl_id}/tracks', limit=100)
+            return Dataset.concat([self._parse_public_playlist(page, market) for page in pages])
+
+        playlist_list = await asyncio.gather(*[get_playlist(pl_id) for pl_id in source_list])
+
+        if len(playlist_list) == 0:
+            raise ValueError('No valid playlists.')
+
+        # concatinate the datasets of all the playlist and remove any duplicates
+        data = Dataset.concat(playlist_list).drop_duplicates()
+
+        return data
+
+
+    async def _get_artist_dataframe(self,
+                                    source_list,
+                                    market):
+        """Access the spotify API to get the songs of each artist and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        source_list : list
+            A list of artist ids to source songs from
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of songs with song id and time.
+
+        """
+        artist_list = await asyncio.gather(*[self._get_artist_data(artist, market) for artist in source_list])
+
+        # concatinate the datasets of all the artists and remove any duplicates
+        data = Dataset.concat(artist_list).drop_duplicates()
+
+        return data
+
+
+    async def _get_artist_data(self, artist_id, market):
+        """Access the spotify API to get an artist's tracks and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        artist_id : str
+            The spotify id of the artist.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and times generated from the sources.
+
+        """
+        # the songs of popular artists are likely to have been fetched already for another user
+        data = self._get_cached_songs(('artist', artist_id, market))
+        if data is not None:
+            return data
+
+        # get all of the artist's albums ids, and only fetch the albums that aren't cached
+        pages = await self._get_pages(f'artists/{artist_id}/albums', limit=20)
+        album_ids = [x['id'] for page in pages for x in page['items']]
+        albums = self._get_cached_albums(album_ids, market)
+        new_album_ids = [album_id for album_id in album_ids if album_id not in albums]
+
+        async def get_albums(album_id_chunk):
+            # parse out the songs of each album in the market as soon as its chunk arrives
+            response = await self._request('GET', 'albums', params={'ids': ','.join(album_id_chunk)})
+            self._add_albums(albums, self._parse_albums(response['albums'], market), market)
+
+        # fetch the albums in chunks of the most ids the API accepts in one request
+        await asyncio.gather(*[get_albums(new_album_ids[i:i + ALBUM_BATCH_SIZE])
+                               for i in range(0, len(new_album_ids), ALBUM_BATCH_SIZE)])
+
+        return self._set_artist_data(artist_id, market, album_ids, albums)
+
+
+    async def artist_id_search(self,
+                               artist,
+                               limit=10,
+                               offset=0):
+        """Search for an artist's id by name.
+
+        Parameters
+        ----------
+        artist : str
+            Name of the artist to search.
+        limit : int
+            Number of records to return from search
+        offset : int
+            The number of records to skip in search result.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe of artist names and ids from the search result.
+
+        """
+        if not isinstance(limit, int):
+            raise TypeError('Argument limit must be of type int')
+        if not isinstance(offset, int):
+            raise TypeError('Argument offset must be of type int')
+        artist_results = await self._request('GET',
+                                             'search',
+                                             params={'q': artist, 'type': 'artist', 'limit': limit, 'offset': offset})
+        return self._parse_artists(artist_results['artists']['items'])
@@ -0,0 +1,885 @@
+"""Author: Matthew Russell
+
+This contains the base class shared by Spomato and AsyncSpomato, which holds the song datasets of a user and the state
+that doesn't depend on how the Spotify API is accessed. Datasets are loaded from and saved to file and combined here,
+parsed from API responses with the methods of spomato.sources, and tracks are picked from them with the methods of
+spomato.picker.
+
+"""
+
+# pandas and pyarrow are imported where they are used, so importing spomato stays quick
+# pylint: disable=import-outside-toplevel
+
+import bisect
+import contextlib
+import json
+import math
+import os
+from collections import Counter, defaultdict, deque
+import numpy as np
+from spomato.metadata import MetadataCache
+from spomato.dataset import Dataset
+from spomato.metrics import NULL_METRICS
+from spomato.picker import PickMixin
+from spomato.sources import SourceMixin
+from spomato.writer import DatasetWriter
+
+# the maximum number of album ids the Spotify API accepts in one request
+ALBUM_BATCH_SIZE = 20
+
+# the maximum number of tracks the Spotify API accepts in one playlist change
+PLAYLIST_BATCH_SIZE = 100
+
+# the number of seeded picks each Spomato object caches by default
+PICK_CACHE_SIZE = 256
+
+# the key of the metadata spomato saves with a dataset in parquet, feather and npz files
+FILE_METADATA_KEY = 'spomato'
+
+# formats datasets can be saved in, and the format of each file extension
+FILE_FORMATS = ['csv', 'parquet', 'feather', 'npz']
+FILE_EXTENSIONS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather',
+                   '.npz': 'npz'}
+
+
+class SpomatoBase(SourceMixin, PickMixin):  # pylint: disable=too-many-instance-attributes
+    """Base class of Spomato and AsyncSpomato that stores the song datasets of a user and picks tracks from them.
+
+    It doesn't access the Spotify API. Spomato and AsyncSpomato add the methods that build datasets from the API and
+    change the user's playlists, as blocking methods and as coroutines.
+
+    Parameters
+    ----------
+    access_token : str
+        A valid Spotify Access token.
+    metadata_cache : spomato.metadata.MetadataCache
+        A cache of the songs of artists and albums, used to share fetched songs between objects.
+    metrics : spomato.metrics.Metrics
+        Records the latency and size of requests to the Spotify API, dataset sizes and track picks.
+    pick_cache : spomato.metadata.MetadataCache
+        A cache of the tracks picked with a seed, used to return the same playlist again without picking it.
+    history : spomato.history.PlayHistory
+        A history of the user's recently picked songs, used to leave them out of the next playlists.
+
+    Attributes
+    ----------
+    data : dictionary
+        Dictionary storing available data structures to create playlists.
+    high_water_marks : dictionary
+        Dictionary storing when the newest saved track was added and the market, for each dataset built only from
+        saved tracks. Used to refresh those datasets incrementally.
+    access_token : str
+        A valid Spotify Access token. This requires the scopes playlist-read-private, playlist-modify-private,
+        and user-library-read
+    metadata_cache : spomato.metadata.MetadataCache
+        A cache of the songs of artists and albums, or None if they are not cached.
+    metrics : spomato.metrics.Metrics
+        The metrics recorded by this object.
+    pick_cache : spomato.metadata.MetadataCache
+        The cache of the tracks picked with a seed, keyed by the dataset version, pick arguments and seed.
+    history : spomato.history.PlayHistory
+        The history of the user's recently picked songs, or None if picks don't avoid recent songs.
+
+    """
+
+    def __init__(self,
+                 access_token=None,
+                 *,
+                 metadata_cache=None,
+                 metrics=None,
+                 pick_cache=None,
+                 history=None):
+        """Initialization function that sets the access token and the state shared by Spomato and AsyncSpomato.
+
+        Parameters
+        ----------
+        access_token : str
+            A valid Spotify Access token. This requires the scopes playlist-read-private, playlist-modify-private,
+            and user-library-read.
+        metadata_cache : spomato.metadata.MetadataCache
+            A cache of the songs of artists and albums. Default is None, which doesn't cache songs.
+        metrics : spomato.metrics.Metrics
+            Records metrics of requests to the Spotify API, datasets and track picks. Default is None, which records
+            nothing.
+        pick_cache : spomato.metadata.MetadataCache
+            A cache of the tracks picked with a seed. Default is None, which creates a cache of the last
+            PICK_CACHE_SIZE picks.
+        history : spomato.history.PlayHistory
+            A history of the user's recently picked songs. Songs picked by pick_tracks are added to it, and left out
+            of later picks while they are in it. Default is None, which doesn't keep a history.
+
+        Returns
+        -------
+        None
+
+        """
+        self.access_token = access_token
+        self.metadata_cache = metadata_cache
+        self.metrics = NULL_METRICS if metrics is None else metrics
+        self.pick_cache = MetadataCache(max_items=PICK_CACHE_SIZE) if pick_cache is None else pick_cache
+        self.history = history
+        self.data = {}
+        self.high_water_marks = {}
+        self._current_user_id = None
+        self._playlist_index = None
+
+
+    @staticmethod
+    def _get_file_format(file_path, file_format=None):
+        """Gets the format of a dataset file from the file_format argument, or else from the extension of the file path.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz'. If None, the format is chosen by the file extension, and
+            files with an unknown extension are treated as csv.
+
+        Returns
+        -------
+        str
+            The format of the file.
+
+        """
+        if file_format is None:
+            extension = os.path.splitext(file_path)[1].lower()
+            file_format = FILE_EXTENSIONS.get(extension, 'csv')
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f'{file_format} is not a valid file format.')
+        return file_format
+
+
+    def _cache_data(self, data_key, file_path, file_format=None, compression=None):
+        """Export the results of a dataset of song ids to local filesystem as a csv, parquet, feather or npz file. The
+        high water mark of the dataset, if it has one, is saved in the metadata of parquet, feather and npz files.
+
+        Parameters
+        ----------
+        data_key : str
+            Key of the dataset to save
+        file_path : str
+            Full path of filename to save the file.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz'. If None, the format is chosen by the file extension.
+        compression : str
+            The compression to use, passed on to the pandas writer of the format. Npz files are compressed with any
+            compression. If None, the default compression of the format is used.
+
+        Returns
+        -------
+        None
+
+        """
+        file_format = self._get_file_format(file_path, file_format)
+        # a saved tracks dataset is saved with its high water mark, so it can be refreshed incrementally once loaded
+        high_water_mark = self.high_water_marks.get(data_key)
+        metadata = None if high_water_mark is None else json.dumps({'high_water_mark': high_water_mark})
+        if file_format == 'npz':
+            self._get_dataset(data_key).to_npz(file_path, compress=compression is not None, metadata=metadata)
+            return
+        # write the typed dataset columns, the binary formats store the types so they aren't inferred on load
+        data = self._get_dataset(data_key).to_frame()
+        if file_format in ['parquet', 'feather'] and metadata is not None:
+            self._write_arrow_file(data, file_path, file_format, compression, metadata)
+        elif file_format == 'parquet':
+            data.to_parquet(file_path, index=False, compression='snappy' if compression is None else compression)
+        elif file_format == 'feather':
+            data.to_feather(file_path, **({} if compression is None else {'compression': compression}))
+        else:
+            data.to_csv(file_path, index=False, compression='infer' if compression is None else compression)
+
+
+    @staticmethod
+    def _write_arrow_file(data, file_path, file_format, compression, metadata):
+        """Internal function to write a dataframe to a parquet or feather file with spomato's metadata in its schema.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            The dataframe to write.
+        file_path : str
+            Full path of filename to save the file.
+        file_format : str
+            Either 'parquet' or 'feather'.
+        compression : str
+            The compression to use, or None for the default compression of the format.
+        metadata : str
+            The metadata to save with the schema of the file.
+
+        Returns
+        -------
+        None
+
+        """
+        try:
+            import pyarrow as pa
+            from pyarrow import feather, parquet
+        except ImportError as error:
+            raise ImportError(f'Saving {file_format} files of saved tracks requires the pyarrow package.') from error
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        table = table.replace_schema_metadata(dict(table.schema.metadata or {}, **{FILE_METADATA_KEY: metadata}))
+        if file_format == 'parquet':
+            parquet.write_table(table, file_path, compression='snappy' if compression is None else compression)
+        else:
+            feather.write_feather(table, file_path, **({} if compression is None else {'compression': compression}))
+
+
+    def _open_writer(self, file_path, file_format=None, compression=None):
+        """Internal function to open a writer that streams a dataset to file, if a file path is given.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of filename to save the file, or None.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz'. If None, the format is chosen by the file extension.
+        compression : str
+            The compression to use. If None, the default compression of the format is used.
+
+        Returns
+        -------
+        contextlib.AbstractContextManager
+            A context manager of a spomato.writer.DatasetWriter, or of None if there is no file path.
+
+        """
+        if not file_path:
+            return contextlib.nullcontext()
+        return DatasetWriter(file_path, self._get_file_format(file_path, file_format), compression)
+
+
+    def _load_cached_data(self, data_key, file_path, file_format=None):
+        """Load a Saved Dataset into the Spomato data dictionary. Requires a csv, parquet or feather file with columns
+        of 'song_id' and 'time', or an npz file saved by Spomato. Parquet and feather files are memory mapped, and npz
+        files are loaded without pandas.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the loaded dataset in the data dictionary.
+        file_path : str
+            Full path of filename to load the file.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz'. If None, the format is chosen by the file extension.
+
+        Returns
+        -------
+        None
+
+        """
+        file_format = self._get_file_format(file_path, file_format)
+        if file_format == 'npz':
+            self.data[data_key] = Dataset.from_npz(file_path)
+            self.data[data_key].build_index()
+            self._set_file_high_water_mark(data_key, self._read_npz_metadata(file_path))
+            return
+
+        import pandas as pd
+        metadata = None
+        if file_format == 'parquet':
+            data = pd.read_parquet(file_path, memory_map=True)
+            metadata = self._read_parquet_metadata(file_path)
+        elif file_format == 'feather':
+            try:
+                from pyarrow import feather
+            except ImportError as error:
+                raise ImportError('Reading feather files requires the pyarrow package.') from error
+            table = feather.read_table(file_path, memory_map=True)
+            metadata = (table.schema.metadata or {}).get(FILE_METADATA_KEY.encode())
+            data = table.to_pandas()
+        else:
+            data = pd.read_csv(file_path,
+                               dtype={'song_id': str, 'time': float},
+                               float_precision='round_trip')
+
+        # ensure the required columns are in the dataset else raise error
+        if 'song_id' not in data.columns:
+            raise ValueError('Column song_id not found in loaded data file.')
+        if 'time' not in data.columns:
+            raise ValueError('Column time not found in loaded data file.')
+
+        # data looks correct, add dataset to data
+        self.data[data_key] = Dataset.from_frame(data)
+        self.data[data_key].build_index()
+        self._set_file_high_water_mark(data_key, metadata)
+
+
+    @staticmethod
+    def _read_npz_metadata(file_path):
+        """Internal function to read the metadata spomato saved with an npz file.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+
+        Returns
+        -------
+        str
+            The saved metadata, or None if there is none.
+
+        """
+        with np.load(file_path, allow_pickle=False) as arrays:
+            return str(arrays['metadata']) if 'metadata' in arrays.files else None
+
+
+    @staticmethod
+    def _read_parquet_metadata(file_path):
+        """Internal function to read the metadata spomato saved in the schema of a parquet file, if pyarrow is
+        installed.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+
+        Returns
+        -------
+        bytes
+            The saved metadata, or None if there is none.
+
+        """
+        try:
+            from pyarrow import parquet
+        except ImportError:
+            return None
+        return (parquet.read_schema(file_path).metadata or {}).get(FILE_METADATA_KEY.encode())
+
+
+    def _set_file_high_water_mark(self, data_key, metadata):
+        """Internal function to restore the high water mark of a dataset from the metadata saved with its file.
+
+        Parameters
+        ----------
+        data_key : str
+            Key of the loaded dataset.
+        metadata : str
+            The metadata saved with the file, or None.
+
+        Returns
+        -------
+        None
+
+        """
+        high_water_mark = None if metadata is None else json.loads(metadata).get('high_water_mark')
+        if high_water_mark is None:
+            self.high_water_marks.pop(data_key, None)
+        else:
+            self.high_water_marks[data_key] = high_water_mark
+
+
+    def get_file_data(self,
+                      data_key='default',
+                      file_path=None,
+                      overwrite=False,
+                      file_format=None):
+        """Loads a file of song data into Spomato to be used for generating new playlists.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        file_path : str
+            Full path of filename if loading or saving dataset.
+        overwrite : bool
+            Boolean to determine if the dataset should be overwritten if it already exists.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz'. If None, the format is chosen by the file extension.
+
+
+        Returns
+        -------
+        None
+
+        """
+        self._check_file_args(file_path, file_format)
+        self._check_new_data_key(data_key, overwrite)
+
+        # read the data from file if the file exists
+        if os.path.isfile(file_path):
+            self._load_cached_data(data_key=data_key,
+                                   file_path=file_path,
+                                   file_format=file_format)
+        else:
+            raise ValueError(f'File path {file_path} does not exist.')
+
+
+    def union_data(self,
+                   data_key,
+                   data_keys,
+                   reset=False):
+        """Creates a dataset of the songs in any of the given datasets, without fetching anything from the Spotify API.
+        The songs keep the order of the datasets, and songs in more than one dataset are only added once.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the new dataset in the data dictionary.
+        data_keys : list
+            Names of the datasets to combine, stored in the data object in Spomato.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+
+        Returns
+        -------
+        None
+
+        """
+        datasets = self._get_datasets(data_keys)
+        dataset = datasets[0]
+        for other in datasets[1:]:
+            dataset = dataset.union(other)
+        self._set_derived_data(data_key, dataset, reset)
+
+
+    def intersect_data(self,
+                       data_key,
+                       data_keys,
+                       reset=False):
+        """Creates a dataset of the songs in every one of the given datasets, without fetching anything from the Spotify
+        API. The songs keep the order of the first dataset.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the new dataset in the data dictionary.
+        data_keys : list
+            Names of the datasets to intersect, stored in the data object in Spomato.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+
+        Returns
+        -------
+        None
+
+        """
+        datasets = self._get_datasets(data_keys)
+        dataset = datasets[0]
+        for other in datasets[1:]:
+            dataset = dataset.intersection(other)
+        self._set_derived_data(data_key, dataset, reset)
+
+
+    def subtract_data(self,
+                      data_key,
+                      base_key,
+                      data_keys,
+                      reset=False):
+        """Creates a dataset of the songs of one dataset that are in none of the other given datasets, without fetching
+        anything from the Spotify API. For example, your saved tracks without the songs of an artist. The songs keep
+        the order of the base dataset.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the new dataset in the data dictionary.
+        base_key : str
+            Name of the dataset to remove songs from, stored in the data object in Spomato.
+        data_keys : list
+            Names of the datasets of songs to remove, stored in the data object in Spomato.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(base_key, str):
+            raise TypeError('Argument base_key must be of type string')
+        dataset = self._get_dataset(base_key)
+        for other in self._get_datasets(data_keys):
+            dataset = dataset.difference(other)
+        self._set_derived_data(data_key, dataset, reset)
+
+
+    def filter_data(self,
+                    data_key,
+                    base_key,
+                    min_time=None,
+                    max_time=None,
+                    reset=False):
+        """Creates a dataset of the songs of a dataset with a length in a range, without fetching anything from the
+        Spotify API. The songs keep the order of the base dataset.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the new dataset in the data dictionary.
+        base_key : str
+            Name of the dataset to filter, stored in the data object in Spomato.
+        min_time : int
+            The minimum song length in minutes to keep. Default is None, which keeps songs of any short length.
+        max_time : int
+            The maximum song length in minutes to keep. Default is None, which keeps songs of any long length.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(base_key, str):
+            raise TypeError('Argument base_key must be of type string')
+        if min_time is not None and not isinstance(min_time, (int, float)):
+            raise TypeError('Argument min_time must be of type int or float')
+        if max_time is not None and not isinstance(max_time, (int, float)):
+            raise TypeError('Argument max_time must be of type int or float')
+        dataset = self._get_dataset(base_key).filter_time(min_seconds=None if min_time is None else min_time * 60,
+                                                          max_seconds=None if max_time is None else max_time * 60)
+        self._set_derived_data(data_key, dataset, reset)
+
+
+    def _check_new_data_key(self, data_key, reset):
+        """Internal function to check the key a new dataset is saved to, so an existing dataset isn't unexpectedly
+        overwritten.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        reset : bool
+            Boolean to determine if the dataset should be replaced if it already exists.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(data_key, str):
+            raise TypeError('Argument data_key must be of type string')
+        if not isinstance(reset, (bool, int)):
+            raise TypeError('Argument reset must be of type bool or int')
+        # check if the data key already exists to ensure data is not unexpectedly overwritten
+        if data_key in self.data and reset is False:
+            msg = (f'Dataset {data_key} already exists and reset argument is set to False. '
+                   'Set reset to True to overwrite dataset.')
+            raise ValueError(msg)
+
+
+    @staticmethod
+    def _check_file_args(file_path, file_format=None, compression=None):
+        """Internal function to check the arguments of the file a dataset is loaded from or saved to.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file, or None if there is no file.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz', or None to choose the format by the file extension.
+        compression : str
+            The compression to save the dataset with, or None for the default compression of the format.
+
+        Returns
+        -------
+        None
+
+        """
+        if file_path is not None and not isinstance(file_path, str):
+            raise TypeError('Argument file_path must be of type string')
+        if file_format is not None and not isinstance(file_format, str):
+            raise TypeError('Argument file_format must be of type string')
+        if compression is not None and not isinstance(compression, str):
+            raise TypeError('Argument compression must be of type string')
+
+
+    def _get_datasets(self, data_keys):
+        """Internal function to get the datasets of a list of data keys, to combine them.
+
+        Parameters
+        ----------
+        data_keys : list
+            Names of the datasets stored in the data object in Spomato.
+
+        Returns
+        -------
+        list
+            The dataset of each key.
+
+        """
+        if not isinstance(data_keys, list):
+            raise TypeError('Argument data_keys must be of type list')
+        if len(data_keys) == 0:
+            raise ValueError('Argument data_keys must have at least one data key.')
+        for key in data_keys:
+            if not isinstance(key, str):
+                raise TypeError('Each key of argument data_keys must be of type string')
+        return [self._get_dataset(key) for key in data_keys]
+
+
+    def _set_derived_data(self, data_key, dataset, reset):
+        """Internal function to save a dataset made from other datasets into the data dictionary.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        dataset : Dataset
+            The dataset to save.
+        reset : bool
+            Boolean to determine if the dataset should be replaced if it already exists.
+
+        Returns
+        -------
+        None
+
+        """
+        self._check_new_data_key(data_key, reset)
+
+        # the dataset isn't only the user's saved tracks, so it can't be refreshed incrementally
+        dataset.build_index()
+        self.data[data_key] = dataset
+        self.high_water_marks.pop(data_key, None)
+
+
+    def _get_dataset(self, data_key):
+        """Gets a dataset from the data dictionary. A pandas DataFrame of song ids and times assigned to the data
+        dictionary directly is converted to a Dataset and stored back in its place.
+
+        Parameters
+        ----------
+        data_key : str
+            Name of the dataset stored in the data object in Spomato
+
+        Returns
+        -------
+        Dataset
+            The dataset of songs.
+
+        """
+        dataset = self.data[data_key]
+        if not isinstance(dataset, Dataset):
+            dataset = self.data[data_key] = Dataset.from_frame(dataset)
+        return dataset
+
+
+    def invalidate_playlists(self):
+        """Clears the index of the user's playlists, so they are listed from the spotify API again the next time they
+        are needed. Use this if the user's playlists have been changed outside of Spomato.
+
+        Returns
+        -------
+        None
+
+        """
+        self._playlist_index = None
+
+
+    @staticmethod
+    def _parse_playlists(playlists):
+        """Parses a list of playlists from the Spotify API into a dataframe of names and ids.
+
+        Parameters
+        ----------
+        playlists : list
+            A list of playlist dictionaries from the Spotify API.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe of playlist names and playlist ids.
+
+        """
+        import pandas as pd
+        return pd.DataFrame({'playlist_name': [pl['name'] for pl in playlists],
+                             'playlist_id': [pl['id'] for pl in playlists]})
+
+
+    @staticmethod
+    def _get_song_ids(song_df):
+        """Internal function to get the list of song ids of the songs given to make_playlist.
+
+        Parameters
+        ----------
+        song_df : pandas.DataFrame
+            Dataframe of songs, or a Dataset or list of song ids.
+
+        Returns
+        -------
+        list
+            The song ids in order.
+
+        """
+        if isinstance(song_df, Dataset):
+            return song_df.song_ids.tolist()
+        if isinstance(song_df, (list, tuple)):
+            return list(song_df)
+        # any other songs must be a dataframe, and pandas is already imported if one was created
+        import pandas as pd
+        if not isinstance(song_df, pd.DataFrame):
+            raise TypeError('Argument song_df must be of type pandas.DataFrame, Dataset or list')
+        return song_df.song_id.tolist()
+
+
+    @staticmethod
+    def _get_playlist_edits(current_ids, song_ids):
+        """Internal function to get the edits that change the songs of a playlist into a new track list.
+
+        The edits are applied in order: the removals, then the additions at the end of the playlist, then the moves.
+        The songs kept in place are the longest run of songs that are already in the right order, so as few songs as
+        possible are moved.
+
+        Parameters
+        ----------
+        current_ids : list
+            The ids of the current songs of the playlist, None for tracks without an id.
+        song_ids : list
+            The ids of the songs the playlist should have, in order.
+
+        Returns
+        -------
+        tuple
+            A list of (song id, position) pairs to remove, a list of song ids to add, and a list of (range_start,
+            insert_before) pairs of single songs to move.
+
+        """
+        kept_ids, removals, additions = SpomatoBase._get_kept_songs(current_ids, song_ids)
+
+        # get the position in the new track list of each song after the removals and additions
+        targets = defaultdict(deque)
+        for position, song_id in enumerate(song_ids):
+            targets[song_id].append(position)
+        order = [targets[song_id].popleft() for song_id in kept_ids + additions]
+        in_place = SpomatoBase._get_in_place(order)
+
+        # move every other song to just after the song before it in the new track list, in track list order
+        moves = []
+        for target in range(len(order)):
+            if target in in_place:
+                continue
+            range_start = order.index(target)
+            insert_before = order.index(target - 1) + 1 if target > 0 else 0
+            if insert_before in (range_start, range_start + 1):
+                continue
+            moves.append((range_start, insert_before))
+            order.insert(insert_before if insert_before < range_start else insert_before - 1, order.pop(range_start))
+
+        return removals, additions, moves
+
+
+    @staticmethod
+    def _should_replace(song_ids, removals, additions, moves):
+        """Internal function to decide whether to replace every song of a playlist rather than make the edits that
+        change it. Replacing is used when it takes no more requests than the edits.
+
+        Parameters
+        ----------
+        song_ids : list
+            The ids of the songs the playlist should have, in order.
+        removals : list
+            The (song id, position) pairs to remove. See _get_playlist_edits.
+        additions : list
+            The song ids to add.
+        moves : list
+            The (range_start, insert_before) pairs of single songs to move.
+
+        Returns
+        -------
+        bool
+            Whether to replace every song of the playlist.
+
+        """
+        # local files and episodes can't be removed by id, so they can only be cleared by replacing the playlist
+        if any(song_id is None for song_id, _ in removals):
+            return True
+        edit_requests = (math.ceil(len(removals) / PLAYLIST_BATCH_SIZE)
+                         + math.ceil(len(additions) / PLAYLIST_BATCH_SIZE)
+                         + len(moves))
+        return edit_requests >= max(1, math.ceil(len(song_ids) / PLAYLIST_BATCH_SIZE))
+
+
+    @staticmethod
+    def _get_kept_songs(current_ids, song_ids):
+        """Internal function to get the songs of a playlist that are kept when it is changed to a new track list.
+
+        Parameters
+        ----------
+        current_ids : list
+            The ids of the current songs of the playlist, None for tracks without an id.
+        song_ids : list
+            The ids of the songs the playlist should have, in order.
+
+        Returns
+        -------
+        tuple
+            A list of the ids of the kept songs in their current order, a list of (song id, position) pairs to remove,
+            and a list of song ids to add in the order of the new track list.
+
+        """
+        # keep as many of the current copies of each song as the new track list has, and remove the rest
+        wanted = Counter(song_ids)
+        kept_ids = []
+        removals = []
+        for position, song_id in enumerate(current_ids):
+            if song_id is not None and wanted[song_id] > 0:
+                wanted[song_id] -= 1
+                kept_ids.append(song_id)
+            else:
+                removals.append((song_id, position))
+
+        # add the songs that aren't kept, in the order of the new track list
+        kept = Counter(kept_ids)
+        additions = []
+        for song_id in song_ids:
+            if kept[song_id] > 0:
+                kept[song_id] -= 1
+            else:
+                additions.append(song_id)
+        return kept_ids, removals, additions
+
+
+    @staticmethod
+    def _get_in_place(order):
+        """Internal function to find the longest increasing run of positions, the songs that are already in order and
+        stay in place.
+
+        Parameters
+        ----------
+        order : list
+            The position in the new track list of each song of the playlist.
+
+        Returns
+        -------
+        set
+            The positions in the new track list of the songs that stay in place.
+
+        """
+        tails = []
+        tail_indexes = []
+        previous = [-1] * len(order)
+        for index, target in enumerate(order):
+            length = bisect.bisect_left(tails, target)
+            if length == len(tails):
+                tails.append(target)
+                tail_indexes.append(index)
+            else:
+                tails[length] = target
+                tail_indexes[length] = index
+            previous[index] = tail_indexes[length - 1] if length > 0 else -1
+        in_place = set()
+        index = tail_indexes[-1] if tail_indexes else -1
+        while index >= 0:
+            in_place.add(order[index])
+            index = previous[index]
+        return in_place
+
+
+    @staticmethod
+    def _parse_artists(artists):
+        """Parses a list of artists from the Spotify API into a dataframe of names and ids.
+
+        Parameters
+        ----------
+        artists : list
+            A list of artist dictionaries from the Spotify API.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe of artist names and ids.
+
+        """
+        import pandas as pd
+        return pd.DataFrame({'artist': [artist['name'] for artist in artists],
+                             'id': [artist['id'] for artist in artists]})
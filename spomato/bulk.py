@@ -0,0 +1,270 @@
+"""Author: Matthew Russell
+
+This contains the bulk builder used to build the datasets of many users across a pool of processes, and the
+spomato-build command that runs it from a manifest file.
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from spomato.pool import SpomatoPool
+from spomato.scheduler import RequestScheduler
+
+# the Spomato objects of the jobs run by a worker process, sharing its connections and artist cache
+_worker_pool = None  # pylint: disable=invalid-name
+
+
+def _init_worker(max_workers, rate):
+    """Internal function to create the SpomatoPool of a worker process.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of threads each job uses to fetch data from the Spotify API concurrently.
+    rate : float
+        The number of requests per second the process sends, or None to not limit the rate.
+
+    Returns
+    -------
+    None
+
+    """
+    global _worker_pool  # pylint: disable=global-statement
+    scheduler = None if rate is None else RequestScheduler(rate=rate, burst=max(1, int(rate)))
+    _worker_pool = SpomatoPool(max_workers=max_workers, scheduler=scheduler)
+
+
+def _get_result(index, job):
+    """Internal function to create the result of a job before it is run.
+
+    Parameters
+    ----------
+    index : int
+        The position of the job in the manifest.
+    job : dict
+        The job. See build_datasets.
+
+    Returns
+    -------
+    dict
+        The result of the job, without songs, seconds or an error.
+
+    """
+    return {'index': index,
+            'id': job.get('id', index),
+            'data_key': job.get('data_key', 'default'),
+            'file_path': job['file_path'],
+            'songs': None,
+            'seconds': None,
+            'error': None}
+
+
+def _build_job(index, job):
+    """Internal function to build the dataset of one job of a manifest and write it to its file. Any error is
+    returned in the result rather than raised, so one failed job doesn't stop the others.
+
+    Parameters
+    ----------
+    index : int
+        The position of the job in the manifest.
+    job : dict
+        The job. See build_datasets.
+
+    Returns
+    -------
+    dict
+        The result of the job. See build_datasets.
+
+    """
+    result = _get_result(index, job)
+    start = time.perf_counter()
+    key = f'job-{index}'
+    try:
+        # the dataset is written to a temporary file next to file_path, which only replaces it once the dataset is
+        # complete, so a failed job leaves no partly written file behind
+        sp = _worker_pool.get(access_token=job['access_token'], user_key=key)
+        sp.stream_api_data(data_key=result['data_key'],
+                           file_path=job['file_path'],
+                           source=job.get('source'),
+                           reset=True,
+                           market=job.get('market', 'US'),
+                           file_format=job.get('file_format'),
+                           compression=job.get('compression'))
+        result['songs'] = len(sp.data[result['data_key']])
+    except Exception as error:  # pylint: disable=broad-except
+        result['error'] = f'{type(error).__name__}: {error}'
+    finally:
+        # only the file is kept, the Spomato object and its dataset are dropped. The song ids interned by
+        # spomato.dataset.REGISTRY are kept for the life of the process, so its memory still grows with the number of
+        # distinct songs of the jobs it runs, and the pool's metadata cache grows up to its max_items
+        _worker_pool.remove(key)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _check_job(job):
+    """Internal function to check the arguments of a job before it is sent to a worker process.
+
+    Parameters
+    ----------
+    job : dict
+        The job. See build_datasets.
+
+    Returns
+    -------
+    None
+
+    """
+    if not isinstance(job, dict):
+        raise TypeError('Each job of the manifest must be of type dict')
+    if not isinstance(job.get('access_token'), str):
+        raise ValueError('Each job of the manifest must have an access_token.')
+    if not isinstance(job.get('file_path'), str):
+        raise ValueError('Each job of the manifest must have a file_path.')
+    for key in job.keys():
+        if key not in ['id', 'access_token', 'data_key', 'file_path', 'source', 'market', 'file_format', 'compression']:
+            raise ValueError(f'{key} is not a valid job argument.')
+
+
+def build_datasets(manifest, processes=None, max_workers=1, rate=None, progress=None):
+    """Builds the datasets of many jobs across a pool of processes, writing each dataset to its file.
+
+    Each job builds a dataset from the Spotify API with one access token, as get_api_data does, and streams it to a
+    file. The parsing of API responses is spread over every process, and a job that fails doesn't stop the others
+    and leaves its file as it was.
+
+    Parameters
+    ----------
+    manifest : list
+        A list of job dictionaries. Each job has an 'access_token' and the 'file_path' to write the dataset to, and
+        optionally an 'id' to identify it in the results, and the 'data_key', 'source', 'market', 'file_format' and
+        'compression' arguments of get_api_data.
+    processes : int
+        The number of processes to build datasets with. Default is None, which uses one per cpu.
+    max_workers : int
+        The number of threads each job uses to fetch data from the Spotify API concurrently. Default is 1.
+    rate : float
+        The total number of requests per second to send to the Spotify API, split evenly between the processes.
+        Default is None, which doesn't limit the rate.
+    progress : callable
+        A function called with the number of finished jobs, the number of jobs and the result of the job as each job
+        finishes. Default is None.
+
+    Returns
+    -------
+    list
+        The result of each job, in the order of the manifest. Each result is a dictionary of the job's 'index', 'id',
+        'data_key' and 'file_path', the number of 'songs' written, the 'seconds' it took, and the 'error' it failed
+        with, or None if it succeeded.
+
+    """
+    if not isinstance(manifest, list):
+        raise TypeError('Argument manifest must be of type list')
+    if processes is not None and not isinstance(processes, int):
+        raise TypeError('Argument processes must be of type int')
+    if not isinstance(max_workers, int):
+        raise TypeError('Argument max_workers must be of type int')
+    if rate is not None and not isinstance(rate, (int, float)):
+        raise TypeError('Argument rate must be of type int or float')
+    for job in manifest:
+        _check_job(job)
+
+    processes = min(processes or os.cpu_count() or 1, max(len(manifest), 1))
+    results = [None] * len(manifest)
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=_init_worker,
+                             initargs=(max_workers, None if rate is None else rate / processes)) as executor:
+        futures = {executor.submit(_build_job, index, job): index for index, job in enumerate(manifest)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                # the worker process died, so the job couldn't report its own error
+                result = _get_result(index, manifest[index])
+                result['error'] = f'{type(error).__name__}: {error}'
+            results[index] = result
+            if progress is not None:
+                progress(done, len(manifest), result)
+    return results
+
+
+def read_manifest(file):
+    """Reads a manifest of jobs from a file of a JSON list of jobs, or of one JSON job per line.
+
+    Parameters
+    ----------
+    file : file
+        The open manifest file.
+
+    Returns
+    -------
+    list
+        The list of job dictionaries.
+
+    """
+    text = file.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _print_progress(done, total, result):
+    """Internal function to print the progress of build_datasets to stderr."""
+    if result['error'] is None:
+        status = f'{result["songs"]} songs in {result["seconds"]}s'
+    else:
+        status = f'failed: {result["error"]}'
+    print(f'[{done}/{total}] {result["id"]}: {status}', file=sys.stderr, flush=True)
+
+
+def main(args=None):
+    """Runs the spomato-build command, which builds the datasets of a manifest and prints the result of each job to
+    stdout as a line of JSON.
+
+    Parameters
+    ----------
+    args : list
+        The command line arguments. Default is None, which uses sys.argv.
+
+    Returns
+    -------
+    int
+        The exit status, 1 if any job failed and 0 otherwise.
+
+    """
+    parser = argparse.ArgumentParser(prog='spomato-build',
+                                     description='Build the song datasets of many users from a manifest of jobs.')
+    parser.add_argument('manifest',
+                        help='A file of a JSON list of jobs, or of one JSON job per line. Use - to read stdin.')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='The number of processes to use. Defaults to one per cpu.')
+    parser.add_argument('--max-workers', type=int, default=1,
+                        help='The number of threads each job fetches from the Spotify API with.')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='The total number of requests per second to send to the Spotify API.')
+    parser.add_argument('--quiet', action='store_true', help='Do not print progress to stderr.')
+    args = parser.parse_args(args)
+
+    if args.manifest == '-':
+        manifest = read_manifest(sys.stdin)
+    else:
+        with open(args.manifest, encoding='utf-8') as file:
+            manifest = read_manifest(file)
+
+    results = build_datasets(manifest,
+                             processes=args.processes,
+                             max_workers=args.max_workers,
+                             rate=args.rate,
+                             progress=None if args.quiet else _print_progress)
+    for result in results:
+        print(json.dumps(result))
+    return 1 if any(result['error'] is not None for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
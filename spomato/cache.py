@@ -0,0 +1,384 @@
+"""Author: Matthew Russell
+
+This contains the response cache used by Spomato to avoid downloading data from the Spotify API that hasn't changed.
+
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from spomato.metadata import get_endpoint_type, must_revalidate
+
+# seconds each type of endpoint is cached for before it is revalidated, endpoint types not listed are not cached
+DEFAULT_TTLS = {
+    'albums': 7 * 24 * 3600,
+    'artists': 24 * 3600,
+    'search': 3600,
+    'playlists': 3600,
+    'me/playlists': 300,
+    'me/tracks': 300,
+}
+
+# endpoint types whose responses depend on the user of the access token
+USER_ENDPOINTS = {'me', 'me/playlists', 'me/tracks', 'playlists'}
+
+
+def get_http_adapter(pool_maxsize=10):
+    """Creates an http adapter that retries failed requests the same way a default spotipy session does.
+
+    Parameters
+    ----------
+    pool_maxsize : int
+        The number of connections to keep alive for reuse. Default is 10.
+
+    Returns
+    -------
+    requests.adapters.HTTPAdapter
+        The http adapter to mount on a requests session.
+
+    """
+    from requests.adapters import HTTPAdapter  # pylint: disable=import-outside-toplevel
+    from urllib3.util.retry import Retry  # pylint: disable=import-outside-toplevel
+    retry = Retry(total=3,
+                  connect=None,
+                  read=False,
+                  allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+                  status=3,
+                  backoff_factor=0.3,
+                  status_forcelist=(429, 500, 502, 503, 504))
+    return HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+
+
+def get_playlist_url(url):
+    """Gets the url of the playlist a request to the Spotify API reads or changes, used to find its cached responses.
+
+    Parameters
+    ----------
+    url : str
+        The url of the request, such as https://api.spotify.com/v1/playlists/{id}/tracks.
+
+    Returns
+    -------
+    str
+        The url of the playlist, such as https://api.spotify.com/v1/playlists/{id}, or the url of the request without
+        its query if it is not below a single playlist, such as the url creating a playlist.
+
+    """
+    url = url.partition('?')[0]
+    head, separator, tail = url.partition('/playlists/')
+    if separator == '':
+        return url
+    return head + separator + tail.split('/')[0]
+
+
+def get_user_key(headers):
+    """Gets a hash of the access token of a request, which keys the cached responses of user specific endpoints.
+
+    Parameters
+    ----------
+    headers : dict
+        The headers of the request.
+
+    Returns
+    -------
+    str
+        The hex digest of the sha256 hash of the Authorization header.
+
+    """
+    authorization = (headers or {}).get('Authorization', '')
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+class ResponseCache():
+    """A persistent cache of Spotify API responses stored in SQLite.
+
+    Responses are keyed by url and query parameters, and responses from user specific endpoints are also keyed by a hash
+    of the access token. Each endpoint type is cached for its own ttl, after which the response is revalidated with its
+    ETag if it has one. When the cache grows past max_bytes, the least recently used responses are evicted. The cache is
+    safe to share between threads and between Spomato objects.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database file. Default is ':memory:', which keeps the cache in memory.
+    ttls : dict
+        Seconds to cache each endpoint type for, updating DEFAULT_TTLS.
+    max_bytes : int
+        The maximum size of the cached responses in bytes.
+
+    Attributes
+    ----------
+    ttls : dict
+        Seconds to cache each endpoint type for.
+    max_bytes : int
+        The maximum size of the cached responses in bytes.
+
+    """
+
+    def __init__(self, path=':memory:', ttls=None, max_bytes=256 * 1024 * 1024):
+        if not isinstance(path, str):
+            raise TypeError('Argument path must be of type string')
+        if ttls is not None and not isinstance(ttls, dict):
+            raise TypeError('Argument ttls must be of type dict')
+        if not isinstance(max_bytes, int):
+            raise TypeError('Argument max_bytes must be of type int')
+
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT, '
+                                 'body BLOB, etag TEXT, expires REAL, accessed REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._connection.commit()
+        # the size of the cached responses is kept up to date as they change, rather than summed on every insert
+        self._size = self._get_size()
+
+
+    def get(self, key):
+        """Gets a cached response and marks it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key of the response.
+
+        Returns
+        -------
+        tuple
+            The response body, its ETag and whether it is still fresh, or None if the key is not cached.
+
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT body, etag, expires FROM responses WHERE key = ?',
+                                           (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self._connection.commit()
+        body, etag, expires = row
+        return zlib.decompress(body), etag, expires > now
+
+
+    def set(self, key, endpoint, body, etag=None):
+        """Caches a response for the ttl of its endpoint type and evicts the least recently used responses if the
+        cache is too large.
+
+        Parameters
+        ----------
+        key : str
+            The key of the response.
+        endpoint : str
+            The endpoint type of the response.
+        body : bytes
+            The response body.
+        etag : str
+            The ETag of the response, if it has one.
+
+        Returns
+        -------
+        None
+
+        """
+        now = time.time()
+        body = zlib.compress(body)
+        with self._lock:
+            replaced = self._connection.execute('SELECT LENGTH(body) FROM responses WHERE key = ?', (key,)).fetchone()
+            self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                                     (key, endpoint, body, etag, now + self.ttls.get(endpoint, 0), now))
+            self._size += len(body) - (replaced[0] if replaced is not None else 0)
+            # evict the least recently used responses until the cache fits
+            while self._size > self.max_bytes:
+                oldest_key, oldest_size = self._connection.execute(
+                    'SELECT key, LENGTH(body) FROM responses ORDER BY accessed LIMIT 1').fetchone()
+                self._connection.execute('DELETE FROM responses WHERE key = ?', (oldest_key,))
+                self._size -= oldest_size
+            self._connection.commit()
+
+
+    def refresh(self, key, endpoint):
+        """Restarts the ttl of a cached response, used after it has been revalidated.
+
+        Parameters
+        ----------
+        key : str
+            The key of the response.
+        endpoint : str
+            The endpoint type of the response.
+
+        Returns
+        -------
+        None
+
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute('UPDATE responses SET expires = ?, accessed = ? WHERE key = ?',
+                                     (now + self.ttls.get(endpoint, 0), now, key))
+            self._connection.commit()
+
+
+    def invalidate(self, endpoints=None, url=None, user=None):
+        """Removes cached responses.
+
+        Parameters
+        ----------
+        endpoints : list
+            The endpoint types to remove. Default is None, which removes every endpoint type.
+        url : str
+            Removes only the responses of this url and of the urls below it. Default is None, which removes every url.
+        user : str
+            Removes only the responses cached for the access token of this hash, as made by get_user_key.
+            Default is None, which removes the responses of every user.
+
+        Returns
+        -------
+        None
+
+        """
+        conditions = []
+        values = []
+        if endpoints is not None:
+            conditions.append(f'endpoint IN ({", ".join("?" * len(endpoints))})')
+            values.extend(endpoints)
+        if url is not None:
+            conditions.append('SUBSTR(key, 1, ?) IN (?, ?)')
+            values.extend([len(url) + 1, url + '?', url + '/'])
+        if user is not None:
+            conditions.append('SUBSTR(key, -?) = ?')
+            values.extend([len(user) + 1, '#' + user])
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        with self._lock:
+            self._connection.execute('DELETE FROM responses' + where, values)
+            self._connection.commit()
+            self._size = self._get_size()
+
+
+    @property
+    def nbytes(self):
+        """int: The size of the cached responses in bytes, as stored compressed."""
+        return self._size
+
+
+    def _get_size(self):
+        """Internal function to sum the size of the cached responses in the database.
+
+        Returns
+        -------
+        int
+            The size of the cached responses in bytes.
+
+        """
+        return self._connection.execute('SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses').fetchone()[0]
+
+
+    def session(self):
+        """Creates a requests session that reads and writes responses through this cache.
+
+        Returns
+        -------
+        CachedSession
+            A requests session to pass to spotipy.
+
+        """
+        return CachedSession(self)
+
+
+class CachedSession(requests.Session):
+    """A requests session that serves GET requests to the Spotify API from a ResponseCache.
+
+    Fresh cached responses are returned without a request. Stale responses with an ETag, and every response requested
+    inside spomato.metadata.revalidate_responses, are revalidated with If-None-Match and reused if the API responds 304
+    Not Modified. Any other request invalidates the cached responses it could affect: a change to a playlist drops the
+    responses of that playlist and the playlist listing of the user who changed it, and other writes drop the responses
+    of their endpoint type, only for that user if the endpoint type is user specific. The session retries failed
+    requests the same way a default spotipy session does.
+
+    Parameters
+    ----------
+    cache : ResponseCache
+        The cache to read and write responses through.
+
+    Attributes
+    ----------
+    cache : ResponseCache
+        The cache to read and write responses through.
+
+    """
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        adapter = get_http_adapter()
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+
+    def request(self, method, url, *args, params=None, headers=None, **kwargs):
+        endpoint = get_endpoint_type(url)
+
+        # writes change what the API returns, so drop the cached responses they could affect
+        if method.upper() != 'GET' or self.cache.ttls.get(endpoint, 0) <= 0:
+            response = super().request(method, url, *args, params=params, headers=headers, **kwargs)
+            if method.upper() != 'GET' and response.ok:
+                self._invalidate(url, headers, endpoint)
+            return response
+
+        key = self._get_key(url, params, headers, endpoint)
+        cached = self.cache.get(key)
+        if cached is not None:
+            body, etag, fresh = cached
+            if fresh and not must_revalidate():
+                return self._build_response(url, body)
+            if etag is not None:
+                headers = dict(headers or {}, **{'If-None-Match': etag})
+
+        response = super().request(method, url, *args, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.cache.refresh(key, endpoint)
+            return self._build_response(url, cached[0])
+        if response.status_code == 200:
+            self.cache.set(key, endpoint, response.content, response.headers.get('ETag'))
+        return response
+
+
+    def _invalidate(self, url, headers, endpoint):
+        """Internal function to remove the cached responses a successful write could have changed, leaving the
+        responses of other playlists and of other users in the cache.
+        """
+        user = get_user_key(headers)
+        if endpoint == 'playlists':
+            # every user of a playlist sees its change, and the listing of the user who changed it has its new snapshot
+            self.cache.invalidate(['playlists'], url=get_playlist_url(url))
+            self.cache.invalidate(['me/playlists'], user=user)
+        else:
+            self.cache.invalidate([endpoint], user=user if endpoint in USER_ENDPOINTS else None)
+
+
+    @staticmethod
+    def _get_key(url, params, headers, endpoint):
+        """Internal function to build the cache key of a request from its url, query parameters and, for user specific
+        endpoints, a hash of its access token.
+        """
+        key = url + '?' + urlencode(sorted((params or {}).items()))
+        if endpoint in USER_ENDPOINTS:
+            key += '#' + get_user_key(headers)
+        return key
+
+
+    @staticmethod
+    def _build_response(url, body):
+        """Internal function to build a requests response from a cached response body."""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response._content = body  # pylint: disable=protected-access
+        return response
@@ -0,0 +1,571 @@
+"""Author: Matthew Russell
+
+This contains the compact dataset type Spomato stores song data in, and the registry of song ids shared by every dataset
+in the process.
+
+"""
+
+# pandas are imported where they are used, so importing spomato stays quick
+# pylint: disable=import-outside-toplevel
+
+import hashlib
+import itertools
+import threading
+import numpy as np
+
+
+def hash_song_ids(song_ids):
+    """Hashes song ids to 64 bit integers. The hashes are the same in every process, so they can be saved to file.
+
+    Parameters
+    ----------
+    song_ids : iterable
+        The song ids to hash.
+
+    Returns
+    -------
+    numpy.ndarray
+        The uint64 hash of each song id.
+
+    """
+    return np.array([int.from_bytes(hashlib.blake2b(song_id.encode(), digest_size=8).digest(), 'little')
+                     for song_id in song_ids], dtype=np.uint64)
+
+
+class SongIdRegistry():
+    """Interns Spotify song ids as integer codes, so each id is only stored once no matter how many datasets contain it.
+
+    Attributes
+    ----------
+    ids : list
+        The song id of each code.
+
+    """
+
+    def __init__(self):
+        self.ids = []
+        self._codes = {}
+        self._id_array = np.array([], dtype=object)
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def encode(self, song_ids):
+        """Gets the codes of song ids, adding any new ids to the registry.
+
+        Parameters
+        ----------
+        song_ids : iterable
+            The song ids to encode.
+
+        Returns
+        -------
+        numpy.ndarray
+            The int32 code of each song id.
+
+        """
+        codes = self._codes
+        with self._lock:
+            result = []
+            for song_id in song_ids:
+                code = codes.get(song_id)
+                if code is None:
+                    code = codes[song_id] = len(self.ids)
+                    self.ids.append(song_id)
+                result.append(code)
+        return np.array(result, dtype=np.int32)
+
+
+    def decode(self, codes):
+        """Gets the song ids of codes.
+
+        Parameters
+        ----------
+        codes : numpy.ndarray
+            The codes to decode.
+
+        Returns
+        -------
+        numpy.ndarray
+            An object array of the song id of each code.
+
+        """
+        with self._lock:
+            # the array of ids is only rebuilt when new ids have been added since it was last built
+            if len(self._id_array) != len(self.ids):
+                self._id_array = np.array(self.ids, dtype=object)
+            id_array = self._id_array
+        return id_array[codes]
+
+
+# the registry shared by every dataset in the process unless another registry is given
+REGISTRY = SongIdRegistry()
+
+# numbers the datasets created in the process
+_VERSIONS = itertools.count()
+
+
+class DurationIndex():
+    """An index of the songs of a dataset sorted by length, so the songs up to a length, and their total time, are
+    found with a binary search rather than a pass over every song.
+
+    Parameters
+    ----------
+    duration_ms : numpy.ndarray
+        The length of each song in milliseconds.
+
+    Attributes
+    ----------
+    order : numpy.ndarray
+        The int32 positions of the songs sorted by length. Songs of the same length are in position order.
+    sorted_ms : numpy.ndarray
+        The int32 length of each song in milliseconds, in the sorted order.
+    prefix_ms : numpy.ndarray
+        The int64 total length in milliseconds of the first i sorted songs, for i from 0 to the number of songs.
+
+    """
+
+    __slots__ = ['order', 'sorted_ms', 'prefix_ms']
+
+    def __init__(self, duration_ms):
+        self.order = np.argsort(duration_ms, kind='stable').astype(np.int32)
+        self.sorted_ms = duration_ms[self.order]
+        self.prefix_ms = np.concatenate([[0], np.cumsum(self.sorted_ms, dtype=np.int64)])
+
+
+    @property
+    def nbytes(self):
+        """int: The number of bytes used by the index's arrays."""
+        return self.order.nbytes + self.sorted_ms.nbytes + self.prefix_ms.nbytes
+
+
+    def count_at_most(self, seconds):
+        """Counts the songs no longer than a length.
+
+        Parameters
+        ----------
+        seconds : float
+            The length in seconds.
+
+        Returns
+        -------
+        int
+            The number of songs no longer than seconds.
+
+        """
+        return int(np.searchsorted(self.sorted_ms, seconds * 1000, side='right'))
+
+
+    def positions_at_most(self, seconds):
+        """Gets the positions of the songs no longer than a length.
+
+        Parameters
+        ----------
+        seconds : float
+            The length in seconds.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions of the songs in the dataset, sorted by length.
+
+        """
+        return self.order[:self.count_at_most(seconds)]
+
+
+    def total_time_at_most(self, seconds):
+        """Gets the total length of the songs no longer than a length.
+
+        Parameters
+        ----------
+        seconds : float
+            The length in seconds.
+
+        Returns
+        -------
+        float
+            The total length in seconds of the songs no longer than seconds.
+
+        """
+        return self.prefix_ms[self.count_at_most(seconds)] / 1000
+
+
+class Dataset():
+    """A compact dataset of songs, used by Spomato to store the songs it can pick playlists from.
+
+    Song ids are stored as int32 codes into a SongIdRegistry shared between datasets, and song lengths are stored as
+    int32 milliseconds, so a dataset takes 8 bytes per song. Use to_frame to get a pandas DataFrame of song ids and
+    times in seconds.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray
+        The registry code of each song.
+    duration_ms : numpy.ndarray
+        The length of each song in milliseconds.
+    registry : SongIdRegistry
+        The registry the codes belong to. Default is the registry shared by the process.
+
+    Attributes
+    ----------
+    codes : numpy.ndarray
+        The int32 registry code of each song.
+    duration_ms : numpy.ndarray
+        The int32 length of each song in milliseconds.
+    registry : SongIdRegistry
+        The registry the codes belong to.
+    version : int
+        A number unique to the dataset in the process. Datasets are not changed once created, so results computed from
+        a dataset can be cached by its version.
+    duration_index : DurationIndex
+        The index of the songs by length, built the first time it is used.
+    hashes : numpy.ndarray
+        The uint64 hash of the song id of each song, computed the first time it is used. See hash_song_ids.
+
+    """
+
+    __slots__ = ['codes', 'duration_ms', 'registry', 'version', '_duration_index', '_hashes']
+
+    def __init__(self, codes, duration_ms, registry=REGISTRY):
+        codes = np.asarray(codes, dtype=np.int32)
+        duration_ms = np.asarray(duration_ms, dtype=np.int32)
+        if codes.shape != duration_ms.shape or codes.ndim != 1:
+            raise ValueError('Arguments codes and duration_ms must be 1 dimensional arrays of the same length.')
+        self.codes = codes
+        self.duration_ms = duration_ms
+        self.registry = registry
+        self.version = next(_VERSIONS)
+        self._duration_index = None
+        self._hashes = None
+
+
+    @classmethod
+    def from_tracks(cls, song_ids, duration_ms, registry=REGISTRY):
+        """Creates a dataset from song ids and their lengths in milliseconds.
+
+        Parameters
+        ----------
+        song_ids : iterable
+            The song ids.
+        duration_ms : iterable
+            The length of each song in milliseconds.
+        registry : SongIdRegistry
+            The registry to encode the song ids with.
+
+        Returns
+        -------
+        Dataset
+            The dataset of songs.
+
+        """
+        return cls(registry.encode(song_ids), duration_ms, registry)
+
+
+    @classmethod
+    def from_frame(cls, frame, registry=REGISTRY):
+        """Creates a dataset from a pandas DataFrame with columns of 'song_id' and 'time' in seconds.
+
+        Parameters
+        ----------
+        frame : pandas.DataFrame
+            The dataframe of songs.
+        registry : SongIdRegistry
+            The registry to encode the song ids with.
+
+        Returns
+        -------
+        Dataset
+            The dataset of songs.
+
+        """
+        duration_ms = np.rint(frame['time'].to_numpy(dtype=float) * 1000)
+        return cls.from_tracks(frame['song_id'].tolist(), duration_ms, registry)
+
+
+    @classmethod
+    def from_npz(cls, file_path, registry=REGISTRY):
+        """Creates a dataset from a numpy npz file written by to_npz. This doesn't need pandas.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+        registry : SongIdRegistry
+            The registry to encode the song ids with.
+
+        Returns
+        -------
+        Dataset
+            The dataset of songs.
+
+        """
+        with np.load(file_path, allow_pickle=False) as arrays:
+            if 'song_id' not in arrays.files or 'duration_ms' not in arrays.files:
+                raise ValueError('Arrays song_id and duration_ms not found in loaded data file.')
+            return cls.from_tracks(np.asarray(arrays['song_id']).tolist(), arrays['duration_ms'], registry)
+
+
+    @classmethod
+    def concat(cls, datasets):
+        """Concatenates datasets into one dataset.
+
+        Parameters
+        ----------
+        datasets : list
+            The datasets to concatenate. They must share the same registry.
+
+        Returns
+        -------
+        Dataset
+            The concatenated dataset.
+
+        """
+        datasets = list(datasets)
+        if len(datasets) == 0:
+            return cls([], [])
+        registry = datasets[0].registry
+        if any(dataset.registry is not registry for dataset in datasets):
+            raise ValueError('Datasets with different registries can not be concatenated.')
+        return cls(np.concatenate([dataset.codes for dataset in datasets]),
+                   np.concatenate([dataset.duration_ms for dataset in datasets]),
+                   registry)
+
+
+    def __len__(self):
+        return len(self.codes)
+
+
+    def __repr__(self):
+        return f'Dataset({len(self)} songs)'
+
+
+    @property
+    def song_ids(self):
+        """numpy.ndarray: An object array of the song id of each song."""
+        return self.registry.decode(self.codes)
+
+
+    @property
+    def time(self):
+        """numpy.ndarray: The length of each song in seconds."""
+        return self.duration_ms / 1000
+
+
+    @property
+    def nbytes(self):
+        """int: The number of bytes used by the dataset's arrays, including its duration index and hashes if they are
+        built."""
+        nbytes = self.codes.nbytes + self.duration_ms.nbytes
+        if self._duration_index is not None:
+            nbytes += self._duration_index.nbytes
+        if self._hashes is not None:
+            nbytes += self._hashes.nbytes
+        return nbytes
+
+
+    @property
+    def hashes(self):
+        """numpy.ndarray: The uint64 hash of the song id of each song, computed the first time it is used. Datasets
+        are not changed once created, so the hashes are kept for every later pick from the dataset."""
+        if self._hashes is None:
+            self._hashes = hash_song_ids(self.song_ids)
+        return self._hashes
+
+
+    @property
+    def duration_index(self):
+        """DurationIndex: The index of the songs by length, built the first time it is used."""
+        if self._duration_index is None:
+            self.build_index()
+        return self._duration_index
+
+
+    def build_index(self):
+        """Builds the index of the songs by length, if it isn't already built. Spomato builds it when a dataset is
+        loaded, so that picks from the dataset don't have to.
+
+        Returns
+        -------
+        None
+
+        """
+        if self._duration_index is None:
+            self._duration_index = DurationIndex(self.duration_ms)
+
+
+    def take(self, positions):
+        """Creates a dataset of the songs at the given positions.
+
+        Parameters
+        ----------
+        positions : numpy.ndarray
+            The positions of the songs to take.
+
+        Returns
+        -------
+        Dataset
+            The dataset of the selected songs, in the order of the positions.
+
+        """
+        return Dataset(self.codes[positions], self.duration_ms[positions], self.registry)
+
+
+    def drop_duplicates(self):
+        """Creates a dataset with any repeated songs removed, keeping the first of each.
+
+        Returns
+        -------
+        Dataset
+            The dataset without duplicates.
+
+        """
+        keys = (self.codes.astype(np.int64) << 32) | self.duration_ms.astype(np.int64)
+        _, first = np.unique(keys, return_index=True)
+        return self.take(np.sort(first))
+
+
+    def _check_registry(self, other):
+        """Internal function to check another dataset shares the registry of this dataset, so their codes match."""
+        if not isinstance(other, Dataset):
+            raise TypeError('Argument other must be of type Dataset')
+        if other.registry is not self.registry:
+            raise ValueError('Datasets with different registries can not be combined.')
+
+
+    def isin(self, other):
+        """Finds the songs of this dataset whose song ids are in another dataset.
+
+        The codes of both datasets are compared with np.isin, so the time depends only on the sizes of the two datasets
+        and not on the number of ids in their registry, which grows for as long as the process runs.
+
+        Parameters
+        ----------
+        other : Dataset
+            The dataset to look the songs up in. It must share the registry of this dataset.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean array of whether each song is in the other dataset.
+
+        """
+        self._check_registry(other)
+        return np.isin(self.codes, other.codes)
+
+
+    def union(self, other):
+        """Creates a dataset of the songs of this dataset followed by the songs of another dataset that are not in it.
+
+        Parameters
+        ----------
+        other : Dataset
+            The dataset to add. It must share the registry of this dataset.
+
+        Returns
+        -------
+        Dataset
+            The dataset of the songs in either dataset.
+
+        """
+        return Dataset.concat([self, other.difference(self)])
+
+
+    def intersection(self, other):
+        """Creates a dataset of the songs of this dataset that are also in another dataset, in the order of this one.
+
+        Parameters
+        ----------
+        other : Dataset
+            The dataset to intersect with. It must share the registry of this dataset.
+
+        Returns
+        -------
+        Dataset
+            The dataset of the songs in both datasets.
+
+        """
+        return self.take(np.flatnonzero(self.isin(other)))
+
+
+    def difference(self, other):
+        """Creates a dataset of the songs of this dataset that are not in another dataset, in the order of this one.
+
+        Parameters
+        ----------
+        other : Dataset
+            The dataset of songs to remove. It must share the registry of this dataset.
+
+        Returns
+        -------
+        Dataset
+            The dataset of the songs only in this dataset.
+
+        """
+        return self.take(np.flatnonzero(~self.isin(other)))
+
+
+    def filter_time(self, min_seconds=None, max_seconds=None):
+        """Creates a dataset of the songs of this dataset with a length in a range, in the order of this one.
+
+        Parameters
+        ----------
+        min_seconds : float
+            The shortest length in seconds to keep. Default is None, which keeps songs of any short length.
+        max_seconds : float
+            The longest length in seconds to keep. Default is None, which keeps songs of any long length.
+
+        Returns
+        -------
+        Dataset
+            The dataset of the songs within the lengths.
+
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if min_seconds is not None:
+            keep &= self.duration_ms >= min_seconds * 1000
+        if max_seconds is not None:
+            keep &= self.duration_ms <= max_seconds * 1000
+        return self.take(np.flatnonzero(keep))
+
+
+    def to_frame(self):
+        """Creates a pandas DataFrame of the dataset.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe of song ids (str) and time in seconds (float) for each song.
+
+        """
+        import pandas as pd
+        return pd.DataFrame({'song_id': pd.Series(self.song_ids, dtype=str),
+                             'time': self.time})
+
+
+    def to_npz(self, file_path, compress=False, metadata=None):
+        """Saves the dataset to a numpy npz file of song ids and lengths in milliseconds. This doesn't need pandas,
+        and is the fastest format to load.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+        compress : bool
+            Whether to compress the arrays. Default is False.
+        metadata : str
+            A string saved with the arrays as the array metadata. Default is None, which saves no metadata.
+
+        Returns
+        -------
+        None
+
+        """
+        # song ids are saved as a fixed width string array, so the file can be loaded without pickle
+        song_ids = np.array(self.song_ids.tolist(), dtype=str)
+        save = np.savez_compressed if compress else np.savez
+        with open(file_path, 'wb') as file:
+            save(file, song_id=song_ids, duration_ms=self.duration_ms,
+                 **({} if metadata is None else {'metadata': np.array(metadata)}))
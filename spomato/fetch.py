@@ -0,0 +1,516 @@
+"""Author: Matthew Russell
+
+This contains the methods Spomato uses to build song datasets from the Spotify API through a spotipy session.
+
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from spomato.base import ALBUM_BATCH_SIZE
+from spomato.dataset import Dataset
+from spomato.metrics import timed
+from spomato.scheduler import prioritized, request_priority
+
+
+class FetchMixin():
+    """Methods of Spomato to build song datasets from the saved tracks, playlists and artists of the Spotify API.
+    Requests are made through the spotipy session of the Spomato object, concurrently when it has max_workers.
+    """
+
+    def _map_concurrent(self, func, items):
+        """Internal function to call a function on each item, using the thread pool of the object when max_workers is
+        more than 1.
+
+        The calling thread runs the items no worker has started yet, so calls made from inside the function share the
+        same workers instead of starting more threads, and at most max_workers items run at once. The results are
+        returned in the same order as the items, so the merged data is the same no matter how many workers are used.
+
+        Parameters
+        ----------
+        func : callable
+            Function to call with each item.
+        items : iterable
+            The items to call the function with.
+
+        Returns
+        -------
+        list
+            The results of the function for each item, in the order of the items.
+
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        # run each call in a copy of the caller's context, so the request priority carries over to the threads
+        executor = self._get_executor()
+        futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+        try:
+            # a call no worker has started is cancelled and run here, rather than waiting for a worker to be free
+            return [func(item) if future.cancel() else future.result() for future, item in zip(futures, items)]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+    def _get_executor(self):
+        """Internal function to get the thread pool shared by every concurrent call of the object, creating it the first
+        time it is used. It has one thread fewer than max_workers, since the calling thread also runs items.
+
+        Returns
+        -------
+        concurrent.futures.ThreadPoolExecutor
+            The thread pool of the object.
+
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers - 1, thread_name_prefix='spomato')
+            return self._executor
+
+
+    def _get_pages(self, fetch_page, limit, first_page=None):
+        """Internal function to get every page of a paged endpoint of the spotify API. The total from the first page
+        is used to fetch the remaining pages concurrently.
+
+        Parameters
+        ----------
+        fetch_page : callable
+            Function that takes limit and offset keyword arguments and returns a paging object from the API.
+        limit : int
+            The number of items per page.
+        first_page : dict
+            The first paging object, if it has already been fetched. Default is None.
+
+        Returns
+        -------
+        list
+            The paging objects of every page, in order.
+
+        """
+        if first_page is None:
+            first_page = fetch_page(limit=limit, offset=0)
+        offsets = range(len(first_page['items']), first_page['total'], limit)
+        pages = self._map_concurrent(lambda offset: fetch_page(limit=limit, offset=offset), offsets)
+        self.metrics.increment('api.pages', len(pages) + 1)
+        return [first_page] + pages
+
+
+    def _iter_pages(self, fetch_page, limit):
+        """Internal function to iterate over the pages of a paged endpoint of the spotify API, fetching each page only
+        when the previous page has been used.
+
+        Parameters
+        ----------
+        fetch_page : callable
+            Function that takes limit and offset keyword arguments and returns a paging object from the API.
+        limit : int
+            The number of items per page.
+
+        Yields
+        ------
+        dict
+            The paging object of each page, in order.
+
+        """
+        offset = 0
+        while True:
+            with request_priority('bulk'):
+                page = fetch_page(limit=limit, offset=offset)
+            self.metrics.increment('api.pages')
+            yield page
+            offset += len(page['items'])
+            if len(page['items']) == 0 or offset >= page['total']:
+                break
+
+
+    @prioritized('bulk')
+    @timed('dataset.build')
+    def get_api_data(self,
+                     data_key='default',
+                     file_path=None,
+                     source=None,
+                     reset=False,
+                     market='US',
+                     *,
+                     incremental=False,
+                     file_format=None,
+                     compression=None):
+        """Generates a song dataset to load into Spomato to be used for generating new playlists.
+
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        file_path : str
+            If not None, the dataset generated will also be saved to the specified file path..
+        source : dict
+            Contains all sources you want to use in generating the dataset. The dictionary is keyed by one of 3 source
+            types: savedtracks, playlist, or artist. For savedtracks the value can be None, as no further data is
+            required. For playlist or artist, the value should contain a list of all spotify ids of the appropriate
+            type. If not specified, it defaults to your saved tracks.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+        incremental : bool
+            If True and the dataset was built only from saved tracks, only the tracks saved since the dataset was last
+            built are fetched and added to it. Tracks removed from the saved tracks are not removed from the dataset.
+            Default is False.
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz' to save the dataset as. If None, the format is chosen by the
+            file extension of file_path.
+        compression : str
+            The compression to save the dataset with, such as 'zstd' or 'gzip'. If None, the default compression of the
+            file format is used.
+
+        Returns
+        -------
+        None
+
+        """
+        source = self._check_api_args(source, market, incremental)
+        self._check_file_args(file_path, file_format, compression)
+        self._check_new_data_key(data_key, reset)
+
+        # generate the dataset and save it into the Spomato object
+        if list(source) == ['savedtracks']:
+            added_after = self._get_added_after(data_key, market, incremental)
+            data, added_at = self._get_saved_tracks_since(market, added_after=added_after)
+            self._set_saved_tracks_data(data_key, data, added_after, {'added_at': added_at, 'market': market})
+        else:
+            self._set_api_data(data_key, self._get_new_data(source=source, market=market))
+
+        # Cache the data if the file_path is specified
+        if file_path:
+            self._cache_data(data_key=data_key,
+                             file_path=file_path,
+                             file_format=file_format,
+                             compression=compression)
+
+
+    def iter_api_data(self,
+                      source=None,
+                      market='US'):
+        """Generates the songs of a dataset in batches as they are downloaded from the Spotify API.
+
+        Each page of saved tracks or playlist songs, and all of the songs of each artist, is parsed and yielded as soon
+        as it is downloaded, so only one page is held in memory at a time. Songs that were already yielded are removed
+        from each batch, so the batches together hold the same songs as the dataset built by get_api_data.
+
+        Parameters
+        ----------
+        source : dict
+            Contains all sources you want to use in generating the dataset. See get_api_data. If not specified, it
+            defaults to your saved tracks.
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Yields
+        ------
+        Dataset
+            A batch of songs that haven't been yielded before. Batches may be empty.
+
+        """
+        source = self._check_api_args(source, market)
+
+        def iter_batches():
+            for sourcetype, source_list in source.items():
+                if sourcetype == 'savedtracks':
+                    for page in self._iter_pages(self.spotipy_session.current_user_saved_tracks, limit=50):
+                        yield self._parse_saved_tracks(page['items'], market)
+                elif sourcetype == 'playlist':
+                    for pl_id in source_list:
+                        def fetch_page(limit, offset, pl_id=pl_id):
+                            return self.spotipy_session.playlist_tracks(pl_id, limit=limit, offset=offset)
+
+                        for page in self._iter_pages(fetch_page, limit=100):
+                            yield self._parse_public_playlist(page, market)
+                else:
+                    for artist_id in source_list:
+                        with request_priority('bulk'):
+                            artist_data = self._get_artist_data(artist_id, market)
+                        yield artist_data
+
+        # remove the songs of each batch that are repeated in the batch or were in an earlier batch
+        seen = set()
+        for batch in iter_batches():
+            yield self._drop_seen(batch, seen)
+
+
+    def stream_api_data(self,
+                        data_key='default',
+                        file_path=None,
+                        source=None,
+                        reset=False,
+                        market='US',
+                        *,
+                        file_format=None,
+                        compression=None):
+        """Generates a song dataset like get_api_data, but parses each batch of songs, and adds it to the file if
+        file_path is given, as soon as it is downloaded.
+
+        Only the compact batches of songs are kept, not the pages of the download, and they are added to the data
+        dictionary once the download is complete, so a dataset that is regenerated with reset is kept until then. Use
+        iter_api_data to pick from the songs as they arrive. The file is written to a temporary file that replaces
+        file_path once the download is complete. If the download fails, the file and the data dictionary are left as
+        they were.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        file_path : str
+            If not None, the dataset generated will also be saved to the specified file path.
+        source : dict
+            Contains all sources you want to use in generating the dataset. See get_api_data. If not specified, it
+            defaults to your saved tracks.
+        reset : bool
+            Boolean to determine if the dataset should be regenerated if it already exists.
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+        file_format : str
+            One of 'csv', 'parquet', 'feather' or 'npz' to save the dataset as. If None, the format is chosen by the
+            file extension of file_path.
+        compression : str
+            The compression to save the dataset with. If None, the default compression of the file format is used.
+
+        Returns
+        -------
+        None
+
+        """
+        self._check_file_args(file_path, file_format, compression)
+        self._check_new_data_key(data_key, reset)
+
+        # the batches are concatenated once the download is complete, rather than copying the dataset for each batch,
+        # so a dataset that is being regenerated is kept until then
+        batches = []
+        with self._open_writer(file_path, file_format, compression) as writer:
+            for batch in self.iter_api_data(source=source, market=market):
+                if len(batch) == 0:
+                    continue
+                batches.append(batch)
+                if writer is not None:
+                    writer.write(batch)
+        self.data[data_key] = Dataset.concat(batches)
+        self.high_water_marks.pop(data_key, None)
+
+
+    def _get_playlist_dataframe(self,
+                                source_list,
+                                market):
+        """Short summary.
+
+        Parameters
+        ----------
+        source_list : list
+            A list of playlist ids to source songs from
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of songs with song id and time.
+
+        """
+        # get the index of the user's playlists to tell the user's playlists from public playlists
+        playlist_index = self._get_playlist_index()
+
+        def get_playlist(pl_id):
+            def fetch_page(limit, offset):
+                return self.spotipy_session.playlist_tracks(pl_id, limit=limit, offset=offset)
+
+            if pl_id in playlist_index:
+                pl_json = self.spotipy_session.user_playlist(self.current_user_id, pl_id)
+                pages = self._get_pages(fetch_page, limit=100, first_page=pl_json['tracks'])
+                pl_dfs = [self._parse_user_playlist(pl_json, market)]
+            else:
+                pages = self._get_pages(fetch_page, limit=100)
+                pl_dfs = [self._parse_public_playlist(pages[0], market)]
+            pl_dfs += [self._parse_public_playlist(page, market) for page in pages[1:]]
+            return Dataset.concat(pl_dfs)
+
+        # fetch the playlists concurrently, the results keep the order of the source list
+        playlist_list = self._map_concurrent(get_playlist, source_list)
+
+        if len(playlist_list) == 0:
+            raise ValueError('No valid playlists.')
+
+        # concatinate the datasets of all the playlist and remove any duplicates
+        data = Dataset.concat(playlist_list).drop_duplicates()
+
+        return data
+
+
+    def _get_artist_dataframe(self,
+                              source_list,
+                              market):
+        """Short summary.
+
+        Parameters
+        ----------
+        source_list : list
+            A list of playlist ids to source songs from
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of songs with song id and time.
+
+        """
+        # get the data for each artist from the Spotify API and parse the song data
+        artist_list = self._map_concurrent(lambda artist: self._get_artist_data(artist, market), source_list)
+
+        # concatinate the datasets of all the playlist and remove any duplicates
+        data = Dataset.concat(artist_list).drop_duplicates()
+
+        return data
+
+
+    def _get_new_data(self,
+                      source=None,
+                      market='US'):
+        """Creates a new dataset from the specified source list and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        source : dict
+            Contains all sources you want to use in generating the dataset. The dictionary is keyed by one of 3 source
+            types: savedtracks, playlist, or artist. For savedtracks the value can be None, as no further data is
+            required. For playlist or artist, the value should contain a list of all spotify ids of the appropriate
+            type.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids generated from the sources.
+
+        """
+        source = self._check_source(source)
+
+        def get_source_data(sourcetype):
+            if sourcetype == 'savedtracks':
+                return self._get_saved_tracks(market)
+            if sourcetype == 'playlist':
+                return self._get_playlist_dataframe(source_list=source['playlist'],
+                                                    market=market)
+            return self._get_artist_dataframe(source_list=source['artist'],
+                                              market=market)
+
+        # get the data for each of the source types in the source dictionary concurrently
+        data_list = self._map_concurrent(get_source_data, source.keys())
+
+        # concatinate the datasets of all the source types and remove any duplicates
+        data = Dataset.concat(data_list)
+        tags = {'source': ','.join(source.keys())}
+        self.metrics.observe('dataset.rows_fetched', len(data), tags)
+        data = data.drop_duplicates()
+        self.metrics.observe('dataset.rows', len(data), tags)
+
+        return data
+
+
+    def _get_saved_tracks(self, market):
+        """Access the spotify API to get the saved tracks for a user and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids generated from the sources.
+
+        """
+        track_df, _ = self._get_saved_tracks_since(market)
+        return track_df
+
+
+    def _get_saved_tracks_since(self, market, added_after=None):
+        """Access the spotify API to get the saved tracks for a user that were added since a point in time, and returns
+        a Dataset of song ids and times along with when the newest saved track was added.
+
+        Saved tracks are returned newest first, so when added_after is given the pages are fetched one at a time until
+        a track added before it is reached. Otherwise every page is fetched.
+
+        Parameters
+        ----------
+        market : str
+            A string representation of the Spotify market to filter on.
+        added_after : str
+            The added_at timestamp of the newest track already known. Tracks added at or after this time are returned.
+            Default is None, which returns every saved track.
+
+        Returns
+        -------
+        tuple
+            A dataset of song ids and times, and the added_at timestamp of the newest saved track.
+
+        """
+        if added_after is None:
+            # get every page of a user's saved tracks
+            pages = self._get_pages(self.spotipy_session.current_user_saved_tracks, limit=50)
+            items = [item for page in pages for item in page['items']]
+        else:
+            # iterate over a user's saved tracks until a track older than the high water mark is reached
+            items = []
+            done = False
+            while not done:
+                page = self.spotipy_session.current_user_saved_tracks(limit=50, offset=len(items))
+                self.metrics.increment('api.pages')
+                new_items, done = self._get_items_since(page, added_after)
+                items += new_items
+
+        return self._parse_saved_items(items, market, added_after)
+
+
+    def _get_artist_data(self, artist_id, market):
+        """Access the spotify API to get an artist's tracks and returns a Dataset of song ids and times.
+
+        Parameters
+        ----------
+        artist_id : type
+            Description of parameter `artist_id`.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and times generated from the sources.
+
+        """
+        # the songs of popular artists are likely to have been fetched already for another user
+        data = self._get_cached_songs(('artist', artist_id, market))
+        if data is not None:
+            return data
+
+        # get all of the artist's albums ids and parse out the json for each
+        def fetch_page(limit, offset):
+            return self.spotipy_session.artist_albums(artist_id, limit=limit, offset=offset)
+
+        pages = self._get_pages(fetch_page, limit=20)
+        album_ids = [x['id'] for page in pages for x in page['items']]
+
+        # only fetch the albums that aren't cached
+        albums = self._get_cached_albums(album_ids, market)
+        new_album_ids = [album_id for album_id in album_ids if album_id not in albums]
+
+        def get_albums(album_id_chunk):
+            # parse out the songs of each album in the market as soon as its chunk arrives
+            return self._parse_albums(self.spotipy_session.albums(album_id_chunk)['albums'], market)
+
+        # fetch the albums in chunks of the most ids the API accepts in one request
+        chunks = [new_album_ids[i:i + ALBUM_BATCH_SIZE] for i in range(0, len(new_album_ids), ALBUM_BATCH_SIZE)]
+        for chunk_albums in self._map_concurrent(get_albums, chunks):
+            self._add_albums(albums, chunk_albums, market)
+
+        return self._set_artist_data(artist_id, market, album_ids, albums)
@@ -0,0 +1,223 @@
+"""Author: Matthew Russell
+
+This contains the play history Spomato uses to avoid picking the songs of recent playlists again.
+
+"""
+
+import threading
+import time
+import numpy as np
+from spomato.dataset import hash_song_ids
+
+
+class PlayHistory():  # pylint: disable=too-many-instance-attributes
+    """A history of the songs picked for a user's recent playlists, so the next playlists can leave them out.
+
+    The history is a ring buffer of the 64 bit hash of each song id and the time it was picked. It holds at most
+    max_items songs, replacing the oldest once it is full, and songs picked more than ttl seconds ago are forgotten.
+    Each song takes 16 bytes, so a history of a thousand songs is 16KB in memory and on disk. The history is safe to
+    share between threads.
+
+    Parameters
+    ----------
+    max_items : int
+        The maximum number of songs to remember. Default is 1000.
+    ttl : float
+        Seconds to remember each song for. Default is one day.
+
+    Attributes
+    ----------
+    max_items : int
+        The maximum number of songs to remember.
+    ttl : float
+        Seconds to remember each song for.
+
+    """
+
+    def __init__(self, max_items=1000, ttl=24 * 3600):
+        if not isinstance(max_items, int):
+            raise TypeError('Argument max_items must be of type int')
+        if max_items < 1:
+            raise ValueError('Argument max_items must be at least 1.')
+        if not isinstance(ttl, (int, float)):
+            raise TypeError('Argument ttl must be of type int or float')
+
+        self.max_items = max_items
+        self.ttl = ttl
+        self._hashes = np.zeros(max_items, dtype=np.uint64)
+        self._times = np.full(max_items, -np.inf)
+        self._next = 0
+        self._lock = threading.Lock()
+        # the sorted hashes of the songs still remembered, and when the first of them will be forgotten
+        self._recent = None
+        self._recent_expires = np.inf
+
+
+    def __len__(self):
+        return int(np.count_nonzero(self._times > time.time() - self.ttl))
+
+
+    @property
+    def nbytes(self):
+        """int: The number of bytes used by the history's arrays."""
+        return self._hashes.nbytes + self._times.nbytes
+
+
+    def add(self, song_ids, played_at=None):
+        """Adds songs to the history.
+
+        Parameters
+        ----------
+        song_ids : iterable
+            The song ids to add.
+        played_at : float
+            The time the songs were picked, in seconds since the epoch. Default is None, which uses the current time.
+
+        Returns
+        -------
+        None
+
+        """
+        self.add_hashes(hash_song_ids(song_ids), played_at)
+
+
+    def add_hashes(self, hashes, played_at=None):
+        """Adds songs to the history by the hashes of their song ids.
+
+        Parameters
+        ----------
+        hashes : numpy.ndarray
+            The uint64 hashes of the song ids to add. See spomato.dataset.hash_song_ids.
+        played_at : float
+            The time the songs were picked, in seconds since the epoch. Default is None, which uses the current time.
+
+        Returns
+        -------
+        None
+
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)[-self.max_items:]
+        played_at = time.time() if played_at is None else played_at
+        with self._lock:
+            # write the songs after the newest, wrapping around over the oldest
+            slots = (self._next + np.arange(len(hashes))) % self.max_items
+            self._hashes[slots] = hashes
+            self._times[slots] = played_at
+            self._next = (self._next + len(hashes)) % self.max_items
+            self._recent = None
+
+
+    def clear(self):
+        """Forgets every song in the history.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self._times[:] = -np.inf
+            self._next = 0
+            self._recent = None
+
+
+    def recent(self, now=None):
+        """Gets the hashes of the songs still remembered at a time. They are kept until a song is added or forgotten,
+        so they aren't found again each time they are used.
+
+        Parameters
+        ----------
+        now : float
+            The time in seconds since the epoch. Default is None, which uses the current time.
+
+        Returns
+        -------
+        numpy.ndarray
+            The sorted unique uint64 hashes of the remembered songs.
+
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._recent is None or now >= self._recent_expires:
+                remembered = self._times > now - self.ttl
+                self._recent = np.unique(self._hashes[remembered])
+                self._recent_expires = self._times[remembered].min() + self.ttl if remembered.any() else np.inf
+            return self._recent
+
+
+    def contains(self, hashes, now=None):
+        """Finds the songs that are in the history.
+
+        Parameters
+        ----------
+        hashes : numpy.ndarray
+            The uint64 hashes of the song ids to look up. See spomato.dataset.hash_song_ids.
+        now : float
+            The time to look the songs up at, in seconds since the epoch. Default is None, which uses the current time.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean array of whether each song is in the history.
+
+        """
+        recent = self.recent(now)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(recent) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        # binary search each hash in the sorted hashes of the history
+        found = np.searchsorted(recent, hashes).clip(max=len(recent) - 1)
+        return recent[found] == hashes
+
+
+    def save(self, file_path):
+        """Saves the history to a numpy npz file.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            # the remembered songs are saved oldest first, so the history can be loaded with a different max_items
+            order = np.roll(np.arange(self.max_items), -self._next)
+            remembered = order[self._times[order] > time.time() - self.ttl]
+            hashes = self._hashes[remembered]
+            times = self._times[remembered]
+        with open(file_path, 'wb') as file:
+            np.savez(file, hashes=hashes, times=times, ttl=self.ttl)
+
+
+    @classmethod
+    def load(cls, file_path, max_items=1000, ttl=None):
+        """Loads a history saved with save.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the file.
+        max_items : int
+            The maximum number of songs to remember. If the file has more songs, the oldest are dropped. Default is
+            1000.
+        ttl : float
+            Seconds to remember each song for. Default is None, which uses the ttl of the saved history.
+
+        Returns
+        -------
+        PlayHistory
+            The loaded history.
+
+        """
+        with np.load(file_path, allow_pickle=False) as arrays:
+            history = cls(max_items=max_items, ttl=float(arrays['ttl']) if ttl is None else ttl)
+            hashes = np.asarray(arrays['hashes'])[-max_items:]
+            times = np.asarray(arrays['times'])[-max_items:]
+        history._hashes[:len(hashes)] = hashes
+        history._times[:len(times)] = times
+        history._next = len(hashes) % max_items
+        return history
@@ -0,0 +1,168 @@
+"""Author: Matthew Russell
+
+This contains the in memory cache of artist and album songs shared by Spomato objects, the endpoint types of Spotify
+API requests used to cache and measure them, and the context that makes cached responses be revalidated. It doesn't
+import requests, so Spomato can be imported without it.
+
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+_revalidate = contextvars.ContextVar('spomato_revalidate', default=False)
+
+
+@contextlib.contextmanager
+def revalidate_responses():
+    """Context manager that makes the requests made inside it revalidate cached responses, even those that are still
+    fresh. Used when a response must be current, such as the songs of a playlist that is about to be changed.
+
+    Returns
+    -------
+    None
+
+    """
+    token = _revalidate.set(True)
+    try:
+        yield
+    finally:
+        _revalidate.reset(token)
+
+
+def must_revalidate():
+    """Gets whether the requests made in the current context must revalidate cached responses.
+
+    Returns
+    -------
+    bool
+        True inside revalidate_responses.
+
+    """
+    return _revalidate.get()
+
+
+def get_endpoint_type(url):
+    """Gets the type of a Spotify API endpoint from a request url, used to look up its ttl.
+
+    Parameters
+    ----------
+    url : str
+        The url of the request.
+
+    Returns
+    -------
+    str
+        The endpoint type, such as 'albums', 'playlists' or 'me/tracks'.
+
+    """
+    parts = [part for part in urlparse(url).path.split('/') if part and part != 'v1']
+    if len(parts) == 0:
+        return ''
+    if parts[0] == 'me':
+        return '/'.join(parts[:2])
+    if parts[0] == 'users' and 'playlists' in parts:
+        return 'playlists'
+    return parts[0]
+
+
+class MetadataCache():
+    """An in memory cache of parsed artist and album songs, shared by Spomato objects so that the songs of a popular
+    artist are only fetched once per process.
+
+    Entries are kept for ttl seconds, and when the cache holds more than max_items entries the least recently used are
+    evicted. The cache is safe to share between threads.
+
+    Parameters
+    ----------
+    max_items : int
+        The maximum number of entries to keep. Default is 100000.
+    ttl : float
+        Seconds to keep each entry for. Default is one day.
+
+    Attributes
+    ----------
+    max_items : int
+        The maximum number of entries to keep.
+    ttl : float
+        Seconds to keep each entry for.
+
+    """
+
+    def __init__(self, max_items=100000, ttl=24 * 3600):
+        if not isinstance(max_items, int):
+            raise TypeError('Argument max_items must be of type int')
+        if not isinstance(ttl, (int, float)):
+            raise TypeError('Argument ttl must be of type int or float')
+
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def get(self, key):
+        """Gets a cached entry and marks it as recently used.
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the entry.
+
+        Returns
+        -------
+        object
+            The cached value, or None if the key is not cached or has expired.
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return value
+
+
+    def set(self, key, value):
+        """Caches an entry for the ttl of the cache and evicts the least recently used entries if the cache is full.
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the entry.
+        value : object
+            The value to cache.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+
+    def invalidate(self):
+        """Removes every cached entry.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,343 @@
+"""Author: Matthew Russell
+
+This contains the metrics Spomato records about its requests to the Spotify API, its datasets and its track picks, and
+the exporters they can be sent to.
+
+Spomato records these metrics:
+ - api.request: Seconds each call to the Spotify API took, including retries, tagged by endpoint.
+ - api.error: Calls to the Spotify API that raised an error, tagged by endpoint.
+ - api.bytes: Bytes of each response body from the Spotify API, tagged by endpoint.
+ - api.pages: Pages fetched from paged endpoints of the Spotify API.
+ - dataset.build: Seconds taken to build a dataset with get_api_data.
+ - dataset.rows_fetched: Songs fetched for a dataset before duplicates are removed, tagged by source.
+ - dataset.rows: Songs in a dataset after duplicates are removed, tagged by source.
+ - pick.tracks: Seconds taken to pick the tracks of a playlist with pick_tracks.
+ - pick.cached: Seeded picks returned from the pick cache instead of being picked again.
+ - pick.batch: Seconds taken to pick the tracks of many playlists with pick_tracks_batch.
+ - pick.draws: Random draws made by the 'random' pick method in a call.
+ - pick.compactions: Times the candidate tracks were filtered down by the 'random' pick method in a call.
+ - pick.random_picks: Tracks picked at random by the 'fill' pick method in a call, before it solves for the rest.
+ - pick.solver_cells: Subset sum cells computed by the 'fill' pick method in a call.
+ - pick.recent_excluded: Songs left out of a pick because they are in the play history.
+ - playlist.write: Seconds taken to create or overwrite a playlist with make_playlist.
+
+The pick metrics are tagged by method. The endpoint of Spomato is the name of the spotipy method called, such as
+'playlist_tracks', and the endpoint of AsyncSpomato is the type of the API endpoint requested, such as 'playlists'.
+
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import socket
+import threading
+import time
+from spomato.metadata import get_endpoint_type
+
+# the spotipy method being called, used to tag the responses it receives
+_endpoint = contextvars.ContextVar('spomato_endpoint', default=None)
+
+
+class Metrics():
+    """Records metrics. This records nothing, and is the default of Spomato. Subclass it and override increment, timing
+    and observe to send metrics elsewhere.
+    """
+
+    def increment(self, name, value=1, tags=None):
+        """Adds to a counter.
+
+        Parameters
+        ----------
+        name : str
+            The name of the metric.
+        value : int
+            The amount to add. Default is 1.
+        tags : dict
+            Tags of the metric. Default is None.
+
+        Returns
+        -------
+        None
+
+        """
+
+
+    def timing(self, name, seconds, tags=None):
+        """Records a duration.
+
+        Parameters
+        ----------
+        name : str
+            The name of the metric.
+        seconds : float
+            The duration in seconds.
+        tags : dict
+            Tags of the metric. Default is None.
+
+        Returns
+        -------
+        None
+
+        """
+
+
+    def observe(self, name, value, tags=None):
+        """Records a value of a distribution, such as a size or count.
+
+        Parameters
+        ----------
+        name : str
+            The name of the metric.
+        value : float
+            The value.
+        tags : dict
+            Tags of the metric. Default is None.
+
+        Returns
+        -------
+        None
+
+        """
+
+
+    @contextlib.contextmanager
+    def timer(self, name, tags=None):
+        """Context manager that records the duration of its body.
+
+        Parameters
+        ----------
+        name : str
+            The name of the metric.
+        tags : dict
+            Tags of the metric. Default is None.
+
+        Returns
+        -------
+        None
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timing(name, time.perf_counter() - start, tags)
+
+
+    def record_response(self, response, *args, **kwargs):  # pylint: disable=unused-argument
+        """Records the size of a response from the Spotify API. Used as a response hook of a requests session.
+
+        Parameters
+        ----------
+        response : requests.Response
+            The response.
+
+        Returns
+        -------
+        None
+
+        """
+        endpoint = _endpoint.get() or get_endpoint_type(response.url)
+        self.observe('api.bytes', len(response.content), {'endpoint': endpoint})
+
+
+NULL_METRICS = Metrics()
+
+
+class InMemoryMetrics(Metrics):
+    """Records metrics in memory, so they can be inspected or exported by your application.
+
+    Attributes
+    ----------
+    counters : dict
+        The total of each counter, keyed by name and tags.
+    distributions : dict
+        The count, sum, min and max of each duration and distribution, keyed by name and tags.
+
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.distributions = {}
+        self._lock = threading.Lock()
+
+
+    def increment(self, name, value=1, tags=None):
+        key = (name, tuple(sorted((tags or {}).items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+    def timing(self, name, seconds, tags=None):
+        self.observe(name, seconds, tags)
+
+
+    def observe(self, name, value, tags=None):
+        key = (name, tuple(sorted((tags or {}).items())))
+        with self._lock:
+            summary = self.distributions.get(key)
+            if summary is None:
+                self.distributions[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                summary['count'] += 1
+                summary['sum'] += value
+                summary['min'] = min(summary['min'], value)
+                summary['max'] = max(summary['max'], value)
+
+
+    def reset(self):
+        """Removes every recorded metric.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            self.counters.clear()
+            self.distributions.clear()
+
+
+class StatsdMetrics(Metrics):
+    """Sends metrics to a StatsD server over UDP. Durations are sent in milliseconds as timers, and distributions are
+    sent as histograms. Metrics are sent without waiting for a reply, and are dropped if they can't be sent.
+
+    Parameters
+    ----------
+    host : str
+        The host of the StatsD server.
+    port : int
+        The port of the StatsD server.
+    prefix : str
+        The prefix added to the name of every metric.
+    tags : bool
+        Whether to send tags in the DogStatsD format. If False, tags are not sent.
+
+    Attributes
+    ----------
+    address : tuple
+        The host and port of the StatsD server.
+    prefix : str
+        The prefix added to the name of every metric.
+    tags : bool
+        Whether tags are sent in the DogStatsD format.
+
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='spomato', tags=True):
+        if not isinstance(host, str):
+            raise TypeError('Argument host must be of type string')
+        if not isinstance(port, int):
+            raise TypeError('Argument port must be of type int')
+
+        self.address = (host, port)
+        self.prefix = prefix
+        self.tags = tags
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+
+    def increment(self, name, value=1, tags=None):
+        self._send(name, value, 'c', tags)
+
+
+    def timing(self, name, seconds, tags=None):
+        self._send(name, round(seconds * 1000, 3), 'ms', tags)
+
+
+    def observe(self, name, value, tags=None):
+        self._send(name, value, 'h', tags)
+
+
+    def _send(self, name, value, metric_type, tags):
+        """Internal function to send a metric in the StatsD line format."""
+        line = f'{self.prefix}.{name}:{value}|{metric_type}' if self.prefix else f'{name}:{value}|{metric_type}'
+        if self.tags and tags:
+            line += '|#' + ','.join(f'{key}:{tag}' for key, tag in tags.items())
+        try:
+            self._socket.sendto(line.encode(), self.address)
+        except OSError:
+            # metrics must never break the requests being measured
+            pass
+
+
+    def close(self):
+        """Closes the socket used to send metrics.
+
+        Returns
+        -------
+        None
+
+        """
+        self._socket.close()
+
+
+def timed(name):
+    """Decorator that records the duration of a method of a Spomato object with its metrics. Coroutines are timed until
+    they finish.
+
+    Parameters
+    ----------
+    name : str
+        The name of the metric.
+
+    Returns
+    -------
+    callable
+        The decorator.
+
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.metrics.timer(name):
+                    return await func(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InstrumentedSpotify():  # pylint: disable=too-few-public-methods
+    """Wraps a spotipy session so every call to the Spotify API is timed, and the size of every response is recorded.
+
+    Parameters
+    ----------
+    spotify : spotipy.client.Spotify
+        The spotipy session to wrap.
+    metrics : Metrics
+        The metrics to record to.
+
+    """
+
+    def __init__(self, spotify, metrics):
+        self._spotify = spotify
+        self._metrics = metrics
+        # the requests session of the spotipy session, which may be shared with other Spomato objects
+        session = getattr(spotify, '_session', None)
+        if session is not None and metrics.record_response not in session.hooks['response']:
+            session.hooks['response'].append(metrics.record_response)
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self._spotify, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def wrapper(*args, **kwargs):
+            token = _endpoint.set(name)
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            except Exception:
+                self._metrics.increment('api.error', tags={'endpoint': name})
+                raise
+            finally:
+                self._metrics.timing('api.request', time.perf_counter() - start, {'endpoint': name})
+                _endpoint.reset(token)
+        return wrapper
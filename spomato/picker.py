@@ -0,0 +1,831 @@
+"""Author: Matthew Russell
+
+This contains the methods Spomato and AsyncSpomato use to pick the tracks of playlists from a dataset of songs.
+
+"""
+
+from collections import Counter
+import numpy as np
+
+
+class PickMixin():
+    """Methods to pick the tracks of playlists from the datasets of a SpomatoBase object. They don't access the Spotify
+    API, so they are the same in Spomato and AsyncSpomato.
+    """
+
+    def pick_tracks(self,
+                    data_key,
+                    time=25,
+                    extra=5,
+                    time_limit=None,
+                    *,
+                    method='random',
+                    tolerance=0,
+                    budget=100000,
+                    seed=None,
+                    rng=None,
+                    as_frame=True,
+                    avoid_recent=True):
+        """Using a specified dataset, this generates a subset of the dataframe of songs that fit the time constraints.
+
+        The same dataset, arguments and seed always pick the same tracks. Picks made with a seed are cached, so picking
+        them again doesn't repeat the work.
+
+        If the Spomato object has a history, songs in it are left out of the pick, unless too few other songs are left
+        to fill the playlist, and the picked songs are added to it. Seeded picks are then only the same for the same
+        history.
+
+        Parameters
+        ----------
+        data_key : str
+            Name of the dataset to use stored in the data object in Spomato
+        time : int
+            The length in minutes to make the playlist
+        extra : type
+            The amount of buffer time to add on to the end of the playlist.
+        time_limit : type
+            The maximum song length in minutes to include in the playlist.
+        method : str
+            How to pick the tracks. 'random' adds random tracks until the time is reached. 'fill' picks random tracks
+            and then solves for the remaining tracks to land as close to the time as possible. Default is 'random'.
+        tolerance : int
+            The overshoot past time in minutes that is accepted when method is 'fill'. Default is 0.
+        budget : int
+            The approximate amount of work the 'fill' method is allowed to do. Default is 100000.
+        seed : int
+            Seed for the random number generator, used to make the playlist reproducible. Default is None.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks, instead of a seed. Default is None, which uses a new
+            generator.
+        as_frame : bool
+            Whether to return the picked songs as a pandas DataFrame. If False, they are returned as a Dataset, which
+            doesn't need pandas. Default is True.
+        avoid_recent : bool
+            Whether to leave out the songs in the history, and add the picked songs to it. Default is True.
+
+        Returns
+        -------
+        pd.DataFrame or spomato.dataset.Dataset
+            A dataframe of song ids generated from the sources, or a dataset of them if as_frame is False.
+
+        """
+        self._check_pick_args(data_key, time, extra, time_limit, method=method, tolerance=tolerance, budget=budget,
+                              seed=seed, rng=rng)
+        if not isinstance(as_frame, bool):
+            raise TypeError('Argument as_frame must be of type bool')
+        if not isinstance(avoid_recent, bool):
+            raise TypeError('Argument avoid_recent must be of type bool')
+        history = self.history if avoid_recent else None
+        dataset = self._get_dataset(data_key)
+        positions = self._pick_dataset(dataset,
+                                       history,
+                                       time=time,
+                                       extra=extra,
+                                       time_limit=time_limit,
+                                       method=method,
+                                       tolerance=tolerance,
+                                       budget=budget,
+                                       seed=seed,
+                                       rng=rng)
+        return self._take_picked_tracks(dataset, positions, history, as_frame)
+
+
+    def _pick_dataset(self, dataset, history, *, time, extra, time_limit, method, tolerance, budget, seed, rng):
+        """Internal function to pick the tracks of a playlist from a dataset. A pick made with a seed and without a
+        history is cached, and the cached pick is returned if it was already made. See pick_tracks for the arguments.
+
+        Parameters
+        ----------
+        dataset : Dataset
+            The dataset to pick from.
+        history : spomato.history.PlayHistory
+            The history of the songs to leave out of the pick, or None to pick from every song.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions in the dataset of the picked tracks, in the order they were picked.
+
+        """
+        # a seeded pick from the same dataset always picks the same tracks, so it is only picked once. A pick that
+        # avoids recent songs adds its songs to the history, so the next pick differs and it isn't cached
+        cache_key = None
+        if seed is not None and history is None:
+            cache_key = ('pick', dataset.version, time, extra, time_limit, method, tolerance, budget, seed)
+            positions = self.pick_cache.get(cache_key)
+            if positions is not None:
+                self.metrics.increment('pick.cached')
+                return positions
+
+        candidates, time, extra = self._get_pick_candidates(dataset=dataset,
+                                                            time=time,
+                                                            extra=extra,
+                                                            time_limit=time_limit)
+        if history is not None:
+            candidates = self._exclude_recent(dataset, candidates, time, history, method)
+
+        # pick the tracks and get their positions in the dataset, in the order they were picked
+        positions = candidates[self._pick_playlists(dataset.duration_ms[candidates] / 1000,
+                                                    1,
+                                                    time=time,
+                                                    extra=extra,
+                                                    rng=np.random.default_rng(seed) if rng is None else rng,
+                                                    method=method,
+                                                    tolerance=tolerance,
+                                                    budget=budget,
+                                                    timer='pick.tracks')[0]]
+        if cache_key is not None:
+            self.pick_cache.set(cache_key, positions)
+        return positions
+
+
+    @staticmethod
+    def _take_picked_tracks(dataset, positions, history, as_frame):
+        """Internal function to take the picked songs from a dataset and add them to the history.
+
+        Parameters
+        ----------
+        dataset : Dataset
+            The dataset the songs were picked from.
+        positions : numpy.ndarray
+            The positions of the picked songs in the dataset.
+        history : spomato.history.PlayHistory
+            The history to add the songs to, or None to not add them.
+        as_frame : bool
+            Whether to return the songs as a pandas DataFrame rather than a Dataset.
+
+        Returns
+        -------
+        pd.DataFrame or spomato.dataset.Dataset
+            The picked songs.
+
+        """
+        picked_tracks = dataset.take(positions)
+        if history is not None:
+            history.add_hashes(dataset.hashes[positions])
+        return picked_tracks.to_frame() if as_frame else picked_tracks
+
+
+    def _exclude_recent(self, dataset, candidates, time, history, method):
+        """Internal function to leave the songs in the history out of the candidates of a pick, if enough songs are
+        left to fill the playlist.
+
+        Parameters
+        ----------
+        dataset : Dataset
+            The dataset to pick from.
+        candidates : numpy.ndarray
+            The positions of the songs that can be picked, sorted by length.
+        time : float
+            The length in seconds to make the playlist.
+        history : spomato.history.PlayHistory
+            The history of recently picked songs.
+        method : str
+            The pick method, used to tag the metrics.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions of the songs that can be picked, still sorted by length.
+
+        """
+        # the hashes of the dataset are computed once, so each pick only looks its candidates up in the history
+        recent = history.contains(dataset.hashes[candidates])
+        excluded = int(np.count_nonzero(recent))
+        if excluded == 0:
+            return candidates
+        # repeating songs is better than a playlist that is too short. The candidates are the shortest songs of the
+        # dataset, so their total time is in the duration index
+        candidate_ms = dataset.duration_index.prefix_ms[len(candidates)]
+        if candidate_ms - dataset.duration_ms[candidates[recent]].sum(dtype=np.int64) < time * 1000:
+            return candidates
+        fresh = candidates[~recent]
+        self.metrics.observe('pick.recent_excluded', excluded, {'method': method})
+        return fresh
+
+
+    def pick_tracks_batch(self,
+                          data_key,
+                          n,
+                          time=25,
+                          extra=5,
+                          time_limit=None,
+                          *,
+                          seed=None,
+                          method='random',
+                          tolerance=0,
+                          budget=100000,
+                          rng=None):
+        """Generates many independent playlists from a specified dataset in one call.
+
+        The dataset is filtered by the time limit once and every playlist is picked from the same duration array, so
+        this is much faster than calling pick_tracks repeatedly.
+
+        Parameters
+        ----------
+        data_key : str
+            Name of the dataset to use stored in the data object in Spomato
+        n : int
+            The number of playlists to generate.
+        time : int
+            The length in minutes to make each playlist
+        extra : int
+            The amount of buffer time to add on to the end of each playlist.
+        time_limit : int
+            The maximum song length in minutes to include in the playlists.
+        seed : int
+            Seed for the random number generator, used to make the playlists reproducible. Default is None.
+        method : str
+            How to pick the tracks, either 'random' or 'fill'. See pick_tracks. Default is 'random'.
+        tolerance : int
+            The overshoot past time in minutes that is accepted when method is 'fill'. Default is 0.
+        budget : int
+            The approximate amount of work the 'fill' method is allowed to do per playlist. Default is 100000.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks, instead of a seed. Default is None.
+
+        Returns
+        -------
+        pd.DataFrame
+            A long form dataframe of song ids and times with a playlist column numbering the playlists from 0 to n - 1.
+
+        """
+        if not isinstance(n, int):
+            raise TypeError('Argument n must be of type int')
+        self._check_pick_args(data_key, time, extra, time_limit, method=method, tolerance=tolerance, budget=budget,
+                              seed=seed, rng=rng)
+        if n < 0:
+            raise ValueError('Argument n must not be negative.')
+        dataset = self._get_dataset(data_key)
+        candidates, time, extra = self._get_pick_candidates(dataset=dataset,
+                                                            time=time,
+                                                            extra=extra,
+                                                            time_limit=time_limit)
+
+        # pick every playlist from the same filtered duration array
+        picks = self._pick_playlists(dataset.duration_ms[candidates] / 1000,
+                                     n,
+                                     time=time,
+                                     extra=extra,
+                                     rng=np.random.default_rng(seed) if rng is None else rng,
+                                     method=method,
+                                     tolerance=tolerance,
+                                     budget=budget,
+                                     timer='pick.batch')
+
+        # take all of the selected songs at once and label them with their playlist number
+        batch_df = dataset.take(candidates[np.concatenate([np.array([], dtype=np.int64)] + picks)]).to_frame()
+        batch_df.insert(0, 'playlist', np.repeat(np.arange(n), [len(pick) for pick in picks]))
+
+        return batch_df
+
+
+    @staticmethod
+    def _check_pick_args(data_key, time, extra, time_limit, *, method='random', tolerance=0, budget=100000, seed=None,
+                         rng=None):
+        """Internal function to check the arguments of a pick. See pick_tracks.
+
+        Parameters
+        ----------
+        data_key : str
+            Name of the dataset to use stored in the data object in Spomato
+        time : int
+            The length in minutes to make the playlist
+        extra : int
+            The amount of buffer time to add on to the end of the playlist.
+        time_limit : int
+            The maximum song length in minutes to include in the playlist.
+        method : str
+            Either 'random' or 'fill'.
+        tolerance : int
+            The overshoot past time in minutes that is accepted when method is 'fill'.
+        budget : int
+            The approximate amount of work the 'fill' method is allowed to do.
+        seed : int
+            Seed for the random number generator, or None.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks, or None.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(data_key, str):
+            raise TypeError('Argument data_key must be of type string')
+        if not isinstance(time, (int, float)):
+            raise TypeError('Argument time must be of type int or float')
+        if not isinstance(extra, (int, float)):
+            raise TypeError('Argument extra must be of type int or float')
+        if time_limit is not None and not isinstance(time_limit, (int, float)):
+            raise TypeError('Argument time_limit must be of type int or float')
+        if method not in ['random', 'fill']:
+            raise ValueError(f'{method} is not a valid pick method.')
+        if not isinstance(tolerance, (int, float)):
+            raise TypeError('Argument tolerance must be of type int or float')
+        if not isinstance(budget, int):
+            raise TypeError('Argument budget must be of type int')
+        if seed is not None and not isinstance(seed, int):
+            raise TypeError('Argument seed must be of type int')
+        if rng is not None and not isinstance(rng, np.random.Generator):
+            raise TypeError('Argument rng must be of type numpy.random.Generator')
+        if seed is not None and rng is not None:
+            raise ValueError('Only one of the arguments seed and rng can be given.')
+
+
+    @staticmethod
+    def _get_pick_candidates(dataset, time, extra, time_limit):
+        """Gets the positions of the songs of a dataset that are short enough to be picked for a playlist.
+
+        Parameters
+        ----------
+        dataset : Dataset
+            The dataset to pick from.
+        time : int
+            The length in minutes to make the playlist
+        extra : int
+            The amount of buffer time to add on to the end of the playlist.
+        time_limit : int
+            The maximum song length in minutes to include in the playlist. If None, it defaults to one third of time.
+
+        Returns
+        -------
+        tuple
+            An array of the positions of songs within the time limit sorted by length, and the time and extra arguments
+            converted to seconds.
+
+        """
+        # the time in our dataset is specified in seconds, we need to convert the times
+        time *= 60
+        extra *= 60
+
+        # if time limit is not specified, default it to one third of the parameter time
+        if time_limit is None:
+            time_limit = time/3.0
+        else:
+            time_limit *= 60
+
+        # find the records that are no longer than the time limit, in order of length
+        candidates = dataset.duration_index.positions_at_most(time_limit)
+
+        return candidates, time, extra
+
+
+    def _pick_playlists(self, durations, n, *, time, extra, rng, method, tolerance, budget, timer):
+        """Internal function to pick the tracks of playlists from a sorted array of durations, recording the time
+        taken and the statistics of the pick loop in the metrics.
+
+        Parameters
+        ----------
+        durations : numpy.ndarray
+            The song times in seconds to pick from, sorted in ascending order.
+        n : int
+            The number of playlists to pick.
+        time : float
+            The length in seconds to make each playlist.
+        extra : float
+            The amount of buffer time in seconds allowed past the playlist length.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks.
+        method : str
+            Either 'random' or 'fill'.
+        tolerance : float
+            The overshoot past time in minutes that is accepted by the 'fill' method.
+        budget : int
+            The approximate amount of work the 'fill' method is allowed to do per playlist.
+        timer : str
+            The name of the metric of the time taken.
+
+        Returns
+        -------
+        list
+            The positions in durations of the picked tracks of each playlist.
+
+        """
+        stats = Counter()
+        with self.metrics.timer(timer, {'method': method}):
+            picks = [self._pick_playlist(durations=durations,
+                                         time=time,
+                                         extra=extra,
+                                         rng=rng,
+                                         method=method,
+                                         tolerance=tolerance * 60,
+                                         budget=budget,
+                                         stats=stats,
+                                         is_sorted=True)
+                     for _ in range(n)]
+        for name, value in stats.items():
+            self.metrics.observe(f'pick.{name}', value, {'method': method})
+        return picks
+
+
+    @staticmethod
+    def _pick_playlist(durations, time, extra, rng, *, method='random', tolerance=0, budget=100000, stats=None,
+                       is_sorted=False):
+        """Picks the tracks for one playlist from an array of durations with the specified pick method.
+
+        Parameters
+        ----------
+        durations : numpy.ndarray
+            The song times in seconds to pick from.
+        time : float
+            The length in seconds to make the playlist.
+        extra : float
+            The amount of buffer time in seconds allowed past the playlist length.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks.
+        method : str
+            Either 'random' or 'fill'.
+        tolerance : float
+            The overshoot past time in seconds that is accepted by the 'fill' method.
+        budget : int
+            The maximum number of subset sum cells the 'fill' method is allowed to compute.
+        stats : collections.Counter
+            If not None, statistics of the pick loop are added to it.
+        is_sorted : bool
+            Whether the durations are sorted in ascending order, which lets the 'random' method only draw from the
+            tracks that fit in the remaining time.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions in durations of the picked tracks.
+
+        """
+        if method == 'fill':
+            return PickMixin._fill_positions(durations, time, extra, rng,
+                                             tolerance=tolerance,
+                                             budget=budget,
+                                             stats=stats)
+        return PickMixin._pick_positions(durations, time, extra, rng, stats=stats, is_sorted=is_sorted)
+
+
+    @staticmethod
+    def _fill_positions(durations, time, extra, rng, *, tolerance=0, budget=100000, stats=None):
+        """Picks tracks from an array of durations so that the total time lands as close past the specified time as
+        possible, without exceeding the time plus the extra buffer.
+
+        Random tracks are picked until the remaining time is small enough to fit in the budget, then the rest is picked
+        with a subset sum over whole second durations. Tracks are bucketed by duration and each bucket is split into
+        groups of 1, 2, 4, ... tracks, so the work depends on the number of distinct durations rather than the number
+        of tracks. The groups are shuffled before solving so ties are broken randomly. If no total the budget can solve
+        gets past the time, the rest of the playlist is picked at random.
+
+        Parameters
+        ----------
+        durations : numpy.ndarray
+            The song times in seconds to pick from.
+        time : float
+            The length in seconds to make the playlist.
+        extra : float
+            The amount of buffer time in seconds allowed past the playlist length.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks.
+        tolerance : float
+            The overshoot past time in seconds that is accepted. Any total in the tolerance is picked at random.
+        budget : int
+            The maximum number of subset sum cells (remaining seconds times groups of tracks) to compute.
+        stats : collections.Counter
+            If not None, the number of randomly picked tracks and subset sum cells computed are added to it.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions in durations of the picked tracks.
+
+        """
+        # round the durations up to whole seconds so the solved total never goes over time plus extra
+        durations = np.asarray(durations, dtype=float)
+        weights = np.maximum(np.ceil(durations), 1).astype(np.int64)
+
+        # pick random tracks until the remaining time before the target is small enough to solve within the budget
+        capacity = PickMixin._get_fill_capacity(weights, int(time + extra), budget)
+        picked, unpicked, time_used = PickMixin._pick_fill_prefix(durations, rng.permutation(len(weights)), time,
+                                                                  reserve=max(capacity - int(extra), capacity // 2))
+        if stats is not None:
+            stats.update(random_picks=len(picked))
+
+        # solve the rest within the budget, then pick at random from the tracks left if it doesn't get past the time
+        capacity = min(int(time + extra - time_used), capacity)
+        if capacity > 0:
+            remaining, groups = PickMixin._get_fill_groups(weights, unpicked, capacity, rng)
+            if stats is not None:
+                stats.update(solver_cells=capacity * len(groups))
+            picked.extend(PickMixin._solve_fill(durations, remaining, groups, rng,
+                                                time=time - time_used,
+                                                capacity=capacity,
+                                                tolerance=tolerance))
+        time_used = durations[picked].sum()
+        if time_used <= time:
+            unpicked = np.setdiff1d(unpicked, picked, assume_unique=True)
+            picked.extend(unpicked[PickMixin._pick_positions(durations[unpicked], time - time_used, extra, rng,
+                                                             stats=stats)])
+
+        return np.array(picked, dtype=np.int64)
+
+
+    @staticmethod
+    def _get_fill_capacity(weights, limit, budget):
+        """Finds the largest remaining time the 'fill' method can solve within a budget.
+
+        Parameters
+        ----------
+        weights : numpy.ndarray
+            The whole second durations of the tracks.
+        limit : int
+            The largest remaining time that could be needed, in seconds.
+        budget : int
+            The maximum number of subset sum cells to compute.
+
+        Returns
+        -------
+        int
+            The largest remaining time in seconds whose subset sum fits in the budget.
+
+        """
+        # a bucket of n tracks is split into groups of 1, 2, 4, ... tracks, which is one group per bit of n + 1 plus one
+        # for the tracks left over
+        distinct_weights = np.flatnonzero(np.bincount(weights, minlength=1))
+        bucket_counts = np.bincount(weights)[distinct_weights]
+
+        def cells(capacity):
+            fits = distinct_weights <= capacity
+            counts = np.minimum(bucket_counts[fits], capacity // distinct_weights[fits]) + 1
+            bits = np.frexp(counts)[1] - 1
+            return capacity * int((bits + (counts > 2 ** bits)).sum())
+
+        low, high = 0, max(limit, 0)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if cells(mid) <= budget:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+
+    @staticmethod
+    def _pick_fill_prefix(durations, order, time, reserve):
+        """Picks the tracks of a random order until the remaining time before the target of a 'fill' pick is no more
+        than the time reserved for the solver plus the shortest track.
+
+        Parameters
+        ----------
+        durations : numpy.ndarray
+            The song times in seconds.
+        order : numpy.ndarray
+            The positions of the tracks in a random order.
+        time : float
+            The length in seconds to make the playlist.
+        reserve : int
+            The time in seconds to leave before the target for the solver.
+
+        Returns
+        -------
+        tuple
+            A list of the positions of the picked tracks, an array of the positions of the rest in their random order,
+            and the total time in seconds of the picked tracks.
+
+        """
+        cumulative_time = np.cumsum(durations[order])
+        count = int(np.searchsorted(cumulative_time, time - reserve, side='right'))
+        picked, unpicked = list(order[:count]), order[count:]
+        time_used = cumulative_time[count - 1] if count > 0 else 0
+        # fill the gap left before the reserve with the next tracks of the order that fit, so the solver is left with
+        # less than the reserve plus the shortest track
+        while True:
+            fits = np.flatnonzero(durations[unpicked] <= time - reserve - time_used)
+            if len(fits) == 0:
+                return picked, unpicked, time_used
+            picked.append(unpicked[fits[0]])
+            time_used += durations[unpicked[fits[0]]]
+            unpicked = np.delete(unpicked, fits[0])
+
+
+    @staticmethod
+    def _get_fill_groups(weights, remaining, capacity, rng):
+        """Buckets the unpicked tracks that fit in the capacity by duration, and splits each bucket into groups of 1, 2,
+        4, ... tracks, no more tracks than can fit in the capacity.
+
+        Parameters
+        ----------
+        weights : numpy.ndarray
+            The whole second durations of the tracks.
+        remaining : numpy.ndarray
+            The positions of the unpicked tracks, in a random order.
+        capacity : int
+            The largest total in seconds to solve for.
+        rng : numpy.random.Generator
+            The random number generator used to shuffle the groups.
+
+        Returns
+        -------
+        tuple
+            The positions of the tracks that fit sorted by duration, keeping the random order within each duration, and
+            a list of the groups as (total weight, start in the positions, number of tracks) in a random order.
+
+        """
+        remaining = remaining[weights[remaining] <= capacity]
+        sort_keys = weights[remaining]
+        if capacity < 2 ** 16:
+            # small integer keys let numpy use a radix sort
+            sort_keys = sort_keys.astype(np.uint16)
+        remaining = remaining[np.argsort(sort_keys, kind='stable')]
+        bucket_weights, bucket_starts, bucket_counts = np.unique(weights[remaining], return_index=True,
+                                                                 return_counts=True)
+
+        groups = []
+        for weight, start, bucket_count in zip(bucket_weights, bucket_starts, bucket_counts):
+            bucket_count = min(bucket_count, capacity // weight)
+            size = 1
+            while bucket_count > 0:
+                size = min(size, bucket_count)
+                groups.append((weight * size, start, size))
+                start += size
+                bucket_count -= size
+                size *= 2
+        return remaining, [groups[i] for i in rng.permutation(len(groups))]
+
+
+    @staticmethod
+    def _solve_fill(durations, remaining, groups, rng, *, time, capacity, tolerance):
+        """Picks the groups of tracks whose total lands closest past a time with a subset sum over whole seconds.
+
+        Parameters
+        ----------
+        durations : numpy.ndarray
+            The song times in seconds.
+        remaining : numpy.ndarray
+            The positions of the tracks the groups are made of. See _get_fill_groups.
+        groups : list
+            The groups of tracks as (total weight, start in remaining, number of tracks).
+        rng : numpy.random.Generator
+            The random number generator used to pick between totals in the tolerance.
+        time : float
+            The time in seconds to get past.
+        capacity : int
+            The largest total in seconds to solve for.
+        tolerance : float
+            The overshoot past time in seconds that is accepted.
+
+        Returns
+        -------
+        list
+            The positions of the picked tracks, in a random order. If no total gets past the time, the tracks of the
+            largest total.
+
+        """
+        reachable, parent = PickMixin._get_fill_parents(groups, capacity)
+
+        # the whole second totals can be up to a second per track over the real time, so check the real time of the
+        # totals past the target. take a random total in the tolerance that is past the time, else the smallest total
+        # past the time, else the largest total.
+        target = int(np.ceil(time))
+        totals = np.flatnonzero(reachable)
+        options = []
+        for total in totals[totals >= target]:
+            if options and total > target + tolerance:
+                break
+            tracks = PickMixin._recover_fill(remaining, groups, parent, total)
+            if durations[tracks].sum() > time:
+                options.append(tracks)
+        if options:
+            filled = options[rng.integers(len(options))]
+        else:
+            filled = PickMixin._recover_fill(remaining, groups, parent, totals[-1])
+        return list(rng.permutation(np.array(filled, dtype=np.int64)))
+
+
+    @staticmethod
+    def _get_fill_parents(groups, capacity):
+        """Solves the subset sum of groups of tracks over whole second totals, recording the group that first reaches
+        each total.
+
+        Parameters
+        ----------
+        groups : list
+            The groups of tracks as (total weight, start, number of tracks).
+        capacity : int
+            The largest total in seconds to solve for.
+
+        Returns
+        -------
+        tuple
+            A boolean array of whether each total up to the capacity can be reached, and an array of the group that
+            first reaches each total, or -1.
+
+        """
+        reachable = np.zeros(capacity + 1, dtype=bool)
+        reachable[0] = True
+        parent = np.full(capacity + 1, -1, dtype=np.int64)
+        for i, (group_weight, _, _) in enumerate(groups):
+            new = reachable[:capacity + 1 - group_weight] & ~reachable[group_weight:]
+            parent[group_weight:][new] = i
+            reachable[group_weight:] |= new
+        return reachable, parent
+
+
+    @staticmethod
+    def _recover_fill(remaining, groups, parent, total):
+        """Walks back through the recorded groups of a subset sum to recover the tracks that make up a total.
+
+        Parameters
+        ----------
+        remaining : numpy.ndarray
+            The positions of the tracks the groups are made of.
+        groups : list
+            The groups of tracks as (total weight, start in remaining, number of tracks).
+        parent : numpy.ndarray
+            The group that first reaches each total. See _get_fill_parents.
+        total : int
+            The total in seconds to recover.
+
+        Returns
+        -------
+        list
+            The positions of the tracks that make up the total.
+
+        """
+        tracks = []
+        while total > 0:
+            group_weight, start, size = groups[parent[total]]
+            tracks.extend(remaining[start:start + size])
+            total -= group_weight
+        return tracks
+
+
+    @staticmethod
+    def _pick_positions(durations, time, extra, rng, *,  # pylint: disable=too-many-locals
+                        max_rejections=8, stats=None, is_sorted=False):
+        """Randomly picks tracks from an array of durations until the total time is greater than the specified time,
+        without exceeding the time plus the extra buffer.
+
+        Each pick is uniform over the tracks that fit in the remaining time and have not been picked yet. Picks are made
+        by drawing random positions and rejecting those that don't fit, and the candidate array is only compacted when
+        too many draws in a row are rejected, so a playlist is picked in O(n) worst case rather than O(n*k). When the
+        durations are sorted, the tracks that fit in the remaining time are found with a binary search before each pick
+        and only those are drawn from, so draws are only rejected for tracks that were already picked.
+
+        Parameters
+        ----------
+        durations : numpy.ndarray
+            The song times in seconds to pick from.
+        time : float
+            The length in seconds to make the playlist.
+        extra : float
+            The amount of buffer time in seconds allowed past the playlist length.
+        rng : numpy.random.Generator
+            The random number generator used to pick the tracks.
+        max_rejections : int
+            The number of rejected draws in a row before the candidates are compacted.
+        stats : collections.Counter
+            If not None, the number of random draws and compactions made are added to it.
+        is_sorted : bool
+            Whether the durations are sorted in ascending order.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions in durations of the picked tracks, in the order they were picked.
+
+        """
+        candidates = np.arange(len(durations))
+        candidate_durations = np.asarray(durations, dtype=float)
+        picked = []
+        picked_set = set()
+        time_used = 0
+        draws = 0
+        compactions = 0
+        fits = len(candidates)
+        # iterate adding songs until the time is reached or there are no songs left that fit in the remaining time
+        while time_used <= time and len(candidates) > 0:
+            remaining = time + extra - time_used
+            if not is_sorted:
+                fits = len(candidates)
+            elif fits > 0 and candidate_durations[fits - 1] > remaining:
+                # the remaining time only shrinks, so the candidates before the first that is too long are searched
+                # for again only when the longest of them no longer fits
+                fits = np.searchsorted(candidate_durations[:fits], remaining, side='right')
+            if fits == 0:
+                break
+            for attempt in range(max_rejections):
+                index = rng.integers(fits)
+                position = candidates[index]
+                if candidate_durations[index] <= remaining and position not in picked_set:
+                    picked.append(position)
+                    picked_set.add(position)
+                    time_used += candidate_durations[index]
+                    draws += attempt + 1
+                    break
+            else:
+                # too many rejected draws, filter down to unpicked tracks that fit in the remaining time
+                keep = (candidate_durations <= remaining) & ~np.isin(candidates, picked)
+                candidates = candidates[keep]
+                candidate_durations = candidate_durations[keep]
+                fits = len(candidates)
+                draws += max_rejections
+                compactions += 1
+
+        if stats is not None:
+            stats.update(draws=draws, compactions=compactions)
+        return np.array(picked, dtype=np.int64)
@@ -0,0 +1,111 @@
+"""Author: Matthew Russell
+
+This contains the index of a user's playlists kept by Spomato, so playlists can be looked up by name or id without
+listing them from the Spotify API each time.
+
+"""
+
+# pandas are imported where they are used, so importing spomato stays quick
+# pylint: disable=import-outside-toplevel
+
+
+class PlaylistIndex():
+    """An index of a user's playlists by name and by id.
+
+    The index is built from the playlist listing of the Spotify API, and is kept up to date by Spomato as it creates and
+    changes playlists. When several playlists have the same name, the name refers to the first one in the listing.
+
+    Parameters
+    ----------
+    playlists : list
+        A list of playlist dictionaries from the Spotify API.
+
+    Attributes
+    ----------
+    playlists : dict
+        The name, snapshot id and owner id of each playlist, keyed by playlist id in the order of the listing.
+
+    """
+
+    def __init__(self, playlists=()):
+        self.playlists = {}
+        self._ids_by_name = {}
+        for playlist in playlists:
+            self.add(playlist)
+
+
+    def __len__(self):
+        return len(self.playlists)
+
+
+    def __contains__(self, playlist_id):
+        return playlist_id in self.playlists
+
+
+    def add(self, playlist):
+        """Adds a playlist to the index.
+
+        Parameters
+        ----------
+        playlist : dict
+            A playlist dictionary from the Spotify API.
+
+        Returns
+        -------
+        None
+
+        """
+        self.playlists[playlist['id']] = {'name': playlist['name'],
+                                          'snapshot_id': playlist.get('snapshot_id'),
+                                          'owner_id': (playlist.get('owner') or {}).get('id')}
+        self._ids_by_name.setdefault(playlist['name'], playlist['id'])
+
+
+    def get_id(self, playlist_name):
+        """Gets the id of a playlist from its name.
+
+        Parameters
+        ----------
+        playlist_name : str
+            The name of the playlist.
+
+        Returns
+        -------
+        str
+            The id of the playlist, or None if there is no playlist with the name.
+
+        """
+        return self._ids_by_name.get(playlist_name)
+
+
+    def set_snapshot_id(self, playlist_id, snapshot_id):
+        """Sets the snapshot id of a playlist after it has been changed.
+
+        Parameters
+        ----------
+        playlist_id : str
+            The id of the playlist.
+        snapshot_id : str
+            The new snapshot id of the playlist, or None if it isn't known.
+
+        Returns
+        -------
+        None
+
+        """
+        if playlist_id in self.playlists:
+            self.playlists[playlist_id]['snapshot_id'] = snapshot_id
+
+
+    def to_frame(self):
+        """Creates a pandas DataFrame of the playlist names and ids.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe of playlist names and playlist ids.
+
+        """
+        import pandas as pd
+        return pd.DataFrame({'playlist_name': [playlist['name'] for playlist in self.playlists.values()],
+                             'playlist_id': list(self.playlists.keys())})
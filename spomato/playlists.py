@@ -0,0 +1,276 @@
+"""Author: Matthew Russell
+
+This contains the methods Spomato uses to list the user's playlists and create or change them through the Spotify API.
+
+"""
+
+from collections import defaultdict
+from spomato.base import PLAYLIST_BATCH_SIZE
+from spomato.metadata import revalidate_responses
+from spomato.metrics import timed
+from spomato.playlist_index import PlaylistIndex
+from spomato.scheduler import prioritized
+
+
+class PlaylistMixin():
+    """Methods of Spomato to list the user's playlists and create or change them through its spotipy session. Only the
+    songs of a playlist that changed are sent to the Spotify API.
+    """
+
+    def get_playlists(self):
+        """Access the spotify API to get the playlists for a user and returns a dataframe of names and ids. The index of
+        the user's playlists is rebuilt from the result.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A dataframe consisting of the current user's playlist names and playlist ids.
+
+        """
+        # get every page of the user's playlists and parse the playlist name and id
+        return self._parse_playlists(self._list_playlists())
+
+
+    def _list_playlists(self):
+        """Internal function to list the user's playlists from the spotify API and rebuild the index of them.
+
+        Returns
+        -------
+        list
+            A list of playlist dictionaries from the Spotify API.
+
+        """
+        pages = self._get_pages(self.spotipy_session.current_user_playlists, limit=50)
+        playlists = [pl for page in pages for pl in page['items']]
+        self._playlist_index = PlaylistIndex(playlists)
+        return playlists
+
+
+    def _get_playlist_index(self):
+        """Internal function to get the index of the user's playlists, listing them from the spotify API only if they
+        haven't been listed since the index was last invalidated.
+
+        Returns
+        -------
+        PlaylistIndex
+            The index of the user's playlists by name and id.
+
+        """
+        if self._playlist_index is None:
+            self._list_playlists()
+        return self._playlist_index
+
+
+    @prioritized('interactive')
+    @timed('playlist.write')
+    def make_playlist(self,
+                      playlist_name,
+                      song_df,
+                      overwrite=False):
+        """Create or overwrite a spotify playlist from the dataframe of songs.
+
+        Parameters
+        ----------
+        playlist_name : str
+            The name of the playlist you want to create/overwrite
+        song_df : pandas.DataFrame
+            Dataframe of songs to be in the playlist. A Dataset or a list of song ids can be given instead.
+        overwrite : bool
+            Boolean to determine whether to overwrite the playlist if it already exists.
+
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(playlist_name, str):
+            raise TypeError('Argument playlist_name must be of type string')
+        song_ids = self._get_song_ids(song_df)
+        # look up the playlist in the index of the user's playlists
+        playlist_index = self._get_playlist_index()
+        playlist_id = playlist_index.get_id(playlist_name)
+
+        # if the playlist name already exists and is not set to be overwritten, raise an error
+        if playlist_id is not None and not overwrite:
+            raise ValueError(f'Playlist {playlist_name} already exists, set overwrite to True.')
+
+        # if the playlist already exists, change the playlist to the new track list
+        if playlist_id is not None:
+            snapshot_id = self._update_playlist_tracks(playlist_id, song_ids)
+        # if the playlist doesn't exist, create a new playlist with the track list and add it to the index
+        else:
+            playlist = self.spotipy_session.user_playlist_create(self.current_user_id,
+                                                                 playlist_name,
+                                                                 public=False)
+            playlist_id = playlist['id']
+            playlist_index.add(playlist)
+            snapshot_id = self._add_playlist_tracks(playlist_id, song_ids)
+        playlist_index.set_snapshot_id(playlist_id, snapshot_id)
+
+
+    def _add_playlist_tracks(self, playlist_id, song_ids):
+        """Internal function to add songs to the end of a playlist, in chunks of the most tracks the API accepts in one
+        request. The chunks are added in order so the songs keep their order.
+
+        Parameters
+        ----------
+        playlist_id : str
+            The id of the playlist.
+        song_ids : list
+            The ids of the songs to add.
+
+        Returns
+        -------
+        str
+            The snapshot id of the playlist after the songs were added, or None if there were no songs to add.
+
+        """
+        snapshot_id = None
+        for i in range(0, len(song_ids), PLAYLIST_BATCH_SIZE):
+            response = self.spotipy_session.user_playlist_add_tracks(self.current_user_id,
+                                                                     playlist_id,
+                                                                     tracks=song_ids[i:i + PLAYLIST_BATCH_SIZE])
+            snapshot_id = response['snapshot_id']
+        return snapshot_id
+
+
+    def _replace_playlist_tracks(self, playlist_id, song_ids):
+        """Internal function to replace every song of a playlist, in chunks of the most tracks the API accepts in one
+        request.
+
+        Parameters
+        ----------
+        playlist_id : str
+            The id of the playlist.
+        song_ids : list
+            The ids of the songs the playlist should have.
+
+        Returns
+        -------
+        str
+            The snapshot id of the playlist after the songs were replaced.
+
+        """
+        response = self.spotipy_session.user_playlist_replace_tracks(user=self.current_user_id,
+                                                                     playlist_id=playlist_id,
+                                                                     tracks=song_ids[:PLAYLIST_BATCH_SIZE])
+        return self._add_playlist_tracks(playlist_id, song_ids[PLAYLIST_BATCH_SIZE:]) or response['snapshot_id']
+
+
+    def _update_playlist_tracks(self, playlist_id, song_ids):
+        """Internal function to change the songs of an existing playlist to a new track list.
+
+        The current songs of the playlist are compared with the new track list, and only the songs that changed are
+        removed, added and moved. If that would take as many requests as replacing every song, the songs are replaced
+        instead. A track list that fits in one request replaces the songs without reading the playlist, since reading
+        it takes as many requests as the replace.
+
+        Parameters
+        ----------
+        playlist_id : str
+            The id of the playlist.
+        song_ids : list
+            The ids of the songs the playlist should have, in order.
+
+        Returns
+        -------
+        str
+            The snapshot id of the playlist after the songs were changed, or None if it isn't known.
+
+        """
+        if len(song_ids) <= PLAYLIST_BATCH_SIZE:
+            return self._replace_playlist_tracks(playlist_id, song_ids)
+
+        # get the snapshot and the ids of the current songs of the playlist
+        def fetch_page(limit, offset):
+            return self.spotipy_session.playlist_tracks(playlist_id,
+                                                        fields='items(track(id)),total',
+                                                        limit=limit,
+                                                        offset=offset)
+
+        # the edits refer to positions in the playlist, so a cached copy of it must be revalidated before it is used
+        with revalidate_responses():
+            playlist = self.spotipy_session.playlist(playlist_id, fields='snapshot_id,tracks(items(track(id)),total)')
+            pages = self._get_pages(fetch_page, limit=PLAYLIST_BATCH_SIZE, first_page=playlist['tracks'])
+        current_ids = [item['track']['id'] if item['track'] else None for page in pages for item in page['items']]
+
+        removals, additions, moves = self._get_playlist_edits(current_ids, song_ids)
+
+        if self._should_replace(song_ids, removals, additions, moves):
+            return self._replace_playlist_tracks(playlist_id, song_ids)
+        if not removals and not additions and not moves:
+            return playlist['snapshot_id']
+
+        # every removal refers to positions in the same snapshot, so the chunks can be removed in any order
+        def remove_chunk(chunk):
+            positions = defaultdict(list)
+            for song_id, position in chunk:
+                positions[song_id].append(position)
+            items = [{'uri': song_id, 'positions': song_positions} for song_id, song_positions in positions.items()]
+            response = self.spotipy_session.playlist_remove_specific_occurrences_of_items(
+                playlist_id, items, snapshot_id=playlist['snapshot_id'])
+            return response['snapshot_id']
+
+        snapshot_ids = self._map_concurrent(remove_chunk, [removals[i:i + PLAYLIST_BATCH_SIZE]
+                                                           for i in range(0, len(removals), PLAYLIST_BATCH_SIZE)])
+        snapshot_id = self._add_playlist_tracks(playlist_id, additions)
+        for range_start, insert_before in moves:
+            snapshot_id = self.spotipy_session.playlist_reorder_items(playlist_id,
+                                                                      range_start=range_start,
+                                                                      insert_before=insert_before)['snapshot_id']
+
+        # concurrent removals can finish in any order, so the snapshot after them is only known if there was one
+        if snapshot_id is None and len(snapshot_ids) == 1:
+            snapshot_id = snapshot_ids[0]
+        return snapshot_id
+
+
+    @prioritized('interactive')
+    def pick_track_and_make_playlist(self,
+                                     data_key,
+                                     playlist_name,
+                                     time=25,
+                                     extra=5,
+                                     time_limit=None,
+                                     overwrite=False,
+                                     *,
+                                     seed=None):
+        """Picks the tracks from a created dataset and creates/overwrites a playlist with the data.
+
+        Parameters
+        ----------
+        data_key : str
+            Name of the dataset to use stored in the data object in Spomato
+        playlist_name : str
+            The name of the playlist you want to create/overwrite
+        time : int
+            The length in minutes to make the playlist
+        extra : int
+            The amount of buffer time to add on to the end of the playlist.
+        time_limit : int
+            The maximum song length in minutes to include in the playlist.
+        overwrite : bool
+            Boolean to determine whether to overwrite the playlist if it already exists.
+        seed : int
+            Seed for the random number generator, used to make the playlist reproducible. Default is None.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(playlist_name, str):
+            raise TypeError('Argument playlist_name must be of type string')
+        # generate the songs for the playlist, as a dataset so pandas isn't needed
+        songs = self.pick_tracks(data_key=data_key,
+                                 time=time,
+                                 extra=extra,
+                                 time_limit=time_limit,
+                                 seed=seed,
+                                 as_frame=False)
+
+        # create the playlist with the songs
+        self.make_playlist(playlist_name=playlist_name,
+                           song_df=songs,
+                           overwrite=overwrite)
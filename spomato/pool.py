@@ -0,0 +1,207 @@
+"""Author: Matthew Russell
+
+This contains the pool used to serve Spomato objects for many users from one process, sharing their connections and
+caches.
+
+"""
+
+import threading
+from collections import OrderedDict
+import requests
+from spomato.cache import get_http_adapter
+from spomato.metadata import MetadataCache
+from spomato.spomato import Spomato
+
+
+class SpomatoPool():  # pylint: disable=too-many-instance-attributes
+    """Serves Spomato objects for many users' access tokens.
+
+    Every Spomato object in the pool shares one requests session, so connections to the Spotify API are kept alive and
+    reused between users, and one metadata cache, so the songs of a popular artist are only fetched once. Spomato
+    objects are created without any requests to the API, and are kept so each user's datasets can be reused. When more
+    than max_clients are kept, the least recently used are dropped and their thread pools are shut down.
+
+    Parameters
+    ----------
+    max_workers : int
+        The number of threads each Spomato object uses to fetch data from the Spotify API concurrently.
+    cache : spomato.cache.ResponseCache
+        A cache of Spotify API responses shared by every Spomato object.
+    metadata_cache : spomato.metadata.MetadataCache
+        A cache of the songs of artists and albums shared by every Spomato object.
+    max_clients : int
+        The maximum number of Spomato objects to keep.
+    pool_maxsize : int
+        The number of connections to the Spotify API to keep alive.
+    scheduler : spomato.scheduler.RequestScheduler
+        A scheduler every request to the Spotify API is sent through.
+    metrics : spomato.metrics.Metrics
+        Records metrics of every Spomato object.
+
+    Attributes
+    ----------
+    max_workers : int
+        The number of threads each Spomato object uses to fetch data from the Spotify API concurrently.
+    cache : spomato.cache.ResponseCache
+        A cache of Spotify API responses, or None if responses are not cached.
+    metadata_cache : spomato.metadata.MetadataCache
+        The cache of the songs of artists and albums shared by every Spomato object.
+    max_clients : int
+        The maximum number of Spomato objects to keep.
+    requests_session : requests.Session
+        The requests session shared by every Spomato object.
+    scheduler : spomato.scheduler.RequestScheduler
+        The scheduler requests to the Spotify API are sent through, or None if they are sent immediately.
+    metrics : spomato.metrics.Metrics
+        The metrics recorded by every Spomato object, or None if they record nothing.
+
+    """
+
+    def __init__(self,
+                 max_workers=1,
+                 *,
+                 cache=None,
+                 metadata_cache=None,
+                 max_clients=1000,
+                 pool_maxsize=10,
+                 scheduler=None,
+                 metrics=None):
+        """Initialization function that creates the shared requests session and caches.
+
+        Parameters
+        ----------
+        max_workers : int
+            The number of threads each Spomato object uses to fetch data from the Spotify API concurrently. Default is
+            1, which fetches sequentially.
+        cache : spomato.cache.ResponseCache
+            A cache of Spotify API responses. Default is None, which doesn't cache responses.
+        metadata_cache : spomato.metadata.MetadataCache
+            A cache of the songs of artists and albums. Default is None, which creates a new cache.
+        max_clients : int
+            The maximum number of Spomato objects to keep. Default is 1000.
+        pool_maxsize : int
+            The number of connections to the Spotify API to keep alive. Default is 10.
+        scheduler : spomato.scheduler.RequestScheduler
+            A scheduler to send requests to the Spotify API through, used to stay within its rate limit. Default is
+            None, which sends requests immediately.
+        metrics : spomato.metrics.Metrics
+            Records metrics of requests to the Spotify API, datasets and track picks of every Spomato object. Default
+            is None, which records nothing.
+
+        Returns
+        -------
+        None
+
+        """
+        if not isinstance(max_clients, int):
+            raise TypeError('Argument max_clients must be of type int')
+        if max_clients < 1:
+            raise ValueError('Argument max_clients must be at least 1.')
+        if not isinstance(pool_maxsize, int):
+            raise TypeError('Argument pool_maxsize must be of type int')
+
+        self.max_workers = max_workers
+        self.cache = cache
+        self.metadata_cache = MetadataCache() if metadata_cache is None else metadata_cache
+        self.max_clients = max_clients
+        self.scheduler = scheduler
+        self.metrics = metrics
+
+        # one session for every user, the access token is sent with each request rather than stored in the session
+        self.requests_session = requests.Session() if cache is None else cache.session()
+        if scheduler is None:
+            adapter = get_http_adapter(pool_maxsize=pool_maxsize)
+        else:
+            adapter = scheduler.adapter(pool_maxsize=pool_maxsize)
+        self.requests_session.mount('http://', adapter)
+        self.requests_session.mount('https://', adapter)
+
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._clients)
+
+
+    def get(self, access_token, user_key=None, history=None):
+        """Gets the Spomato object of a user, creating it if it isn't in the pool.
+
+        Parameters
+        ----------
+        access_token : str
+            A valid Spotify Access token of the user.
+        user_key : str
+            A key identifying the user, such as the user's id in your application. When it is given, the same Spomato
+            object, along with its datasets, is returned after the user's access token is refreshed. Default is None,
+            which uses the access token as the key.
+        history : spomato.history.PlayHistory
+            The history of the user's recently picked songs, such as one loaded from the user's file. If given, it
+            replaces the history of the user's Spomato object. Default is None, which keeps the object's history.
+
+        Returns
+        -------
+        Spomato
+            The Spomato object of the user.
+
+        """
+        key = access_token if user_key is None else user_key
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = Spomato(access_token=access_token,
+                                 max_workers=self.max_workers,
+                                 cache=self.cache,
+                                 requests_session=self.requests_session,
+                                 metadata_cache=self.metadata_cache,
+                                 scheduler=self.scheduler,
+                                 metrics=self.metrics,
+                                 history=history)
+                self._clients[key] = client
+                while len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)[1].close()
+            else:
+                self._clients.move_to_end(key)
+
+        if history is not None:
+            client.history = history
+        # the user's token has been refreshed since the object was created
+        if client.access_token != access_token:
+            client.update_token(access_token)
+        return client
+
+
+    def remove(self, key):
+        """Removes the Spomato object of a user from the pool and shuts down its thread pool.
+
+        Parameters
+        ----------
+        key : str
+            The user_key, or access token if no user_key was given, the Spomato object was created with.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            client = self._clients.pop(key, None)
+        if client is not None:
+            client.close()
+
+
+    def close(self):
+        """Removes every Spomato object from the pool, shuts down their thread pools and closes the connections of the
+        shared requests session.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+        self.requests_session.close()
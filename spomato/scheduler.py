@@ -0,0 +1,313 @@
+"""Author: Matthew Russell
+
+This contains the request scheduler used by Spomato to stay within the rate limit of the Spotify API.
+
+"""
+
+import contextlib
+import contextvars
+import functools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# request priorities, requests in an earlier lane are always sent before requests in a later lane
+PRIORITIES = ['interactive', 'bulk']
+
+# status codes of responses that are retried, 429 is the rate limit and the rest are transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_priority = contextvars.ContextVar('spomato_request_priority', default='interactive')
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Context manager that sets the priority of the requests made inside it.
+
+    Parameters
+    ----------
+    priority : str
+        One of 'interactive' or 'bulk'.
+
+    Returns
+    -------
+    None
+
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f'{priority} is not a valid request priority.')
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def prioritized(priority):
+    """Decorator that sets the priority of the requests made by a function.
+
+    Parameters
+    ----------
+    priority : str
+        One of 'interactive' or 'bulk'.
+
+    Returns
+    -------
+    callable
+        The decorator.
+
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with request_priority(priority):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_retry_after(headers):
+    """Gets the seconds to wait from the Retry-After header of a response, which is either a number of seconds or a
+    date.
+
+    Parameters
+    ----------
+    headers : collections.abc.Mapping
+        The headers of the response.
+
+    Returns
+    -------
+    float
+        The number of seconds to wait, or None if the response has no valid Retry-After header.
+
+    """
+    retry_after = headers.get('Retry-After')
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler():  # pylint: disable=too-many-instance-attributes
+    """Schedules requests to the Spotify API so they stay within its rate limit.
+
+    Requests are sent at a sustained rate with a token bucket, and requests in the interactive lane are sent ahead of
+    any waiting in the bulk lane. When the API responds 429 Too Many Requests every request waits for its Retry-After
+    header before being sent, and failed requests are retried with jittered exponential backoff. The scheduler is safe
+    to share between threads and between Spomato objects, and should be shared by everything using the same Spotify
+    application, since the rate limit applies to the application.
+
+    Parameters
+    ----------
+    rate : float
+        The number of requests per second to send.
+    burst : int
+        The number of requests that can be sent at once after the scheduler has been idle.
+    max_retries : int
+        The number of times to retry a request that failed with a retryable status.
+    backoff_factor : float
+        The base number of seconds to back off before retrying a request.
+    max_backoff : float
+        The maximum number of seconds to back off before retrying a request.
+
+    Attributes
+    ----------
+    rate : float
+        The number of requests per second to send.
+    burst : int
+        The number of requests that can be sent at once after the scheduler has been idle.
+    max_retries : int
+        The number of times to retry a request that failed with a retryable status.
+    backoff_factor : float
+        The base number of seconds to back off before retrying a request.
+    max_backoff : float
+        The maximum number of seconds to back off before retrying a request.
+
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_retries=5, backoff_factor=0.5, max_backoff=60.0):
+        if not isinstance(rate, (int, float)):
+            raise TypeError('Argument rate must be of type int or float')
+        if rate <= 0:
+            raise ValueError('Argument rate must be more than 0.')
+        if not isinstance(burst, int):
+            raise TypeError('Argument burst must be of type int')
+        if burst < 1:
+            raise ValueError('Argument burst must be at least 1.')
+        if not isinstance(max_retries, int):
+            raise TypeError('Argument max_retries must be of type int')
+
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self._condition = threading.Condition()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queued = dict.fromkeys(PRIORITIES, 0)
+        self._stats = {'requests': 0, 'throttled': 0, 'retries': 0, 'max_queued': 0, 'wait_seconds': 0.0}
+
+
+    def acquire(self, priority=None):
+        """Waits until a request of the given priority can be sent.
+
+        Parameters
+        ----------
+        priority : str
+            One of 'interactive' or 'bulk'. Default is None, which uses the priority set with request_priority, or
+            'interactive' if none is set.
+
+        Returns
+        -------
+        None
+
+        """
+        priority = _priority.get() if priority is None else priority
+        lane = PRIORITIES.index(priority)
+        start = time.monotonic()
+        with self._condition:
+            self._queued[priority] += 1
+            self._stats['max_queued'] = max(self._stats['max_queued'], sum(self._queued.values()))
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if now < self._paused_until:
+                        self._condition.wait(self._paused_until - now)
+                    elif any(self._queued[ahead] for ahead in PRIORITIES[:lane]):
+                        # a request in an earlier lane is waiting, it is woken when it is sent
+                        self._condition.wait()
+                    elif self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    else:
+                        self._condition.wait((1 - self._tokens) / self.rate)
+            finally:
+                self._queued[priority] -= 1
+                self._stats['requests'] += 1
+                self._stats['wait_seconds'] += time.monotonic() - start
+                self._condition.notify_all()
+
+
+    def pause(self, seconds):
+        """Stops every request from being sent for a number of seconds, used when the API responds 429.
+
+        Parameters
+        ----------
+        seconds : float
+            The number of seconds to pause for.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._condition:
+            self._stats['throttled'] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._condition.notify_all()
+
+
+    def wait_to_retry(self, status, headers, attempt):
+        """Waits before retrying a request that failed with a retryable status. A 429 response pauses every request for
+        its Retry-After header, since the rate limit applies to the whole application.
+
+        Parameters
+        ----------
+        status : int
+            The status code of the response.
+        headers : collections.abc.Mapping
+            The headers of the response.
+        attempt : int
+            The number of times the request has already been retried.
+
+        Returns
+        -------
+        bool
+            Whether the request should be retried. False if the status isn't retryable or it has been retried
+            max_retries times.
+
+        """
+        if status not in RETRY_STATUSES or attempt >= self.max_retries:
+            return False
+        if status == 429:
+            retry_after = get_retry_after(headers)
+            self.pause(self.get_backoff(attempt) if retry_after is None else retry_after)
+        else:
+            time.sleep(self.get_backoff(attempt))
+        self.record_retry()
+        return True
+
+
+    def record_retry(self):
+        """Counts a retried request in the statistics of the scheduler.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._condition:
+            self._stats['retries'] += 1
+
+
+    def get_backoff(self, attempt):
+        """Gets the number of seconds to wait before a retry, with full jitter so that retries don't arrive together.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of times the request has already been retried.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait.
+
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+
+    def stats(self):
+        """Gets statistics of the requests sent through the scheduler.
+
+        Returns
+        -------
+        dict
+            The number of requests waiting in each lane ('queued'), the most requests that have waited at once
+            ('max_queued'), the number of requests sent ('requests') and retried ('retries'), the number of 429
+            responses ('throttled') and the total seconds requests have waited to be sent ('wait_seconds').
+
+        """
+        with self._condition:
+            return dict(self._stats, queued=dict(self._queued))
+
+
+    def adapter(self, pool_maxsize=10):
+        """Creates an http adapter that sends requests through this scheduler.
+
+        Parameters
+        ----------
+        pool_maxsize : int
+            The number of connections to keep alive for reuse. Default is 10.
+
+        Returns
+        -------
+        spomato.adapters.ScheduledAdapter
+            The http adapter to mount on a requests session.
+
+        """
+        # requests is only imported once an adapter is needed, so importing spomato stays quick
+        from spomato.adapters import ScheduledAdapter  # pylint: disable=import-outside-toplevel
+        return ScheduledAdapter(self, pool_maxsize=pool_maxsize)
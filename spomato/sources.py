@@ -0,0 +1,447 @@
+"""Author: Matthew Russell
+
+This contains the methods shared by Spomato and AsyncSpomato to parse the songs of Spotify API responses into datasets
+and store the datasets built from the API.
+
+"""
+
+import numpy as np
+from spomato.dataset import Dataset
+
+
+class SourceMixin():  # pylint: disable=too-few-public-methods
+    """Methods of Spomato and AsyncSpomato to check the sources of a dataset, parse the saved tracks, playlists and
+    albums of the Spotify API into datasets, and cache the songs of artists and albums.
+    """
+
+    @staticmethod
+    def _parse_tracks(tracks, market='US'):
+        """Parses a list of Spotify track records into a Dataset of song ids and times.
+
+        The ids, durations and market flags are collected into flat arrays and the market filter is applied as a single
+        mask, so each page of API results builds exactly one Dataset.
+
+        Parameters
+        ----------
+        tracks : list
+            A list of track dictionaries from the Spotify API
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and times for each song
+
+        """
+        # collect the track data into flat columns
+        song_ids = np.array([record['id'] for record in tracks], dtype=object)
+        duration_ms = np.array([record['duration_ms'] for record in tracks], dtype=np.int64)
+        in_market = np.array([market in record['available_markets'] for record in tracks], dtype=bool)
+
+        # filter out any songs that are not in the specified market
+        return Dataset.from_tracks(song_ids[in_market], duration_ms[in_market])
+
+
+    @staticmethod
+    def _parse_album(album_data, market='US'):
+        """Parses the album data returned from the Spotify API and returns the song information as a Dataset.
+
+        Parameters
+        ----------
+        album_data : dict
+            A dictionary of album data from Spotify API
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and time for each song
+
+        """
+        return SourceMixin._parse_tracks(album_data['tracks']['items'], market)
+
+    @staticmethod
+    def _parse_user_playlist(data, market='US'):
+        """Parses a user playlist data set from the Spotify API and returns the song information as a Dataset.
+
+        Parameters
+        ----------
+        data : dictionary
+            Contains songs in a playlist from the Spotify API
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and time for each song
+
+        """
+        return SourceMixin._parse_tracks([item['track'] for item in data['tracks']['items']], market)
+
+
+    @staticmethod
+    def _parse_public_playlist(data, market='US'):
+        """Parses public playlist data set from the Spotify API and returns the song information as a Dataset.
+
+        Parameters
+        ----------
+        data : dictionary
+            Contains songs in a playlist from the Spotify API
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and time for each song
+
+        """
+        return SourceMixin._parse_tracks([item['track'] for item in data['items']], market)
+
+
+    @staticmethod
+    def _parse_saved_tracks(data, market='US'):
+        """Parses a the saved songs data set of the user from the Spotify API and returns the song information as a
+        Dataset.
+
+        Parameters
+        ----------
+        data : dictionary
+            Contains saved songs of the user from the Spotify API
+        market : str
+            A string representation of the Spotify market to filter on. Default is 'US'
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and time for each song
+
+        """
+        return SourceMixin._parse_tracks([item['track'] for item in data], market)
+
+
+    @staticmethod
+    def _check_source(source):
+        """Checks that a source dictionary only contains valid source types.
+
+        Parameters
+        ----------
+        source : dict
+            Contains all sources you want to use in generating the dataset. If None, it defaults to the saved tracks of
+            the current user.
+
+        Returns
+        -------
+        dict
+            The checked source dictionary.
+
+        """
+        # if the source is not specified, default to the saved tracks of the current user.
+        if source is None:
+            source = {'savedtracks': None}
+        elif not isinstance(source, dict):
+            raise ValueError('Argument source must be of type dict or None.')
+        elif len(source.keys()) == 0:
+            raise ValueError('Argument source must contain at least 1 valid key from: savedtracks, artist, playlist')
+        else:
+            for key in source.keys():
+                if key not in ['savedtracks', 'artist', 'playlist']:
+                    raise ValueError(f'{key} is not a valid data source type.')
+        return source
+
+
+    @staticmethod
+    def _check_api_args(source, market, incremental=False):
+        """Internal function to check the source and market a dataset is built from with the Spotify API.
+
+        Parameters
+        ----------
+        source : dict
+            Contains all sources you want to use in generating the dataset, or None for the user's saved tracks.
+        market : str
+            A string representation of the Spotify market to filter on.
+        incremental : bool
+            Whether only the newly saved tracks are fetched. Default is False.
+
+        Returns
+        -------
+        dict
+            The checked source dictionary.
+
+        """
+        if source is not None and not isinstance(source, dict):
+            raise TypeError('Argument source must be of type dict')
+        if not isinstance(market, str):
+            raise TypeError('Argument market must be of type string')
+        if not isinstance(incremental, (bool, int)):
+            raise TypeError('Argument incremental must be of type bool or int')
+        source = SourceMixin._check_source(source)
+        if incremental and list(source) != ['savedtracks']:
+            raise ValueError('Argument incremental can only be used with the savedtracks source.')
+        return source
+
+
+    def _get_added_after(self, data_key, market, incremental):
+        """Internal function to get the time saved tracks are fetched from when a dataset is refreshed.
+
+        Parameters
+        ----------
+        data_key : str
+            Key of the dataset in the data dictionary.
+        market : str
+            A string representation of the Spotify market to filter on.
+        incremental : bool
+            Whether only the newly saved tracks are fetched.
+
+        Returns
+        -------
+        str
+            The added_at timestamp of the newest track in the dataset, or None if every saved track is fetched.
+
+        """
+        # only fetch the newly saved tracks if the dataset was built from saved tracks in the same market
+        high_water_mark = self.high_water_marks.get(data_key)
+        if incremental and high_water_mark is not None and high_water_mark['market'] == market:
+            return high_water_mark['added_at']
+        return None
+
+
+    def _set_api_data(self, data_key, data):
+        """Internal function to save a dataset built from the Spotify API into the data dictionary, indexed by song
+        length for picking.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        data : Dataset
+            The dataset to save.
+
+        Returns
+        -------
+        None
+
+        """
+        data.build_index()
+        self.data[data_key] = data
+        self.high_water_marks.pop(data_key, None)
+
+
+    def _set_saved_tracks_data(self, data_key, data, added_after, high_water_mark):
+        """Internal function to save a dataset of saved tracks into the data dictionary, along with when the newest
+        track was added so it can be refreshed incrementally.
+
+        Parameters
+        ----------
+        data_key : str
+            Key to associate the dataset in the data dictionary.
+        data : Dataset
+            The saved tracks that were fetched.
+        added_after : str
+            The added_at timestamp the tracks were fetched from, or None if every saved track was fetched. The tracks
+            are added to the existing dataset if it is given.
+        high_water_mark : dict
+            The added_at timestamp of the newest saved track and the market of the dataset.
+
+        Returns
+        -------
+        None
+
+        """
+        if added_after is not None:
+            data = Dataset.concat([data, self._get_dataset(data_key)]).drop_duplicates()
+        self._set_api_data(data_key, data)
+        self.high_water_marks[data_key] = high_water_mark
+
+
+    def _parse_saved_items(self, items, market, added_after=None):
+        """Internal function to parse the saved tracks fetched from the Spotify API into a dataset.
+
+        Parameters
+        ----------
+        items : list
+            The saved track items, newest first.
+        market : str
+            A string representation of the Spotify market to filter on.
+        added_after : str
+            The added_at timestamp the tracks were fetched from. Default is None.
+
+        Returns
+        -------
+        tuple
+            A dataset of song ids and times, and the added_at timestamp of the newest saved track.
+
+        """
+        # parse the tracks and remove any duplicates
+        track_df = self._parse_saved_tracks(items, market)
+        track_df_rows = len(track_df)
+        track_df = track_df.drop_duplicates()
+        self.metrics.observe('dataset.rows_fetched', track_df_rows, {'source': 'savedtracks'})
+        self.metrics.observe('dataset.rows', len(track_df), {'source': 'savedtracks'})
+        newest_added_at = items[0]['added_at'] if len(items) > 0 else added_after
+        return track_df, newest_added_at
+
+
+    @staticmethod
+    def _get_items_since(page, added_after):
+        """Internal function to get the saved tracks of a page that were added since a point in time.
+
+        Parameters
+        ----------
+        page : dict
+            A paging object of saved tracks, newest first.
+        added_after : str
+            The added_at timestamp of the newest track already known.
+
+        Returns
+        -------
+        tuple
+            The items added at or after added_after, and whether the following pages can be skipped.
+
+        """
+        new_items = [item for item in page['items'] if item['added_at'] >= added_after]
+        done = (len(new_items) < len(page['items'])
+                or page['offset'] + len(page['items']) >= page['total']
+                or len(page['items']) == 0)
+        return new_items, done
+
+
+    @staticmethod
+    def _drop_seen(batch, seen):
+        """Internal function to remove the songs of a batch that are repeated in it or were in an earlier batch.
+
+        Parameters
+        ----------
+        batch : Dataset
+            A batch of songs.
+        seen : set
+            The keys of the songs of the earlier batches. The keys of the new songs are added to it.
+
+        Returns
+        -------
+        Dataset
+            The songs that weren't seen before.
+
+        """
+        batch = batch.drop_duplicates()
+        keys = (batch.codes.astype(np.int64) << 32) | batch.duration_ms.astype(np.int64)
+        is_new = np.array([key not in seen for key in keys.tolist()], dtype=bool)
+        seen.update(keys[is_new].tolist())
+        return batch.take(np.flatnonzero(is_new))
+
+
+    def _get_cached_songs(self, key):
+        """Internal function to get the songs of an artist or album from the metadata cache.
+
+        Parameters
+        ----------
+        key : tuple
+            The type, id and market of the artist or album.
+
+        Returns
+        -------
+        Dataset
+            The cached songs, or None if they aren't cached.
+
+        """
+        if self.metadata_cache is None:
+            return None
+        return self.metadata_cache.get(key)
+
+
+    def _get_cached_albums(self, album_ids, market):
+        """Internal function to get the songs of the albums that are in the metadata cache.
+
+        Parameters
+        ----------
+        album_ids : list
+            The ids of the albums.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        dict
+            The songs of each cached album, by album id. An album out of the market is cached as an empty dataset.
+
+        """
+        albums = {}
+        for album_id in album_ids:
+            album_data = self._get_cached_songs(('album', album_id, market))
+            if album_data is not None:
+                albums[album_id] = album_data
+        return albums
+
+
+    @staticmethod
+    def _parse_albums(album_jsons, market):
+        """Internal function to parse the songs of each album of a response from the albums endpoint.
+
+        Parameters
+        ----------
+        album_jsons : list
+            The album dictionaries from the Spotify API.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        list
+            The album id and songs of each album. An album out of the market has an empty dataset.
+
+        """
+        return [(album['id'], SourceMixin._parse_album(album, market) if market in album['available_markets']
+                 else Dataset([], [])) for album in album_jsons]
+
+
+    def _add_albums(self, albums, chunk_albums, market):
+        """Internal function to add fetched albums to the songs of an artist's albums and to the metadata cache.
+
+        Parameters
+        ----------
+        albums : dict
+            The songs of each album by album id, updated in place.
+        chunk_albums : list
+            The album id and songs of each fetched album. See _parse_albums.
+        market : str
+            A string representation of the Spotify market to filter on.
+
+        Returns
+        -------
+        None
+
+        """
+        for album_id, album_data in chunk_albums:
+            albums[album_id] = album_data
+            if self.metadata_cache is not None:
+                self.metadata_cache.set(('album', album_id, market), album_data)
+
+
+    def _set_artist_data(self, artist_id, market, album_ids, albums):
+        """Internal function to combine the songs of an artist's albums, and cache them.
+
+        Parameters
+        ----------
+        artist_id : str
+            The spotify id of the artist.
+        market : str
+            A string representation of the Spotify market to filter on.
+        album_ids : list
+            The ids of the artist's albums, in order.
+        albums : dict
+            The songs of each album by album id.
+
+        Returns
+        -------
+        Dataset
+            A dataset of song ids and times of the artist.
+
+        """
+        # concatinate the results from each album into a single dataset
+        data = Dataset.concat([albums[album_id] for album_id in album_ids if album_id in albums])
+        if self.metadata_cache is not None:
+            self.metadata_cache.set(('artist', artist_id, market), data)
+        return data
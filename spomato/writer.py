@@ -0,0 +1,167 @@
+"""Author: Matthew Russell
+
+This contains the writer used by Spomato to save a dataset to file one batch of songs at a time, as the songs are
+downloaded from the Spotify API.
+
+"""
+
+# pyarrow are imported where they are used, so importing spomato stays quick
+# pylint: disable=import-outside-toplevel
+
+import os
+import uuid
+from spomato.dataset import Dataset
+
+
+class DatasetWriter():  # pylint: disable=too-many-instance-attributes
+    """Appends batches of songs to a csv, parquet or feather file with columns of 'song_id' and 'time', or to an npz
+    file of song ids and lengths.
+
+    Each batch is written as soon as it is given, so only one batch needs to be held in memory. Csv batches are appended
+    to the file, parquet batches are written as row groups and feather batches are written as record batches of one
+    Arrow IPC file. Npz files can't be appended to, so their batches are kept in their compact form and written when the
+    writer is closed.
+
+    The batches are written to a temporary file next to the file, which replaces the file once the writer is closed, so
+    the file is never left partly written. If the writer is aborted instead, the temporary file is deleted and the file
+    is left as it was. When the writer is used as a context manager, it is closed on success and aborted if an
+    exception is raised.
+
+    Parameters
+    ----------
+    file_path : str
+        Full path of the file to write.
+    file_format : str
+        One of 'csv', 'parquet', 'feather' or 'npz'.
+    compression : str
+        The compression to use. If None, the default compression of the format is used.
+
+    Attributes
+    ----------
+    file_path : str
+        Full path of the file to write.
+    file_format : str
+        One of 'csv', 'parquet', 'feather' or 'npz'.
+    compression : str
+        The compression to use, or None for the default compression of the format.
+    rows : int
+        The number of songs written.
+
+    """
+
+    def __init__(self, file_path, file_format='csv', compression=None):
+        self.file_path = file_path
+        self.file_format = file_format
+        self.compression = compression
+        self.rows = 0
+        self._started = False
+        self._writer = None
+        self._batches = []
+        # the temporary file ends with the file name, so compression is still inferred from its extension
+        directory, name = os.path.split(os.path.abspath(file_path))
+        self._temp_path = os.path.join(directory, f'.{uuid.uuid4().hex}-{name}')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+    def write(self, dataset):
+        """Appends a batch of songs to the file.
+
+        Parameters
+        ----------
+        dataset : spomato.dataset.Dataset
+            The songs to append.
+
+        Returns
+        -------
+        None
+
+        """
+        if self.file_format == 'npz':
+            self._batches.append(dataset)
+            self._started = True
+            self.rows += len(dataset)
+            return
+        frame = dataset.to_frame()
+        if self.file_format == 'csv':
+            # the header is only written with the first batch
+            frame.to_csv(self._temp_path,
+                         mode='a' if self._started else 'w',
+                         header=not self._started,
+                         index=False,
+                         compression='infer' if self.compression is None else self.compression)
+        else:
+            try:
+                import pyarrow as pa
+            except ImportError as error:
+                raise ImportError(f'Writing {self.file_format} files requires the pyarrow package.') from error
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = self._open_arrow_writer(table.schema)
+            self._writer.write_table(table)
+        self._started = True
+        self.rows += len(frame)
+
+
+    def _open_arrow_writer(self, schema):
+        """Internal function to open the parquet or Arrow IPC writer of the file."""
+        import pyarrow as pa
+        if self.file_format == 'parquet':
+            from pyarrow import parquet
+            return parquet.ParquetWriter(self._temp_path,
+                                         schema,
+                                         compression='snappy' if self.compression is None else self.compression)
+        options = pa.ipc.IpcWriteOptions(compression='lz4' if self.compression is None else self.compression)
+        return pa.ipc.new_file(self._temp_path, schema, options=options)
+
+
+    def close(self):
+        """Finishes writing the file and moves it into place. A file without any songs is written with just its
+        columns. If it can't be finished, the writer is aborted.
+
+        Returns
+        -------
+        None
+
+        """
+        try:
+            if not self._started:
+                # nothing has been written, write the columns so the file can still be loaded
+                self.write(Dataset([], []))
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._batches:
+                Dataset.concat(self._batches).to_npz(self._temp_path, compress=self.compression is not None)
+                self._batches = []
+            os.replace(self._temp_path, self.file_path)
+        except BaseException:
+            self.abort()
+            raise
+
+
+    def abort(self):
+        """Stops writing and deletes the temporary file, leaving the file as it was before the writer was created.
+
+        Returns
+        -------
+        None
+
+        """
+        self._batches = []
+        try:
+            if self._writer is not None:
+                self._writer.close()
+        finally:
+            self._writer = None
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)